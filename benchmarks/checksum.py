@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchmarks/checksum.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+import argparse
+import os
+import struct
+import sys
+import timeit
+
+lib_directory = os.path.join(os.path.dirname(__file__), '..', 'lib')
+if os.path.isdir(os.path.join(lib_directory, 'c1218')):
+	sys.path.insert(0, lib_directory)
+
+from c1218 import utilities
+
+try:
+	import crcelk
+except ImportError:
+	crcelk = None
+
+# the implementations which were used prior to c1218.checksum
+def legacy_data_checksum(data):
+	chksum = 0
+	for i in struct.unpack('B' * len(data), data):
+		chksum += i
+	chksum = ((chksum - 1) & 0xff) ^ 0xff
+	return struct.pack('B', chksum)
+
+def legacy_packet_checksum(data):
+	chksum = crcelk.CRC_HDLC.calc_bytes(data)
+	return struct.pack('<H', chksum)
+
+def measure(function, data, number):
+	return min(timeit.repeat(lambda: function(data), number=number, repeat=5)) / number
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the C12.18 checksum functions', conflict_handler='resolve')
+	parser.add_argument('-n', '--number', dest='number', type=int, default=100, help='the number of calls per measurement')
+	parser.add_argument('-s', '--size', dest='size', type=int, default=8192, help='the size of the payload in bytes')
+	arguments = parser.parse_args()
+
+	data = os.urandom(arguments.size)
+	benchmarks = [('data_checksum', legacy_data_checksum, utilities.data_checksum)]
+	if crcelk is None:
+		print('the crcelk module is unavailable, skipping the legacy packet_checksum')
+	else:
+		benchmarks.append(('packet_checksum', legacy_packet_checksum, utilities.packet_checksum))
+
+	print("{0:<16} {1:>14} {2:>14} {3:>9}".format('function', 'legacy (us)', 'current (us)', 'speedup'))
+	for name, legacy_function, current_function in benchmarks:
+		if legacy_function(data) != current_function(data):
+			print(name + ': the legacy and current results do not match')
+			return 1
+		legacy_time = measure(legacy_function, data, arguments.number)
+		current_time = measure(current_function, data, arguments.number)
+		print("{0:<16} {1:>14.1f} {2:>14.1f} {3:>8.1f}x".format(name, legacy_time * 1e6, current_time * 1e6, legacy_time / current_time))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
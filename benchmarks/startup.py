@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchmarks/startup.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+termineter_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'termineter')
+
+# the commands to measure, each with the arguments and input for the entry point
+COMMANDS = (
+	('version', ('--version',), None),
+	('run-help', ('run', '--help'), None),
+	('run-module', ('run', 'get_identification'), None),
+	('interactive', (), 'exit\n'),
+)
+
+def parse_importtime(output):
+	"""
+	Parse the output of ``python -X importtime`` into a list of tuples of
+	the module name, it's own import time, the cumulative import time and
+	the depth it was imported at. Times are in microseconds.
+	"""
+	imports = []
+	for line in output.splitlines():
+		if not line.startswith('import time:'):
+			continue
+		self_time, cumulative_time, name = line[len('import time:'):].split('|', 2)
+		if not self_time.strip().isdigit():
+			continue
+		depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+		imports.append((name.strip(), int(self_time), int(cumulative_time), depth))
+	return imports
+
+def measure(arguments, stdin):
+	start_time = time.perf_counter()
+	proc_h = subprocess.run(
+		[sys.executable, '-X', 'importtime', termineter_script] + list(arguments),
+		input=stdin,
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE,
+		universal_newlines=True
+	)
+	elapsed = time.perf_counter() - start_time
+	return elapsed, parse_importtime(proc_h.stderr)
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the cold start time of the termineter entry point', conflict_handler='resolve')
+	parser.add_argument('-n', '--number', dest='number', type=int, default=5, help='the number of runs per command')
+	parser.add_argument('-t', '--top', dest='top', type=int, default=0, help='show the slowest top level imports for each command')
+	parser.add_argument('-c', '--command', dest='commands', action='append', choices=[command[0] for command in COMMANDS], help='the commands to measure')
+	parser.add_argument('--json', dest='json', action='store_true', default=False, help='write the results as json for tracking')
+	arguments = parser.parse_args()
+
+	results = {}
+	for name, command_args, stdin in COMMANDS:
+		if arguments.commands and name not in arguments.commands:
+			continue
+		# the first run is discarded, it's only to write the bytecode files
+		measure(command_args, stdin)
+		wall_times = []
+		import_times = []
+		imports = None
+		for _ in range(max(arguments.number, 1)):
+			elapsed, imports = measure(command_args, stdin)
+			wall_times.append(elapsed)
+			import_times.append(sum(entry[1] for entry in imports) / 1e6)
+		top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+		results[name] = {
+			'wall_time': statistics.median(wall_times),
+			'import_time': statistics.median(import_times),
+			'modules': len(imports),
+			'top_imports': [(entry[0], entry[2] / 1e6) for entry in top_level[:arguments.top]]
+		}
+
+	if arguments.json:
+		print(json.dumps(results, indent=2, sort_keys=True))
+		return 0
+	print("{0:<12} {1:>14} {2:>16} {3:>8}".format('command', 'wall (ms)', 'imports (ms)', 'modules'))
+	for name, result in results.items():
+		print("{0:<12} {1:>14.1f} {2:>16.1f} {3:>8}".format(name, result['wall_time'] * 1e3, result['import_time'] * 1e3, result['modules']))
+		for module_name, cumulative_time in result['top_imports']:
+			print("  {0:<36} {1:>10.1f}".format(module_name, cumulative_time * 1e3))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/aio.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+#  This module provides an asyncio implementation of the C12.18 driver so a
+#  single event loop can drive many meters at once. It requires Python 3.5 or
+#  newer. Serial ports require the optional serial_asyncio package while TCP
+#  (socket://host:port) and unix socket (unix:///path) connections are handled
+#  directly with asyncio streams.
+
+from __future__ import unicode_literals
+
+import asyncio
+import logging
+import struct
+
+try:
+	import urllib.parse as urlparse
+except ImportError:
+	import urlparse
+
+from c1218.connection import ConnectionMixin
+from c1218.data import *
+from c1218.errors import C1218NegotiateError, C1218IOError, C1218ReadTableError
+from c1218.retry import RetryPolicy
+from c1218.utilities import FrameHistory, packet_checksum
+from c1219.cache import TableCache
+from c1219.constants import GENERAL_MFG_ID_TBL
+
+try:
+	import serial_asyncio
+except ImportError:
+	has_serial_asyncio = False
+else:
+	has_serial_asyncio = True
+
+async def open_streams(device, **kwargs):
+	"""
+	Open an asyncio stream reader and writer pair for a connection string.
+
+	:param str device: The connection string, either ``socket://host:port``,
+	  ``unix:///path`` or a serial device which is passed to serial_asyncio.
+	:return: The reader and writer.
+	:rtype: tuple
+	"""
+	url = urlparse.urlparse(device)
+	if url.scheme in ('socket', 'tcp'):
+		return await asyncio.open_connection(url.hostname, url.port)
+	if url.scheme == 'unix':
+		return await asyncio.open_unix_connection(url.path)
+	if not has_serial_asyncio:
+		raise C1218IOError('the serial_asyncio package is required for serial connections')
+	return await serial_asyncio.open_serial_connection(url=device, **kwargs)
+
+class AsyncConnection(ConnectionMixin):
+	def __init__(self, reader, writer, c1218_settings={}, toggle_control=True, timeout=2.0, enable_cache=True, table_cache=None, retry_policy=None, auto_recover=True, recovery_delay=0.1):
+		"""
+		This is a C12.18 driver for asyncio streams. Use :py:meth:`.open` to
+		create an instance from a connection string. The methods which
+		communicate with the meter are coroutines with the same names and
+		arguments as those of :py:class:`~c1218.connection.Connection`.
+
+		:param reader: The stream reader to receive data from.
+		:type reader: :py:class:`asyncio.StreamReader`
+		:param writer: The stream writer to send data to.
+		:type writer: :py:class:`asyncio.StreamWriter`
+		:param dict c1218_settings: A settings dictionary to configure the C1218
+		  parameters of 'nbrpkts' and 'pktsize'.
+		:param bool toggle_control: Enables or disables automatically settings
+		  the toggle bit in C12.18 frames.
+		:param float timeout: The number of seconds to wait for data.
+		:param bool enable_cache: Whether to cache tables.
+		:param table_cache: An existing table cache to use.
+		:type table_cache: :py:class:`~c1219.cache.TableCache`
+		:param retry_policy: The policy which determines how sending and
+		  receiving frames is retried.
+		:type retry_policy: :py:class:`~c1218.retry.RetryPolicy`
+		:param bool auto_recover: Recover the session and replay the request
+		  when the meter responds with isss, see :py:meth:`.recover`.
+		:param float recovery_delay: The number of seconds to wait before
+		  recovering the session.
+		"""
+		self.logger = logging.getLogger('c1218.aio')
+		self.loggerio = logging.getLogger('c1218.aio.io')
+		self.frame_history = FrameHistory()
+		self.reader = reader
+		self.writer = writer
+		self.toggle_control = toggle_control
+		self.timeout = timeout
+		self.retry_policy = (retry_policy or RetryPolicy(response_timeout=None))
+		self._reset_frame_state()
+		self._peer_toggles = False
+		self.c1218_pktsize = (c1218_settings.get('pktsize') or 512)
+		self.c1218_nbrpkts = (c1218_settings.get('nbrpkts') or 2)
+		self.c1219_endian = '<'
+		self.caching_enabled = enable_cache
+		if table_cache is None:
+			table_cache = TableCache()
+		self.table_cache = table_cache
+		self._cache_identify = True
+		self.auto_recover = auto_recover
+		self.recovery_delay = recovery_delay
+		self._credentials = None
+		self.logged_in = False
+		self._initialized = False
+		self._crc_errors = 0
+
+	@classmethod
+	async def open(cls, device, **kwargs):
+		"""
+		Open a connection string and create a new instance for it.
+
+		:param str device: The connection string, see :py:func:`.open_streams`.
+		:return: The new instance.
+		:rtype: :py:class:`.AsyncConnection`
+		"""
+		reader, writer = await open_streams(device)
+		return cls(reader, writer, **kwargs)
+
+	async def _read(self, size):
+		try:
+			return await asyncio.wait_for(self.reader.readexactly(size), self.timeout)
+		except asyncio.TimeoutError:
+			return b''
+		except asyncio.IncompleteReadError:
+			raise C1218IOError('the connection has been closed')
+
+	async def _write(self, data):
+		self.writer.write(data)
+		await self.writer.drain()
+
+	async def _discard_input(self):
+		# a read which timed out leaves the data it did receive in the stream
+		# reader, so discard it to synchronize on the start of the next frame
+		buffered = len(getattr(self.reader, '_buffer', b''))
+		if buffered:
+			await self.reader.read(buffered)
+
+	async def send(self, data):
+		"""
+		This sends a raw C12.18 frame and waits checks for an ACK response.
+		In the event that a NACK or no response is received, the frame is
+		resent as determined by the :py:attr:`.retry_policy`.
+
+		:param data: the data to be transmitted
+		:type data: bytes, :py:class:`~c1218.data.C1218Packet`
+		"""
+		data = self._prepare_frame(data)
+		self.frame_history.append('sent', data)
+		if self.loggerio.isEnabledFor(logging.DEBUG):
+			self.loggerio.debug("sending frame,  length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
+		retry = self.retry_policy.begin('send')
+		while True:
+			await self._write(data)
+			response = await self._read_ack()
+			if response == ACK:
+				return
+			if response == NACK:
+				self.loggerio.warning('received a NACK after writing data')
+				error = 'nack'
+			elif len(response) == 0:
+				self.loggerio.error('received empty response after writing data')
+				error = 'no_response'
+			else:
+				self.loggerio.error('received unknown response: ' + hex(ord(response)) + ' after writing data')
+				error = 'bad_response'
+			if not retry.retry(error):
+				break
+			await asyncio.sleep(retry.delay())
+		self.loggerio.critical("failed {0} times to correctly send a frame".format(retry.attempts))
+		self.frame_history.dump(self.loggerio)
+		raise C1218IOError("failed {0} times to correctly send a frame".format(retry.attempts))
+
+	async def _read_ack(self):
+		response = await self._read(1)
+		# a frame in place of the acknowledgement is a response which the
+		# remote device retransmitted because it did not receive our ACK
+		while response == b'\xee':
+			# the retransmission is not checked for being a duplicate so the
+			# previous frame which it repeats can not cause it to be skipped
+			await self._recv_frame(self.retry_policy.begin('recv'), start=response)
+			self.loggerio.warning('discarded a frame received while waiting for an acknowledgement')
+			response = await self._read(1)
+		return response
+
+	async def _recv_frame(self, retry, start=None):
+		"""
+		Receive a single frame, the frame is returned after it has been
+		verified and acknowledged.
+
+		:param retry: The retry state of the response being received.
+		:type retry: :py:class:`~c1218.retry.RetryState`
+		:param bytes start: The first byte of the frame if it has already
+		  been read.
+		:rtype: bytes
+		"""
+		while True:
+			if start is None:
+				start = await self._read(1)
+			if start != b'\xee':
+				self.loggerio.error('did not receive \\xee as the first byte of the frame')
+				error = ('no_response' if not start else 'framing')
+				start = None
+				if not retry.retry(error):
+					break
+				continue
+			start = None
+			header = await self._read(5)
+			body = b''
+			if len(header) == 5:
+				body = await self._read(struct.unpack('>H', header[3:5])[0] + 2)
+			if len(header) < 5 or len(body) < struct.unpack('>H', header[3:5])[0] + 2:
+				await self._discard_input()
+				await self._write(NACK)
+				self.loggerio.warning('received an incomplete frame')
+				if not retry.retry('incomplete'):
+					break
+				continue
+			frame = b'\xee' + header + body
+			self.frame_history.append('received', frame)
+			if frame[-2:] != packet_checksum(frame[:-2]):
+				await self._write(NACK)
+				self.loggerio.warning('crc does not match on received frame')
+				self._crc_errors += 1
+				if not retry.retry('crc'):
+					break
+				continue
+			await self._write(ACK)
+			if self.loggerio.isEnabledFor(logging.DEBUG):
+				self.loggerio.debug("received frame, length: {0:<3} data: {1}".format(len(frame), binascii.b2a_hex(frame).decode('utf-8')))
+			return frame
+		self.loggerio.critical("failed {0} times to correctly receive a frame".format(retry.attempts))
+		self.frame_history.dump(self.loggerio)
+		raise C1218IOError("failed {0} times to correctly receive a frame".format(retry.attempts))
+
+	async def recv(self, full_frame=False):
+		"""
+		Receive a C1218Packet, the payload data is returned.
+
+		:param bool full_frame: If set to True, the entire C1218 frame is
+		  returned instead of just the payload.
+		"""
+		payloadbuffer = bytearray()
+		retry = self.retry_policy.begin('recv')
+		while True:
+			frame = await self._recv_frame(retry)
+			if self._is_duplicate_frame(frame):
+				self.loggerio.warning('discarded a duplicate frame, the toggle bit was not changed')
+				continue
+			if frame[3] == 0:
+				if full_frame:
+					return frame
+				payloadbuffer += frame[6:-2]
+				return bytes(payloadbuffer)
+			payloadbuffer += frame[6:-2]
+			retry.reset()
+
+	async def _request(self, request, response_type=C1218Response):
+		"""
+		Send a request and return the response. If the meter responds with
+		isss, the session is recovered and the request is replayed once.
+
+		:param request: The request to send.
+		:param type response_type: The :py:class:`~c1218.data.C1218Response` class to parse the response with.
+		:rtype: :py:class:`~c1218.data.C1218Response`
+		"""
+		await self.send(request)
+		response = response_type(await self.recv())
+		if not self._needs_recovery(response):
+			return response
+		self.logger.warning('the meter responded with isss, recovering the session')
+		if not await self.recover():
+			self.logger.error('failed to recover the session')
+			return response
+		await self.send(request)
+		return response_type(await self.recv())
+
+	async def start(self):
+		"""
+		Send an identity request and then a negotiation request.
+		"""
+		await self._discard_input()
+		await self.send(C1218IdentRequest())
+		response = C1218IdentResponse(await self.recv())
+		if not response.is_ok:
+			self.logger.error('received incorrect response to identification service request')
+			return False
+
+		self._initialized = True
+		self._crc_errors = 0
+		self.table_cache.reset_identity()
+		self._cache_identify = True
+		await self.send(C1218NegotiateRequest(self.c1218_pktsize, self.c1218_nbrpkts))
+		response = C1218NegotiateResponse(await self.recv())
+		if not response.is_ok:
+			self.logger.error('received incorrect response to negotiate service request')
+			await self.stop()
+			raise C1218NegotiateError('received incorrect response to negotiate service request', response.code)
+		if response.nbrpkts is not None:
+			self.c1218_pktsize = response.pktsize
+			self.c1218_nbrpkts = response.nbrpkts
+		return True
+
+	async def stop(self, force=False):
+		"""
+		Send a terminate request.
+
+		:param bool force: ignore the remote devices response
+		"""
+		if self._initialized:
+			await self.send(C1218TerminateRequest())
+			response = C1218Response(await self.recv())
+			if response.is_ok or force:
+				self._initialized = False
+				self._reset_frame_state()
+				return True
+		return False
+
+	async def close(self):
+		"""
+		Send a terminate request and then close the streams.
+		"""
+		if self._initialized:
+			await self.stop()
+		self.logged_in = False
+		self.writer.close()
+
+	async def keep_alive(self, wait=1):
+		"""
+		Send a wait request to keep the session from timing out.
+
+		:param int wait: The number of seconds to ask the meter to extend
+		  the channel traffic timeout by.
+		:rtype: bool
+		"""
+		try:
+			await self.send(C1218WaitRequest(wait))
+			response = C1218Response(await self.recv())
+		except C1218IOError:
+			return False
+		except (OSError, ValueError) as error:
+			self.logger.error('the keepalive failed with ' + error.__class__.__name__ + ': ' + str(error))
+			return False
+		return response.is_ok
+
+	async def login(self, username='0000', userid=0, password=None):
+		"""
+		Log into the connected device.
+
+		:param str username: the username to log in with (len(username) <= 10)
+		:param int userid: the userid to log in with (0x0000 <= userid <= 0xffff)
+		:param str password: password to log in with (len(password) <= 20)
+		:rtype: bool
+		"""
+		if password and len(password) > 20:
+			self.logger.error('password longer than 20 characters received')
+			raise Exception('password longer than 20 characters, login failed')
+
+		await self.send(C1218LogonRequest(username, userid))
+		if not C1218Response(await self.recv()).is_ok:
+			self.logger.warning('login failed, username and user id rejected')
+			return False
+
+		if password is not None:
+			await self.send(C1218SecurityRequest(password))
+			if not C1218Response(await self.recv()).is_ok:
+				self.logger.warning('login failed, password rejected')
+				return False
+
+		self.logged_in = True
+		self._credentials = (username, userid, password)
+		return True
+
+	async def recover(self):
+		"""
+		Re-establish the session after the meter responded with isss. This
+		behaves the same as :py:meth:`c1218.connection.Connection.recover`.
+
+		:return: Whether or not the session was recovered.
+		:rtype: bool
+		"""
+		if self.recovery_delay:
+			await asyncio.sleep(self.recovery_delay)
+		if self._credentials is not None:
+			try:
+				if await self.login(*self._credentials):
+					self.logger.info('recovered the session by logging in again')
+					return True
+			except C1218IOError:
+				self.logger.warning('the meter did not respond while logging in again')
+		self.logger.info('restarting the session')
+		self._initialized = False
+		self._reset_frame_state()
+		try:
+			if not await self.start():
+				return False
+			if self._credentials is not None and not await self.login(*self._credentials):
+				return False
+		except (C1218IOError, C1218NegotiateError):
+			self.logger.error('failed to restart the session', exc_info=True)
+			return False
+		self.logger.info('recovered the session by restarting it')
+		return True
+
+	async def logoff(self):
+		"""
+		Send a logoff request.
+
+		:rtype: bool
+		"""
+		await self.send(C1218LogoffRequest())
+		if C1218Response(await self.recv()).is_ok:
+			self._initialized = False
+			return True
+		return False
+
+	async def get_table_data(self, tableid, octetcount=None, offset=None):
+		"""
+		Read data from a table. If successful, all of the data from the
+		requested table will be returned.
+
+		:param int tableid: The table number to read from (0x0000 <= tableid <= 0xffff)
+		:param int octetcount: Limit the amount of data read, only works if
+		  the meter supports this type of reading.
+		:param int offset: The offset at which to start to read the data from.
+		"""
+		use_cache = self.caching_enabled and octetcount is None and offset is None
+		if use_cache:
+			if self._cache_identify and self.table_cache.needs_identity(tableid):
+				self._cache_identify = False
+				try:
+					await self.get_table_data(GENERAL_MFG_ID_TBL)
+				except C1218ReadTableError:
+					self.logger.warning('could not read table #1 to identify the meter for the table cache')
+			data = self.table_cache.get(tableid)
+			if data is not None:
+				self.logger.info('returning cached table #' + str(tableid))
+				return data
+		response = await self._request(C1218ReadRequest(tableid, offset, octetcount), C1218ReadResponse)
+		data = self._parse_table_data(tableid, response).tobytes()
+		if use_cache:
+			self.table_cache.put(tableid, data)
+		return data
+
+	async def set_table_data(self, tableid, data, offset=None):
+		"""
+		Write data to a table.
+
+		:param int tableid: The table number to write to (0x0000 <= tableid <= 0xffff)
+		:param bytes data: The data to write into the table.
+		:param int offset: The offset at which to start to write the data (0x000000 <= octetcount <= 0xffffff).
+		"""
+		self.table_cache.invalidate(tableid)
+		self._check_write_response(await self._request(C1218WriteRequest(tableid, data, offset)))
+
+	async def run_procedure(self, process_number, std_vs_mfg, params=b''):
+		"""
+		Initiate a C1219 procedure, the request is written to table 7 and
+		the response is read from table 8.
+
+		:param int process_number: The numeric procedure identifier (0 <= process_number <= 2047).
+		:param bool std_vs_mfg: Whether the procedure is manufacturer specified
+		  or not. True is manufacturer specified.
+		:param bytes params: The parameters to pass to the procedure initiation request.
+		:return: A tuple of the result code and the response data.
+		:rtype: tuple
+		"""
+		procedure_request = self._create_procedure_request(process_number, std_vs_mfg, params)
+		await self.set_table_data(7, procedure_request)
+		return self._parse_procedure_response(procedure_request, await self.get_table_data(8))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/capture.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+#  This module writes C12.18 frames and C12.22 packets to pcapng files which
+#  can be analyzed with standard tools such as Wireshark or tshark. The data
+#  link types are from the range reserved for private use so a dissector must
+#  be configured for them.
+
+from __future__ import unicode_literals
+
+import io
+import logging
+import struct
+import time
+
+LINKTYPE_USER0 = 147
+LINKTYPE_USER1 = 148
+
+INTERFACE_C1218 = 0
+"""The interface id of C12.18 frames, which use :py:data:`.LINKTYPE_USER0`."""
+INTERFACE_C1222 = 1
+"""The interface id of C12.22 packets, which use :py:data:`.LINKTYPE_USER1`."""
+
+FLAG_INBOUND = 0x01
+FLAG_OUTBOUND = 0x02
+
+BLOCK_SECTION_HEADER = 0x0a0d0d0a
+BLOCK_INTERFACE_DESCRIPTION = 0x00000001
+BLOCK_ENHANCED_PACKET = 0x00000006
+BYTE_ORDER_MAGIC = 0x1a2b3c4d
+
+OPTION_END = 0
+OPTION_IF_NAME = 2
+OPTION_EPB_FLAGS = 2
+
+_ENHANCED_PACKET_HEADER = struct.Struct('<IIIIIII')
+_ENHANCED_PACKET_TRAILER = struct.Struct('<HHIHHI')
+
+def _pad(data):
+	return data + (b'\x00' * (-len(data) % 4))
+
+def _block(block_type, body):
+	length = 12 + len(body)
+	return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+def _option(code, value):
+	return struct.pack('<HH', code, len(value)) + _pad(value)
+
+class PcapngWriter(object):
+	"""
+	Write packets to a pcapng file. Both of the interfaces are described at
+	the start of the file so C12.18 and C12.22 traffic can be written to the
+	same capture. Each packet is written with a single call to the buffered
+	file so the writer can be shared by multiple threads.
+	"""
+	def __init__(self, path):
+		"""
+		:param str path: The path of the file to write the capture to.
+		"""
+		self.logger = logging.getLogger('c1218.capture')
+		self.path = path
+		self.packets = 0
+		self._file_h = io.open(path, 'wb')
+		self._file_h.write(_block(BLOCK_SECTION_HEADER, struct.pack('<IHHq', BYTE_ORDER_MAGIC, 1, 0, -1)))
+		self._write_interface(LINKTYPE_USER0, 'c12.18')
+		self._write_interface(LINKTYPE_USER1, 'c12.22')
+		self.logger.info('capturing packets to: ' + path)
+
+	def __repr__(self):
+		return "<{0} path: {1!r} packets: {2:,} >".format(self.__class__.__name__, self.path, self.packets)
+
+	def _write_interface(self, linktype, name):
+		options = _option(OPTION_IF_NAME, name.encode('utf-8')) + struct.pack('<HH', OPTION_END, 0)
+		self._file_h.write(_block(BLOCK_INTERFACE_DESCRIPTION, struct.pack('<HHI', linktype, 0, 0) + options))
+
+	@property
+	def closed(self):
+		return self._file_h is None
+
+	def write_packet(self, data, inbound, interface=INTERFACE_C1218, timestamp=None):
+		"""
+		Write a packet to the capture.
+
+		:param bytes data: The raw bytes of the packet.
+		:param bool inbound: Whether the packet was received, as opposed to sent.
+		:param int interface: The interface the packet was captured on.
+		:param float timestamp: The time the packet was captured, defaults to now.
+		"""
+		file_h = self._file_h
+		if file_h is None:
+			return
+		data = bytes(data)
+		timestamp = int((time.time() if timestamp is None else timestamp) * 1000000)
+		padding = -len(data) % 4
+		length = _ENHANCED_PACKET_HEADER.size + len(data) + padding + _ENHANCED_PACKET_TRAILER.size
+		file_h.write(b''.join((
+			_ENHANCED_PACKET_HEADER.pack(BLOCK_ENHANCED_PACKET, length, interface, timestamp >> 32, timestamp & 0xffffffff, len(data), len(data)),
+			data,
+			b'\x00' * padding,
+			_ENHANCED_PACKET_TRAILER.pack(OPTION_EPB_FLAGS, 4, (FLAG_INBOUND if inbound else FLAG_OUTBOUND), OPTION_END, 0, length)
+		)))
+		self.packets += 1
+
+	def flush(self):
+		if self._file_h is not None:
+			self._file_h.flush()
+
+	def close(self):
+		if self._file_h is None:
+			return
+		self._file_h.close()
+		self._file_h = None
+		self.logger.info("captured {0:,} packets to: {1}".format(self.packets, self.path))
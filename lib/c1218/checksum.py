@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/checksum.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import sys
+
+CRC_HDLC_INIT = 0xffff
+
+def _crc_hdlc_table():
+	table = []
+	for byte in range(256):
+		crc = byte
+		for _ in range(8):
+			if crc & 1:
+				crc = (crc >> 1) ^ 0x8408
+			else:
+				crc >>= 1
+		table.append(crc)
+	return tuple(table)
+
+# lookup table for the reflected form of the CRC-16/HDLC polynomial (0x1021)
+CRC_HDLC_TABLE = _crc_hdlc_table()
+
+def crc_hdlc_update(crc, data):
+	"""
+	Update a CRC-16/HDLC register with additional data. This allows a CRC to
+	be carried across multiple chunks of data, the final value is obtained by
+	passing the register to :py:func:`.crc_hdlc_final`.
+
+	:param int crc: The current register value, start with :py:data:`.CRC_HDLC_INIT`.
+	:param data: The data to add to the calculation.
+	:type data: bytes, bytearray, memoryview
+	:return: The updated register value.
+	:rtype: int
+	"""
+	if sys.version_info[0] == 2:
+		data = bytearray(data)
+	table = CRC_HDLC_TABLE
+	for byte in data:
+		crc = (crc >> 8) ^ table[(crc ^ byte) & 0xff]
+	return crc
+
+def crc_hdlc_final(crc):
+	"""
+	Finalize a CRC-16/HDLC register value.
+
+	:param int crc: The register value returned from :py:func:`.crc_hdlc_update`.
+	:return: The CRC value.
+	:rtype: int
+	"""
+	return crc ^ 0xffff
+
+def crc_hdlc(data):
+	"""
+	Calculate the CRC-16/HDLC value of *data*.
+
+	:param data: The data to calculate the CRC of.
+	:type data: bytes, bytearray, memoryview
+	:rtype: int
+	"""
+	return crc_hdlc_final(crc_hdlc_update(CRC_HDLC_INIT, data))
+
+def byte_sum_update(total, data):
+	"""
+	Add the bytes in *data* to a running total without unpacking them. The
+	final value is obtained by passing the total to :py:func:`.byte_sum_final`.
+
+	:param int total: The current running total, start with 0.
+	:param data: The data to add to the total.
+	:type data: bytes, bytearray, memoryview
+	:rtype: int
+	"""
+	if sys.version_info[0] == 2:
+		data = bytearray(data)
+	return total + sum(data)
+
+def byte_sum_final(total):
+	"""
+	Convert a running total of bytes into the one's complement check sum used
+	by C12.18 and C12.22.
+
+	:param int total: The running total from :py:func:`.byte_sum_update`.
+	:rtype: int
+	"""
+	return ((total - 1) & 0xff) ^ 0xff
+
+def byte_sum(data):
+	"""
+	Calculate the one's complement check sum of *data*.
+
+	:param data: The data to calculate the check sum of.
+	:type data: bytes, bytearray, memoryview
+	:rtype: int
+	"""
+	return byte_sum_final(byte_sum_update(0, data))
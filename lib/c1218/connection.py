@@ -32,14 +32,22 @@
 
 from __future__ import unicode_literals
 
+import collections
 import logging
 import random
 import sys
 import time
 
+from c1218.checksum import byte_sum, byte_sum_final, byte_sum_update
 from c1218.data import *
 from c1218.errors import C1218NegotiateError, C1218IOError, C1218ReadTableError, C1218WriteTableError
-from c1218.utilities import check_data_checksum, packet_checksum
+from c1218.recording import RecordingSerial
+from c1218.retry import RetryPolicy
+from c1218.stats import ConnectionStats, get_service_name, timer
+from c1218.trace import NULL_TRACER, traced
+from c1218.utilities import FrameHistory, packet_checksum
+from c1219.cache import TableCache
+from c1219.constants import GENERAL_MFG_ID_TBL
 from c1219.data import C1219ProcedureInit
 from c1219.errors import C1219ProcedureError
 
@@ -51,8 +59,199 @@ if hasattr(serial, 'protocol_handler_packages') and not 'c1218.urlhandler' in se
 if hasattr(logging, 'NullHandler'):
 	logging.getLogger('c1218').addHandler(logging.NullHandler())
 
-class ConnectionBase(object):
-	def __init__(self, device, c1218_settings={}, serial_settings=None, toggle_control=True, **kwargs):
+class ReadBuffer(object):
+	"""
+	A read-ahead buffer for a PySerial instance. Whatever data is waiting to be
+	read is pulled into a reusable bytearray and the requested portions are
+	returned as memoryview slices. The returned views are only valid until the
+	next call to :py:meth:`.peek` or :py:meth:`.read`.
+	"""
+	def __init__(self, serial_h, size=1024):
+		"""
+		:param serial_h: The PySerial instance to read from.
+		:param int size: The initial size of the buffer.
+		"""
+		self.serial_h = serial_h
+		self._buffer = bytearray(size)
+		self._view = memoryview(self._buffer)
+		self._start = 0
+		self._end = 0
+
+	def __len__(self):
+		return self._end - self._start
+
+	def _in_waiting(self):
+		try:
+			if hasattr(self.serial_h, 'in_waiting'):
+				return self.serial_h.in_waiting
+			return self.serial_h.inWaiting()
+		except (AttributeError, IOError, NotImplementedError):
+			return 0
+
+	def _reserve(self, size):
+		if self._end + size <= len(self._buffer):
+			return
+		buffered = self._end - self._start
+		if buffered + size <= len(self._buffer):
+			self._buffer[:buffered] = self._buffer[self._start:self._end]
+		else:
+			buffer = bytearray(max(len(self._buffer) * 2, buffered + size))
+			buffer[:buffered] = self._buffer[self._start:self._end]
+			self._buffer = buffer
+			self._view = memoryview(buffer)
+		self._start = 0
+		self._end = buffered
+
+	def _fill(self, size):
+		while self._end - self._start < size:
+			needed = size - (self._end - self._start)
+			data = self.serial_h.read(max(needed, self._in_waiting()))
+			if not data:
+				break
+			self._reserve(len(data))
+			self._buffer[self._end:self._end + len(data)] = data
+			self._end += len(data)
+
+	def clear(self):
+		"""
+		Discard all of the data which is currently buffered.
+		"""
+		self._start = 0
+		self._end = 0
+
+	def peek(self, size):
+		"""
+		Return up to *size* bytes without consuming them. Fewer bytes are
+		returned if the read times out.
+
+		:param int size: The number of bytes to return.
+		:rtype: memoryview
+		"""
+		self._fill(size)
+		return self._view[self._start:min(self._start + size, self._end)]
+
+	def read(self, size):
+		"""
+		Return and consume up to *size* bytes. Fewer bytes are returned if the
+		read times out.
+
+		:param int size: The number of bytes to return.
+		:rtype: memoryview
+		"""
+		data = self.peek(size)
+		self._start += len(data)
+		return data
+
+class ConnectionMixin(object):
+	"""
+	The framing and response logic which is shared by the C12.18 drivers
+	regardless of how they perform I/O. None of these methods read or write
+	any data. The class using this must provide the :py:attr:`logger` and
+	:py:attr:`toggle_control` attributes and initialize the frame state with
+	:py:meth:`._reset_frame_state`.
+	"""
+	def _reset_frame_state(self):
+		# the toggle bit and the duplicate check start over with each session
+		self._toggle_bit = False
+		self._last_frame = None
+
+	def _prepare_frame(self, data):
+		"""
+		Set or clear the toggle bit of a frame which is about to be sent and
+		return the raw data to write.
+
+		:param data: The frame to be sent.
+		:type data: bytes, :py:class:`~c1218.data.C1218Packet`
+		:rtype: bytes
+		"""
+		if not isinstance(data, C1218Packet):
+			data = C1218Packet(data)
+		if self.toggle_control:  # bit wise, fuck yeah
+			if self._toggle_bit:
+				data.set_control(ord(data.control) | 0x20)
+				self._toggle_bit = False
+			else:
+				if ord(data.control) & 0x20:
+					data.set_control(ord(data.control) ^ 0x20)
+				self._toggle_bit = True
+		return data.build()
+
+	def _is_duplicate_frame(self, frame):
+		# once the remote device is known to alternate the toggle bit, a frame
+		# identical to the previous one is a retransmission of it
+		last_frame = self._last_frame
+		self._last_frame = frame
+		if last_frame is None:
+			return False
+		if (frame[2] ^ last_frame[2]) & 0x20:
+			self._peer_toggles = True
+			return False
+		return self._peer_toggles and frame == last_frame
+
+	def _needs_recovery(self, response):
+		# whether the session was lost and the request should be replayed
+		# once it has been recovered
+		return self.auto_recover and self._initialized and response.code == C1218_RESPONSE_CODES['isss']
+
+	def _get_read_window(self):
+		"""
+		Calculate the largest amount of table data which can be returned in a
+		single read response using the current packet size and number of
+		packets settings.
+
+		:rtype: int
+		"""
+		# each packet has 6 bytes of header and 2 bytes of crc and the response
+		# has a 1 byte status, a 2 byte count and a 1 byte checksum
+		window = (self.c1218_nbrpkts * (self.c1218_pktsize - 8)) - 4
+		return max(min(window, 0xffff), 1)
+
+	def _parse_table_data(self, tableid, response):
+		"""
+		Validate a read response and return a view of the table data in it,
+		the data is not copied.
+
+		:param int tableid: The table number which was read.
+		:param response: The response to the read request.
+		:type response: :py:class:`~c1218.data.C1218ReadResponse`
+		:rtype: memoryview
+		"""
+		if not len(response):
+			self.logger.error('could not read table id: ' + str(tableid) + ', error: no data was returned')
+			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: no data was returned')
+		if not response.is_ok:
+			self.logger.error('could not read table id: ' + str(tableid) + ', error: ' + response.details)
+			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: ' + response.details, response.code)
+		data = response.data
+		if data is None:
+			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
+			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
+		if len(data) != response.count:
+			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+		if byte_sum(data) != response.checksum:
+			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid check sum')
+			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid checksum')
+		return data
+
+	def _check_write_response(self, response):
+		if not response.is_ok:
+			self.logger.error('could not write data to the table, error: ' + response.details)
+			raise C1218WriteTableError('could not write data to the table, error: ' + response.details, response.code)
+
+	def _create_procedure_request(self, process_number, std_vs_mfg, params):
+		seqnum = random.randint(2, 254)
+		self.logger.info('starting procedure: ' + str(process_number) + ' (' + hex(process_number) + ') sequence number: ' + str(seqnum) + ' (' + hex(seqnum) + ')')
+		return C1219ProcedureInit(self.c1219_endian, process_number, std_vs_mfg, 0, seqnum, params).build()
+
+	def _parse_procedure_response(self, procedure_request, response):
+		if response[:3] == procedure_request[:3]:
+			return response[3], response[4:]
+		self.logger.error('invalid response from procedure response table (table #8)')
+		raise C1219ProcedureError('invalid response from procedure response table (table #8)')
+
+class ConnectionBase(ConnectionMixin):
+	def __init__(self, device, c1218_settings={}, serial_settings=None, toggle_control=True, record_file=None, retry_policy=None, stats=None, tracer=None, capture=None, **kwargs):
 		"""
 		This is a C12.18 driver for serial connections.  It relies on PySerial
 		to communicate with an ANSI Type-2 Optical probe to communicate
@@ -68,11 +267,32 @@ class ConnectionBase(object):
 		  the serial connection instance.
 		:param bool toggle_control: Enables or diables automatically settings
 		  the toggle bit in C12.18 frames.
+		:param str record_file: An optional path to record all of the data
+		  that is read and written to. The recording can be played back by
+		  using it in a ``replay://`` connection string.
+		:param retry_policy: The policy which determines how sending and
+		  receiving frames is retried and the timeouts for reading data.
+		:type retry_policy: :py:class:`~c1218.retry.RetryPolicy`
+		:param stats: The counters to record the latency, traffic and errors
+		  of each service in.
+		:type stats: :py:class:`~c1218.stats.ConnectionStats`
+		:param tracer: The tracer to record the time taken by each frame in.
+		:type tracer: :py:class:`~c1218.trace.TraceRecorder`
+		:param capture: A capture to write every frame and acknowledgement to.
+		:type capture: :py:class:`~c1218.capture.PcapngWriter`
 		"""
 		self.logger = logging.getLogger('c1218.connection')
 		self.loggerio = logging.getLogger('c1218.connection.io')
+		self.frame_history = FrameHistory()
 		self.toggle_control = toggle_control
-		self._toggle_bit = False
+		self._reset_frame_state()
+		self._peer_toggles = False
+		self.retry_policy = (retry_policy or RetryPolicy())
+		self.stats = (ConnectionStats() if stats is None else stats)
+		self._pending_service = None
+		self._pending_start = None
+		self.tracer = (NULL_TRACER if tracer is None else tracer)
+		self.capture = capture
 		if hasattr(serial, 'serial_for_url'):
 			self.serial_h = serial.serial_for_url(device)
 		else:
@@ -80,6 +300,9 @@ class ConnectionBase(object):
 			self.serial_h = serial.Serial(device)
 		self.logger.debug('successfully opened serial device: ' + device)
 		self.device = device
+		if record_file:
+			self.serial_h = RecordingSerial(self.serial_h, record_file)
+		self._read_buffer = ReadBuffer(self.serial_h)
 
 		self.c1218_pktsize = (c1218_settings.get('pktsize') or 512)
 		self.c1218_nbrpkts = (c1218_settings.get('nbrpkts') or 2)
@@ -109,53 +332,166 @@ class ConnectionBase(object):
 			self.logger.warning('could not set DTR to False')
 		else:
 			self.logger.debug('set DTR to False')
+		self._update_timeout()
 
 		self.logged_in = False
 		self._initialized = False
+		self._crc_errors = 0
 		self.c1219_endian = '<'
 
 	def __repr__(self):
 		return '<' + self.__class__.__name__ + ' Device: ' + self.device + ' >'
 
+	def _update_timeout(self):
+		# the timeout only changes with the baud rate and the packet size so
+		# the serial port isn't reconfigured for every read
+		timeout = self.retry_policy.get_timeout(self.serial_h.baudrate, self.c1218_pktsize)
+		if timeout is not None and timeout != self.serial_h.timeout:
+			self.serial_h.timeout = timeout
+			self.logger.debug("set the read timeout to {0:.3f} seconds".format(timeout))
+
+	@traced()
 	def send(self, data):
 		"""
 		This sends a raw C12.18 frame and waits checks for an ACK response.
-		In the event that a NACK is received, this function will attempt
-		to resend the frame up to 3 times.
+		In the event that a NACK or no response is received, the frame is
+		resent as determined by the :py:attr:`.retry_policy`.
 
 		:param data: the data to be transmitted
 		:type data: str, :py:class:`~c1218.data.C1218Packet`
 		"""
-		if not isinstance(data, C1218Packet):
-			data = C1218Packet(data)
-		if self.toggle_control:  # bit wise, fuck yeah
-			if self._toggle_bit:
-				data.set_control(ord(data.control) | 0x20)
-				self._toggle_bit = False
-			elif not self._toggle_bit:
-				if ord(data.control) & 0x20:
-					data.set_control(ord(data.control) ^ 0x20)
-				self._toggle_bit = True
-		elif self.toggle_control and not isinstance(data, C1218Packet):
-			self.loggerio.warning('toggle bit is on but the data is not a C1218Packet instance')
-		data = data.build()
-		self.loggerio.debug("sending frame,  length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
-		for pktcount in range(0, 3):
-			self.write(data)
-			response = self.serial_h.read(1)
+		data = self._prepare_frame(data)
+		self.frame_history.append('sent', data)
+		if self.loggerio.isEnabledFor(logging.DEBUG):
+			self.loggerio.debug("sending frame,  length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
+		service_name = get_service_name(data)
+		service = self.stats.get(service_name)
+		service.requests += 1
+		start = timer()
+		retry = self.retry_policy.begin('send')
+		tracer = self.tracer
+		while True:
+			with tracer.span('write', service=service_name, length=len(data)):
+				self.write(data)
+			service.bytes_sent += len(data)
+			with tracer.span('ack'):
+				response = self._read_ack()
+			if self.capture is not None and response:
+				self.capture.write_packet(response, True)
+			if response == ACK:
+				# the latency is recorded once the response is received
+				self._pending_service = service
+				self._pending_start = start
+				return
 			if response == NACK:
 				self.loggerio.warning('received a NACK after writing data')
-				time.sleep(0.10)
+				error = 'nack'
 			elif len(response) == 0:
 				self.loggerio.error('received empty response after writing data')
-				time.sleep(0.10)
-			elif response != ACK:
+				error = 'no_response'
+			else:
 				self.loggerio.error('received unknown response: ' + hex(ord(response)) + ' after writing data')
+				error = 'bad_response'
+			if not self._retry(retry, service, error):
+				break
+			retry.pause()
+		self.loggerio.critical("failed {0} times to correctly send a frame".format(retry.attempts))
+		self.frame_history.dump(self.loggerio)
+		raise C1218IOError("failed {0} times to correctly send a frame".format(retry.attempts))
+
+	def _retry(self, retry, service, error):
+		service.errors[error] += 1
+		self.tracer.instant(error, attempts=retry.attempts + 1)
+		if not retry.retry(error):
+			return False
+		service.retries += 1
+		return True
+
+	def _read_ack(self):
+		# a frame in place of the acknowledgement is a response which the
+		# remote device retransmitted because it did not receive our ACK
+		while self._read_buffer.peek(1) == b'\xee':
+			# the retransmission is not checked for being a duplicate so the
+			# previous frame which it repeats can not cause it to be skipped
+			for frame in self._recv_frames(single_frame=True):
+				pass
+			self.loggerio.warning('discarded a frame received while waiting for an acknowledgement')
+		return bytes(self._read_buffer.read(1))
+
+	def _recv_frames(self, single_frame=False):
+		"""
+		Receive the frames of a response, each frame is yielded after it has
+		been verified and acknowledged. The generator stops after the last
+		frame of the response, the one with a sequence number of 0. The
+		yielded frames are only valid until the next frame is requested.
+
+		:param bool single_frame: Receive exactly one frame without checking
+		  whether it is a duplicate of the previous one.
+		"""
+		read_buffer = self._read_buffer
+		service = (self._pending_service or self.stats.get('other'))
+		retry = self.retry_policy.begin('recv')
+		while True:
+			if read_buffer.peek(1) != b'\xee':
+				tmpbuffer = bytes(read_buffer.read(1))
+				if self.capture is not None and tmpbuffer:
+					self.capture.write_packet(tmpbuffer, True)
+				self.loggerio.error('did not receive \\xee as the first byte of the frame')
+				if self.loggerio.isEnabledFor(logging.DEBUG):
+					self.loggerio.debug('received \\x' + binascii.b2a_hex(tmpbuffer).decode('utf-8') + ' instead')
+				if not self._retry(retry, service, ('no_response' if not tmpbuffer else 'framing')):
+					break
+				continue
+			frame = read_buffer.peek(6)
+			if len(frame) == 6:
+				frame = read_buffer.peek(struct.unpack('>H', frame[4:6])[0] + 8)
+			if len(frame) < 8 or len(frame) < struct.unpack('>H', frame[4:6])[0] + 8:
+				if self.capture is not None:
+					self.capture.write_packet(frame, True)
+				read_buffer.clear()
+				self._write_control(NACK)
+				self.loggerio.warning('received an incomplete frame')
+				if not self._retry(retry, service, 'incomplete'):
+					break
+				continue
+			frame = read_buffer.read(len(frame))
+			if self.capture is not None:
+				self.capture.write_packet(frame, True)
+			service.bytes_received += len(frame)
+			self.tracer.instant('packet', sequence=frame[3], length=len(frame))
+			# the frame is a view of the reused read buffer, so a single copy
+			# of it is shared by the history and the duplicate check
+			frame_data = frame.tobytes()
+			self.frame_history.append('received', frame_data)
+			if frame[-2:] == packet_checksum(frame[:-2]):
+				self._write_control(ACK)
+				if self.loggerio.isEnabledFor(logging.DEBUG):
+					self.loggerio.debug("received frame, length: {0:<3} data: {1}".format(len(frame), binascii.b2a_hex(frame).decode('utf-8')))
+				if single_frame:
+					yield frame
+					return
+				if self._is_duplicate_frame(frame_data):
+					self.loggerio.warning('discarded a duplicate frame, the toggle bit was not changed')
+					continue
+				if frame[3] == 0:
+					if self._pending_service is not None:
+						self._pending_service.latency.add(timer() - self._pending_start)
+						self._pending_service = None
+					yield frame
+					return
+				yield frame
+				retry.reset()
 			else:
-				return
-		self.loggerio.critical('failed 3 times to correctly send a frame')
-		raise C1218IOError('failed 3 times to correctly send a frame')
+				self._write_control(NACK)
+				self.loggerio.warning('crc does not match on received frame')
+				self._crc_errors += 1
+				if not self._retry(retry, service, 'crc'):
+					break
+		self.loggerio.critical("failed {0} times to correctly receive a frame".format(retry.attempts))
+		self.frame_history.dump(self.loggerio)
+		raise C1218IOError("failed {0} times to correctly receive a frame".format(retry.attempts))
 
+	@traced()
 	def recv(self, full_frame=False):
 		"""
 		Receive a C1218Packet, the payload data is returned.
@@ -163,39 +499,21 @@ class ConnectionBase(object):
 		:param bool full_frame: If set to True, the entire C1218 frame is
 		  returned instead of just the payload.
 		"""
-		payloadbuffer = b''
-		tries = 3
-		while tries:
-			tmpbuffer = self.serial_h.read(1)
-			if tmpbuffer != b'\xee':
-				self.loggerio.error('did not receive \\xee as the first byte of the frame')
-				self.loggerio.debug('received \\x' + binascii.b2a_hex(tmpbuffer).decode('utf-8') + ' instead')
-				tries -= 1
+		payloadbuffer = bytearray()
+		for frame in self._recv_frames():
+			if frame[3] != 0:
+				payloadbuffer += frame[6:-2]
 				continue
-			tmpbuffer += self.serial_h.read(5)
-			sequence, length = struct.unpack('>xxxBH', tmpbuffer)
-			payload = self.serial_h.read(length)
-			tmpbuffer += payload
-			chksum = self.serial_h.read(2)
-			if chksum == packet_checksum(tmpbuffer):
-				self.serial_h.write(ACK)
-				data = tmpbuffer + chksum
-				self.loggerio.debug("received frame, length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
-				payloadbuffer += payload
-				if sequence == 0:
-					if full_frame:
-						payloadbuffer = data
-					if sys.version_info[0] == 2:
-						payloadbuffer = bytearray(payloadbuffer)
-					return payloadbuffer
-				else:
-					tries = 3
+			if full_frame:
+				payloadbuffer = bytes(frame)
+			elif payloadbuffer:
+				payloadbuffer += frame[6:-2]
+				payloadbuffer = bytes(payloadbuffer)
 			else:
-				self.serial_h.write(NACK)
-				self.loggerio.warning('crc does not match on received frame')
-				tries -= 1
-		self.loggerio.critical('failed 3 times to correctly receive a frame')
-		raise C1218IOError('failed 3 times to correctly receive a frame')
+				payloadbuffer = bytes(frame[6:-2])
+			if sys.version_info[0] == 2:
+				payloadbuffer = bytearray(payloadbuffer)
+			return payloadbuffer
 
 	def write(self, data):
 		"""
@@ -205,8 +523,16 @@ class ConnectionBase(object):
 
 		:param str data: The raw data to write to the serial connection.
 		"""
+		if self.capture is not None:
+			self.capture.write_packet(data, False)
 		return self.serial_h.write(data)
 
+	def _write_control(self, data):
+		# acknowledgements are written directly to the serial connection
+		if self.capture is not None:
+			self.capture.write_packet(data, False)
+		self.serial_h.write(data)
+
 	def read(self, size):
 		"""
 		Read raw data from the serial connection. This function is not
@@ -214,9 +540,10 @@ class ConnectionBase(object):
 
 		:param int size: The number of bytes to read from the serial connection.
 		"""
-		data = self.serial_h.read(size)
-		self.logger.debug('read data, length: ' + str(len(data)) + ' data: ' + binascii.b2a_hex(data).decode('utf-8'))
-		self.serial_h.write(ACK)
+		data = bytes(self._read_buffer.read(size))
+		if self.loggerio.isEnabledFor(logging.DEBUG):
+			self.loggerio.debug('read data, length: ' + str(len(data)) + ' data: ' + binascii.b2a_hex(data).decode('utf-8'))
+		self._write_control(ACK)
 		if sys.version_info[0] == 2:
 			data = bytearray(data)
 		return data
@@ -228,6 +555,11 @@ class ConnectionBase(object):
 		if self._initialized:
 			self.stop()
 		self.logged_in = False
+		stats = self.retry_policy.stats
+		if stats.retries or stats.failures:
+			self.logger.info('retry statistics: ' + repr(stats))
+		if self.capture is not None:
+			self.capture.flush()
 		return self.serial_h.close()
 
 class Connection(ConnectionBase):
@@ -247,22 +579,55 @@ class Connection(ConnectionBase):
 		  the serial connection instance.
 		:param bool toggle_control: Enables or disables automatically settings
 		  the toggle bit in C12.18 frames.
+		:param str record_file: An optional path to record all of the data
+		  that is read and written to.
 		:param bool enable_cache: Cache specific, read only tables in memory,
 		  the first time the table is read it will be stored for retreival
-		  on subsequent requests.  This is enabled only for specific tables
-		  (currently only 0 and 1).
+		  on subsequent requests.  Which tables are cached and for how long
+		  is determined by the policies of the table cache.
+		:param table_cache: An existing table cache to use, this allows the
+		  cache to be shared between connections.
+		:type table_cache: :py:class:`~c1219.cache.TableCache`
+		:param int max_baudrate: The highest baud rate to step up to while
+		  negotiating. If not provided the baud rate will not be changed.
+		:param bool auto_recover: Recover the session and replay the request
+		  when the meter responds with isss, see :py:meth:`.recover`.
+		:param float recovery_delay: The number of seconds to wait before
+		  recovering the session.
 		"""
 		enable_cache = kwargs.pop('enable_cache', True)
+		self.auto_recover = kwargs.pop('auto_recover', True)
+		self.recovery_delay = kwargs.pop('recovery_delay', 0.1)
+		self.table_cache = kwargs.pop('table_cache', None)
+		if self.table_cache is None:
+			self.table_cache = TableCache()
+		self.max_baudrate = kwargs.pop('max_baudrate', None)
 		super(Connection, self).__init__(*args, **kwargs)
+		self._base_baudrate = self.serial_h.baudrate
+		self.crc_error_threshold = 3
+		self.negotiate_timeout = 6.0
+		self.negotiate_wait = 1
 		self.caching_enabled = enable_cache
-		self._cacheable_tables = [0, 1]
-		self._table_cache = {}
+		self._cache_identify = True
+		self._partial_reads_supported = True
+		self._credentials = None
 		if enable_cache:
 			self.logger.info('selective table caching has been enabled')
 
+	def _identify_for_cache(self, tableid):
+		# cached tables are only returned once the meter has been identified,
+		# so read table #1 first instead of transferring the requested table
+		if not (self._cache_identify and self.table_cache.needs_identity(tableid)):
+			return
+		self._cache_identify = False
+		try:
+			self.get_table_data(GENERAL_MFG_ID_TBL)
+		except C1218ReadTableError:
+			self.logger.warning('could not read table #1 to identify the meter for the table cache')
+
 	def flush_table_cache(self):
 		self.logger.info('flushing all cached tables')
-		self._table_cache = {}
+		self.table_cache.clear()
 
 	def set_table_cache_policy(self, cache_policy):
 		if self.caching_enabled == cache_policy:
@@ -275,27 +640,99 @@ class Connection(ConnectionBase):
 			self.logger.info('selective table caching has been disabled')
 		return
 
+	@traced()
 	def start(self):
 		"""
-		Send an identity request and then a negotiation request.
+		Send an identity request and then a negotiation request. If a maximum
+		baud rate has been configured, the baud rate will be stepped up
+		towards it after the initial negotiation.
 		"""
 		self.serial_h.flushOutput()
 		self.serial_h.flushInput()
+		self._read_buffer.clear()
 		self.send(C1218IdentRequest())
-		data = self.recv()
-		if data[0] != 0x00:
+		response = C1218IdentResponse(self.recv())
+		if not response.is_ok:
 			self.logger.error('received incorrect response to identification service request')
 			return False
 
 		self._initialized = True
-		self.send(C1218NegotiateRequest(self.c1218_pktsize, self.c1218_nbrpkts, baudrate=9600))
-		data = self.recv()
-		if data[0] != 0x00:
+		self._crc_errors = 0
+		# this may be a different meter than the cached tables are from
+		self.table_cache.reset_identity()
+		self._cache_identify = True
+		self._negotiate(9600)
+		if self.max_baudrate:
+			self._step_up_baudrate()
+		return True
+
+	def _negotiate(self, baudrate):
+		self.send(C1218NegotiateRequest(self.c1218_pktsize, self.c1218_nbrpkts, baudrate=baudrate))
+		response = C1218NegotiateResponse(self.recv())
+		if not response.is_ok:
 			self.logger.error('received incorrect response to negotiate service request')
 			self.stop()
-			raise C1218NegotiateError('received incorrect response to negotiate service request', data[0])
-		return True
+			raise C1218NegotiateError('received incorrect response to negotiate service request', response.code)
+		pktsize = response.pktsize
+		nbrpkts = response.nbrpkts
+		if nbrpkts is not None:
+			if pktsize != self.c1218_pktsize or nbrpkts != self.c1218_nbrpkts:
+				self.logger.info("meter granted a packet size of {0} and {1} packets".format(pktsize, nbrpkts))
+			self.c1218_pktsize = pktsize
+			self.c1218_nbrpkts = nbrpkts
+			self._update_timeout()
+		return response.baudrate
+
+	def _set_baudrate(self, baudrate):
+		# make sure the acknowledgement to the negotiate response has been sent
+		self.serial_h.flush()
+		self.serial_h.baudrate = baudrate
+		self._update_timeout()
 
+	def _step_up_baudrate(self):
+		current_baudrate = self._base_baudrate
+		for baudrate in sorted(rate for rate in C1218_BAUDRATE_CODES if self._base_baudrate < rate <= self.max_baudrate):
+			granted = self._negotiate(baudrate)
+			if granted != baudrate:
+				self.logger.info("meter declined to switch to {0} baud".format(baudrate))
+				if granted is not None and granted != current_baudrate:
+					self._set_baudrate(granted)
+					current_baudrate = granted
+				break
+			self._set_baudrate(baudrate)
+			try:
+				self.send(C1218WaitRequest(self.negotiate_wait))
+				response = C1218Response(self.recv())
+			except C1218IOError:
+				response = None
+			if response is None or not response.is_ok:
+				self.logger.warning("the connection failed at {0} baud, falling back to {1} baud".format(baudrate, current_baudrate))
+				self._fall_back_baudrate(current_baudrate)
+				break
+			current_baudrate = baudrate
+		self.logger.info("negotiated a baud rate of {0}".format(current_baudrate))
+		return current_baudrate
+
+	def _fall_back_baudrate(self, baudrate):
+		# let the meter time out and return to the base state before starting
+		# over at the last baud rate which was known to work
+		self._set_baudrate(self._base_baudrate)
+		time.sleep(self.negotiate_timeout)
+		self.serial_h.flushInput()
+		self._read_buffer.clear()
+		self._reset_frame_state()
+		self.send(C1218IdentRequest())
+		response = C1218IdentResponse(self.recv())
+		if not response.is_ok:
+			self.logger.error('received incorrect response to identification service request')
+			raise C1218NegotiateError('received incorrect response to identification service request', response.code)
+		granted = self._negotiate(baudrate)
+		if granted is not None and granted != self._base_baudrate:
+			self._set_baudrate(granted)
+		if granted is not None and granted < self.max_baudrate:
+			self.max_baudrate = granted
+
+	@traced()
 	def stop(self, force=False):
 		"""
 		Send a terminate request.
@@ -304,13 +741,44 @@ class Connection(ConnectionBase):
 		"""
 		if self._initialized:
 			self.send(C1218TerminateRequest())
-			data = self.recv()
-			if data == b'\x00' or force:
+			response = C1218Response(self.recv())
+			if response.is_ok or force:
 				self._initialized = False
-				self._toggle_bit = False
+				self._reset_frame_state()
+				baudrate = self.serial_h.baudrate
+				if baudrate != self._base_baudrate:
+					if self._crc_errors >= self.crc_error_threshold:
+						# frames are failing at this rate so use the next lower one in the future
+						self.max_baudrate = max(rate for rate in C1218_BAUDRATE_CODES if rate < baudrate)
+						self.logger.warning("lowering the maximum baud rate to {0} due to {1} crc errors".format(self.max_baudrate, self._crc_errors))
+					self._set_baudrate(self._base_baudrate)
 				return True
 		return False
 
+	def keep_alive(self, wait=1):
+		"""
+		Send a wait request to keep the session from timing out. This also
+		serves as a cheap check that the meter is still responding. Errors
+		from the serial connection and frames which can not be decoded are
+		logged and count as the meter not responding, so this is safe to
+		call from a background thread.
+
+		:param int wait: The number of seconds to ask the meter to extend
+		  the channel traffic timeout by.
+		:return: Whether or not the meter accepted the request.
+		:rtype: bool
+		"""
+		try:
+			self.send(C1218WaitRequest(wait))
+			response = C1218Response(self.recv())
+		except C1218IOError:
+			return False
+		except (IOError, OSError, ValueError, serial.SerialException) as error:
+			self.logger.error('the keepalive failed with ' + error.__class__.__name__ + ': ' + str(error))
+			return False
+		return response.is_ok
+
+	@traced(arg_names=('username', 'userid'))
 	def login(self, username='0000', userid=0, password=None):
 		"""
 		Log into the connected device.
@@ -325,21 +793,77 @@ class Connection(ConnectionBase):
 			raise Exception('password longer than 20 characters, login failed')
 
 		self.send(C1218LogonRequest(username, userid))
-		data = self.recv()
-		if data != b'\x00':
+		if not C1218Response(self.recv()).is_ok:
 			self.logger.warning('login failed, username and user id rejected')
 			return False
 
 		if password is not None:
 			self.send(C1218SecurityRequest(password))
-			data = self.recv()
-			if data != b'\x00':
+			if not C1218Response(self.recv()).is_ok:
 				self.logger.warning('login failed, password rejected')
 				return False
 
 		self.logged_in = True
+		self._credentials = (username, userid, password)
+		return True
+
+	@traced()
+	def recover(self):
+		"""
+		Re-establish the session after the meter responded with isss. Only as
+		much of the session as was lost is re-established. If the meter was
+		logged into, the logon and security services are tried first. If the
+		meter rejects them, the session is restarted from the identification
+		service and logged into again.
+
+		:return: Whether or not the session was recovered.
+		:rtype: bool
+		"""
+		if self.recovery_delay:
+			time.sleep(self.recovery_delay)
+		if self._credentials is not None:
+			try:
+				if self.login(*self._credentials):
+					self.logger.info('recovered the session by logging in again')
+					return True
+			except C1218IOError:
+				self.logger.warning('the meter did not respond while logging in again')
+		self.logger.info('restarting the session')
+		self._initialized = False
+		self._reset_frame_state()
+		try:
+			if not self.start():
+				return False
+			if self._credentials is not None and not self.login(*self._credentials):
+				return False
+		except (C1218IOError, C1218NegotiateError):
+			self.logger.error('failed to restart the session', exc_info=True)
+			return False
+		self.logger.info('recovered the session by restarting it')
 		return True
 
+	def _request(self, request, response_type=C1218Response):
+		"""
+		Send a request and return the response. If the meter responds with
+		isss, the session is recovered and the request is replayed once.
+
+		:param request: The request to send.
+		:param type response_type: The :py:class:`~c1218.data.C1218Response` class to parse the response with.
+		:rtype: :py:class:`~c1218.data.C1218Response`
+		"""
+		self.send(request)
+		return self._recover_request(request, response_type(self.recv()), response_type)
+
+	def _recover_request(self, request, response, response_type):
+		if not self._needs_recovery(response):
+			return response
+		self.logger.warning('the meter responded with isss, recovering the session')
+		if not self.recover():
+			self.logger.error('failed to recover the session')
+			return response
+		self.send(request)
+		return response_type(self.recv())
+
 	def logoff(self):
 		"""
 		Send a logoff request.
@@ -347,12 +871,12 @@ class Connection(ConnectionBase):
 		:rtype: bool
 		"""
 		self.send(C1218LogoffRequest())
-		data = self.recv()
-		if data == b'\x00':
+		if C1218Response(self.recv()).is_ok:
 			self._initialized = False
 			return True
 		return False
 
+	@traced(arg_names=('tableid', 'octetcount', 'offset'))
 	def get_table_data(self, tableid, octetcount=None, offset=None):
 		"""
 		Read data from a table. If successful, all of the data from the
@@ -363,38 +887,239 @@ class Connection(ConnectionBase):
 		  the meter supports this type of reading.
 		:param int offset: The offset at which to start to read the data from.
 		"""
-		if self.caching_enabled and tableid in self._cacheable_tables and tableid in self._table_cache.keys():
-			self.logger.info('returning cached table #' + str(tableid))
-			return self._table_cache[tableid]
-		self.send(C1218ReadRequest(tableid, offset, octetcount))
-		data = self.recv()
-		status = data[0]
-		if status != 0x00:
-			status = status
-			details = (C1218_RESPONSE_CODES.get(status) or 'unknown response code')
-			self.logger.error('could not read table id: ' + str(tableid) + ', error: ' + details)
-			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: ' + details, status)
-		if len(data) < 4:
-			if len(data) == 0:
-				self.logger.error('could not read table id: ' + str(tableid) + ', error: no data was returned')
-				raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: no data was returned')
-			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
-			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
-		length = struct.unpack('>H', data[1:3])[0]
-		chksum = data[-1]
-		data = data[3:-1]
-		if len(data) != length:
-			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
-			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
-		if not check_data_checksum(data, chksum):
-			self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid check sum')
-			raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid checksum')
+		use_cache = self.caching_enabled and octetcount is None and offset is None
+		if use_cache:
+			self._identify_for_cache(tableid)
+			data = self.table_cache.get(tableid)
+			if data is not None:
+				self.logger.info('returning cached table #' + str(tableid))
+				return data
+		data = self._parse_table_data(tableid, self._request(C1218ReadRequest(tableid, offset, octetcount), C1218ReadResponse)).tobytes()
 
-		if self.caching_enabled and tableid in self._cacheable_tables and not tableid in self._table_cache.keys():
-			self.logger.info('caching table #' + str(tableid))
-			self._table_cache[tableid] = data
+		if use_cache:
+			self.table_cache.put(tableid, data)
 		return data
 
+	def iter_table_data(self, tableid, octetcount=None, offset=None):
+		"""
+		Read data from a table, yielding the table data from each packet of
+		the response as soon as the packet has been received and acknowledged
+		instead of waiting for the entire response. This keeps the memory used
+		constant regardless of the size of the table. The length and check sum
+		of the table data can only be verified once the last packet has been
+		received, so if either is incorrect, :py:exc:`.C1218ReadTableError`
+		is raised after all of the data has been yielded. Tables which are
+		read with this method are not added to the table cache.
+
+		:param int tableid: The table number to read from (0x0000 <= tableid <= 0xffff)
+		:param int octetcount: Limit the amount of data read, only works if
+		  the meter supports this type of reading.
+		:param int offset: The offset at which to start to read the data from.
+		"""
+		if self.caching_enabled and octetcount is None and offset is None:
+			self._identify_for_cache(tableid)
+			data = self.table_cache.get(tableid)
+			if data is not None:
+				self.logger.info('returning cached table #' + str(tableid))
+				yield data
+				return
+		request = C1218ReadRequest(tableid, offset, octetcount)
+		with self.tracer.span('iter_table_data', tableid=tableid, octetcount=octetcount, offset=offset):
+			self.send(request)
+			frames = self._recv_frames()
+			frame = next(frames)
+			if frame[3] == 0:
+				# the entire response fit into a single packet
+				response = self._recover_request(request, C1218ReadResponse(frame[6:-2].tobytes()), C1218ReadResponse)
+				data = self._parse_table_data(tableid, response)
+				if len(data):
+					yield data.tobytes()
+				return
+			response = C1218ReadResponse(frame[6:-2])
+			code = response.code
+			count = response.count
+			if code != C1218_RESPONSE_CODES['ok'] or count is None:
+				details = response.details
+				# consume the rest of the response before raising the error
+				for frame in frames:
+					pass
+				if code == C1218_RESPONSE_CODES['ok']:
+					self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
+					raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length (less than 4)')
+				self.logger.error('could not read table id: ' + str(tableid) + ', error: ' + details)
+				raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: ' + details, code)
+			chunk = frame[9:-2]
+			length = 0
+			total = 0
+			try:
+				while True:
+					last = frame[3] == 0
+					if last:
+						if not len(chunk):
+							self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+							raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+						chksum = chunk[-1]
+						chunk = chunk[:-1]
+					length += len(chunk)
+					total = byte_sum_update(total, chunk)
+					if len(chunk):
+						yield chunk.tobytes()
+					if last:
+						break
+					frame = next(frames)
+					chunk = frame[6:-2]
+			except GeneratorExit:
+				# read the rest of the response so it is not mistaken for the
+				# response to the next request
+				for frame in frames:
+					pass
+				raise
+			if length != count:
+				self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+				raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid length')
+			if byte_sum_final(total) != chksum:
+				self.logger.error('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid check sum')
+				raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, invalid checksum')
+
+	@traced(arg_names=('tableid', 'chunk_size', 'octetcount'))
+	def get_table_data_chunked(self, tableid, chunk_size=None, octetcount=None, retries=3):
+		"""
+		Read data from a table using a series of partial reads. Each chunk is
+		requested individually so a chunk which fails to be transferred is
+		retried by itself without needing to read the entire table again.
+		This requires that the meter supports partial reads. When the size of
+		the table is unknown, the end of it is found by a chunk which is
+		shorter than requested or by the meter responding with onp or iar.
+
+		:param int tableid: The table number to read from (0x0000 <= tableid <= 0xffff)
+		:param int chunk_size: The number of octets to request at a time, this
+		  is limited to what fits within the negotiated packet settings.
+		:param int octetcount: The total size of the table if it is known, when
+		  provided the result buffer is allocated up front.
+		:param int retries: The number of times a single chunk will be retried.
+		"""
+		use_cache = self.caching_enabled and octetcount is None
+		if use_cache:
+			self._identify_for_cache(tableid)
+			data = self.table_cache.get(tableid)
+			if data is not None:
+				self.logger.info('returning cached table #' + str(tableid))
+				return data
+		window = self._get_read_window()
+		chunk_size = min(chunk_size or window, window)
+		if octetcount is None:
+			buffer = bytearray()
+		else:
+			buffer = bytearray(octetcount)
+		offset = 0
+		while octetcount is None or offset < octetcount:
+			if octetcount is None:
+				size = chunk_size
+			else:
+				size = min(chunk_size, octetcount - offset)
+			chunk = self._get_table_chunk(tableid, offset, size, retries)
+			if chunk is None:
+				break
+			chunk_len = len(chunk)
+			if octetcount is None:
+				buffer.extend(chunk)
+			elif offset + chunk_len > octetcount:
+				self.logger.error('could not read table id: ' + str(tableid) + ', error: more data was returned than was requested')
+				raise C1218ReadTableError('could not read table id: ' + str(tableid) + ', error: more data was returned than was requested')
+			else:
+				buffer[offset:offset + chunk_len] = chunk
+			offset += chunk_len
+			if chunk_len < size:
+				break
+		if octetcount is not None and offset < octetcount:
+			del buffer[offset:]
+		data = bytes(buffer)
+		self.logger.debug("read table #{0} in chunks of {1} bytes, total length: {2}".format(tableid, chunk_size, len(data)))
+
+		if use_cache:
+			self.table_cache.put(tableid, data)
+		return data
+
+	@traced(arg_names=('tableid',))
+	def probe_table(self, tableid):
+		"""
+		Check whether a table can be read without transferring all of its
+		data. A partial read of the first octet is used and if the meter
+		responds that partial reads are not supported, the entire table is
+		read instead for this and all subsequent probes. Note that some meters
+		respond to a partial read of an empty table with onp.
+
+		A successful partial read only shows that the table exists and is
+		readable, not that it can be read in a single response. A table
+		larger than the negotiated packet settings allow is reported as ok,
+		but :py:meth:`.get_table_data` will fail to read it with onp, so it
+		must be read with :py:meth:`.get_table_data_chunked` instead.
+
+		:param int tableid: The table number to probe (0x0000 <= tableid <= 0xffff)
+		:return: The response code, 0 (ok) when the table is readable.
+		:rtype: int
+		"""
+		if self.caching_enabled and self.table_cache.get(tableid) is not None:
+			return C1218_RESPONSE_CODES['ok']
+		if self._partial_reads_supported:
+			response = self._request(C1218ReadRequest(tableid, 0, 1))
+			if not len(response):
+				self.logger.error('could not probe table id: ' + str(tableid) + ', error: no data was returned')
+				raise C1218ReadTableError('could not probe table id: ' + str(tableid) + ', error: no data was returned')
+			if response.code != C1218_RESPONSE_CODES['sns']:
+				self.logger.debug("probed table #{0}, response: {1}".format(tableid, response.details))
+				return response.code
+			self.logger.warning('the meter does not support partial reads, probing tables with full reads')
+			self._partial_reads_supported = False
+		try:
+			self.get_table_data(tableid)
+		except C1218ReadTableError as error:
+			if error.code is None:
+				raise error
+			return error.code
+		return C1218_RESPONSE_CODES['ok']
+
+	def probe_tables(self, tableids):
+		"""
+		Probe multiple tables to check whether they can be read. See
+		:py:meth:`.probe_table` for details. Probing stops early if the meter
+		responds with isss because the session could not be recovered.
+
+		:param tableids: The table numbers to probe.
+		:return: The response codes keyed by the table numbers which were probed.
+		:rtype: dict
+		"""
+		results = collections.OrderedDict()
+		for tableid in tableids:
+			results[tableid] = self.probe_table(tableid)
+			if results[tableid] == C1218_RESPONSE_CODES['isss']:
+				break
+		return results
+
+	def _get_table_chunk(self, tableid, offset, size, retries):
+		error = None
+		for attempt in range(retries + 1):
+			if attempt:
+				self.logger.warning("retrying read of table #{0} at offset {1} ({2} bytes)".format(tableid, offset, size))
+				# discard a late response to the previous attempt so it is not
+				# taken as the response to this one
+				self.serial_h.flushInput()
+				self._read_buffer.clear()
+			try:
+				return self._parse_table_data(tableid, self._request(C1218ReadRequest(tableid, offset, size), C1218ReadResponse))
+			except C1218IOError as err:
+				error = err
+			except C1218ReadTableError as err:
+				if err.code in (C1218_RESPONSE_CODES['onp'], C1218_RESPONSE_CODES['iar']) and offset:
+					# the offset is past the end of the table, meters respond
+					# with either onp or iar
+					return None
+				if err.code not in (None, C1218_RESPONSE_CODES['bsy'], C1218_RESPONSE_CODES['dnr']):
+					raise err
+				error = err
+		raise error
+
+	@traced(arg_names=('tableid',))
 	def set_table_data(self, tableid, data, offset=None):
 		"""
 		Write data to a table.
@@ -403,15 +1128,11 @@ class Connection(ConnectionBase):
 		:param str data: The data to write into the table.
 		:param int offset: The offset at which to start to write the data (0x000000 <= octetcount <= 0xffffff).
 		"""
-		self.send(C1218WriteRequest(tableid, data, offset))
-		data = self.recv()
-		if data[0] != 0x00:
-			status = data[0]
-			details = (C1218_RESPONSE_CODES.get(status) or 'unknown response code')
-			self.logger.error('could not write data to the table, error: ' + details)
-			raise C1218WriteTableError('could not write data to the table, error: ' + details, status)
+		self.table_cache.invalidate(tableid)
+		self._check_write_response(self._request(C1218WriteRequest(tableid, data, offset)))
 		return
 
+	@traced(arg_names=('process_number', 'std_vs_mfg'))
 	def run_procedure(self, process_number, std_vs_mfg, params=''):
 		"""
 		Initiate a C1219 procedure, the request is written to table 7 and
@@ -424,14 +1145,6 @@ class Connection(ConnectionBase):
 		:return: A tuple of the result code and the response data.
 		:rtype: tuple
 		"""
-		seqnum = random.randint(2, 254)
-		self.logger.info('starting procedure: ' + str(process_number) + ' (' + hex(process_number) + ') sequence number: ' + str(seqnum) + ' (' + hex(seqnum) + ')')
-		procedure_request = C1219ProcedureInit(self.c1219_endian, process_number, std_vs_mfg, 0, seqnum, params).build()
+		procedure_request = self._create_procedure_request(process_number, std_vs_mfg, params)
 		self.set_table_data(7, procedure_request)
-
-		response = self.get_table_data(8)
-		if response[:3] == procedure_request[:3]:
-			return response[3], response[4:]
-		else:
-			self.logger.error('invalid response from procedure response table (table #8)')
-			raise C1219ProcedureError('invalid response from procedure response table (table #8)')
+		return self._parse_procedure_response(procedure_request, self.get_table_data(8))
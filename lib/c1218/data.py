@@ -35,6 +35,7 @@ from __future__ import unicode_literals
 import binascii
 import struct
 
+from c1218.checksum import byte_sum, crc_hdlc
 from c1218.utilities import check_data_checksum, data_checksum, packet_checksum
 
 ACK = b'\x06'
@@ -66,7 +67,21 @@ C1218_RESPONSE_CODES = {
 	'isss': 10,
 }
 
+C1218_BAUDRATE_CODES = {
+	300: 1,
+	600: 2,
+	1200: 3,
+	2400: 4,
+	4800: 5,
+	9600: 6,
+	14400: 7,
+	19200: 8,
+	28800: 9,
+	57600: 10,
+}
+
 class C1218Request(object):
+	__slots__ = ()
 	def __repr__(self):
 		return '<' + self.__class__.__name__ + ' >'
 
@@ -79,6 +94,22 @@ class C1218Request(object):
 	def build(self):
 		raise NotImplementedError('no build method defined')
 
+	def build_into(self, buf, offset=0):
+		"""
+		Encode the request into an existing buffer instead of returning a
+		new bytes instance. The buffer must have at least ``len(self)`` bytes
+		available at *offset*.
+
+		:param buf: The buffer to encode the request into.
+		:type buf: bytearray, memoryview
+		:param int offset: The offset into *buf* to start at.
+		:return: The number of bytes which were written.
+		:rtype: int
+		"""
+		data = self.build()
+		buf[offset:offset + len(data)] = data
+		return len(data)
+
 	@classmethod
 	def from_bytes(cls, data):
 		raise NotImplementedError('no parse method defined')
@@ -97,6 +128,7 @@ class C1218Request(object):
 		return name[5:-7]
 
 class C1218LogonRequest(C1218Request):
+	__slots__ = ('_userid', '_username')
 	logon = b'\x50'
 	def __init__(self, username='', userid=0):
 		self._userid = b'\x00\x00'
@@ -104,6 +136,9 @@ class C1218LogonRequest(C1218Request):
 		self.set_username(username)
 		self.set_userid(userid)
 
+	def __len__(self):
+		return 13
+
 	def build(self):
 		return self.logon + self._userid + self._username
 
@@ -142,11 +177,15 @@ class C1218LogonRequest(C1218Request):
 		return self._username
 
 class C1218SecurityRequest(C1218Request):
+	__slots__ = ('_password',)
 	security = b'\x51'
 	def __init__(self, password=''):
 		self._password = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
 		self.set_password(password)
 
+	def __len__(self):
+		return 21
+
 	def build(self):
 		return self.security + self._password
 
@@ -171,7 +210,11 @@ class C1218SecurityRequest(C1218Request):
 		return self._password
 
 class C1218LogoffRequest(C1218Request):
+	__slots__ = ()
 	logoff = b'\x52'
+	def __len__(self):
+		return 1
+
 	def build(self):
 		return self.logoff
 
@@ -184,8 +227,9 @@ class C1218LogoffRequest(C1218Request):
 		return cls()
 
 class C1218NegotiateRequest(C1218Request):
-	negotiate = b'\x60'
+	__slots__ = ('negotiate', '_pktsize', '_nbrpkt', '_baudrate')
 	def __init__(self, pktsize, nbrpkt, baudrate=None):
+		self.negotiate = b'\x60'
 		self._pktsize = b'\x01\x00'
 		self._nbrpkt = 1
 		self._baudrate = b''
@@ -194,10 +238,11 @@ class C1218NegotiateRequest(C1218Request):
 		if baudrate:
 			self.set_baudrate(baudrate)
 
+	def __len__(self):
+		return 4 + len(self._baudrate)
+
 	def build(self):
-		pktsize = struct.pack('>H', self._pktsize)
-		nbrpkt = struct.pack('B', self._nbrpkt)
-		return self.negotiate + pktsize + nbrpkt + self._baudrate
+		return self.negotiate + struct.pack('>HB', self._pktsize, self._nbrpkt) + self._baudrate
 
 	@classmethod
 	def from_bytes(cls, data):
@@ -229,9 +274,8 @@ class C1218NegotiateRequest(C1218Request):
 		self._nbrpkt = nbrpkt
 
 	def set_baudrate(self, baudrate):
-		c1218_baudrate_codes = {300: 1, 600: 2, 1200: 3, 2400: 4, 4800: 5, 9600: 6, 14400: 7, 19200: 8, 28800: 9, 57600: 10}
-		if baudrate in c1218_baudrate_codes:
-			self._baudrate = struct.pack('B', c1218_baudrate_codes[baudrate])
+		if baudrate in C1218_BAUDRATE_CODES:
+			self._baudrate = struct.pack('B', C1218_BAUDRATE_CODES[baudrate])
 		elif 0 < baudrate < 11:
 			self._baudrate = struct.pack('B', baudrate)
 		else:
@@ -239,11 +283,15 @@ class C1218NegotiateRequest(C1218Request):
 		self.negotiate = b'\x61'
 
 class C1218WaitRequest(C1218Request):
+	__slots__ = ('_time',)
 	wait = b'\x70'
 	def __init__(self, time=1):
 		self._time = b'\x01'
 		self.set_time(time)
 
+	def __len__(self):
+		return 2
+
 	def build(self):
 		return self.wait + self._time
 
@@ -259,7 +307,11 @@ class C1218WaitRequest(C1218Request):
 		self._time = struct.pack('B', time)
 
 class C1218IdentRequest(C1218Request):
+	__slots__ = ()
 	ident = b'\x20'
+	def __len__(self):
+		return 1
+
 	def build(self):
 		return self.ident
 
@@ -272,7 +324,11 @@ class C1218IdentRequest(C1218Request):
 		return cls()
 
 class C1218TerminateRequest(C1218Request):
+	__slots__ = ()
 	terminate = b'\x21'
+	def __len__(self):
+		return 1
+
 	def build(self):
 		return self.terminate
 
@@ -285,8 +341,9 @@ class C1218TerminateRequest(C1218Request):
 		return cls()
 
 class C1218ReadRequest(C1218Request):
-	read = b'\x30'
+	__slots__ = ('read', '_tableid', '_offset', '_octetcount')
 	def __init__(self, tableid, offset=None, octetcount=None):
+		self.read = b'\x30'
 		self._tableid = b'\x00\x01'
 		self._offset = b''
 		self._octetcount = b''
@@ -296,6 +353,9 @@ class C1218ReadRequest(C1218Request):
 			self.set_offset(offset or 0)
 			self.set_octetcount(octetcount or 0)
 
+	def __len__(self):
+		return 3 + len(self._offset) + len(self._octetcount)
+
 	def build(self):
 		return self.read + self._tableid + self._offset + self._octetcount
 
@@ -346,27 +406,36 @@ class C1218ReadRequest(C1218Request):
 		return struct.unpack('>H', self._octetcount)[0]
 
 class C1218WriteRequest(C1218Request):
-	write = b'\x40'
+	__slots__ = ('write', '_tableid', '_offset', '_datalen', '_data')
 	def __init__(self, tableid, data, offset=None):
+		self.write = b'\x40'
 		self._tableid = b'\x00\x01'
 		self._offset = b''
 		self._datalen = b'\x00\x00'
 		self._data = b''
-		self._crc8 = b''
 		self.set_tableid(tableid)
 		self.set_data(data)
 		if offset is not None and offset != 0:
 			self.write = b'\x4f'
 			self.set_offset(offset)
 
+	def __len__(self):
+		return 6 + len(self._offset) + len(self._data)
+
 	def build(self):
-		packet = self.write
-		packet += self._tableid
-		packet += self._offset
-		packet += self._datalen
-		packet += self._data
-		packet += data_checksum(self._data)
-		return packet
+		buf = bytearray(len(self))
+		self.build_into(buf)
+		return bytes(buf)
+
+	def build_into(self, buf, offset=0):
+		header = self.write + self._tableid + self._offset + self._datalen
+		end = offset + len(header)
+		buf[offset:end] = header
+		# the table data is only copied once, directly into the buffer
+		buf[end:end + len(self._data)] = self._data
+		end += len(self._data)
+		buf[end] = byte_sum(self._data)
+		return end + 1 - offset
 
 	@classmethod
 	def from_bytes(cls, data):
@@ -382,10 +451,10 @@ class C1218WriteRequest(C1218Request):
 		elif data[0] == 0x4f:
 			table_data = data[8:-1]
 			offset = struct.unpack('>I', b'\x00' + data[3:6])[0]
-		if check_data_checksum(table_data, chksum):
+		if not check_data_checksum(table_data, chksum):
 			raise Exception('invalid check sum')
 		request = cls(tableid, table_data, offset=offset)
-		request.write = data[0]
+		request.write = struct.pack('B', data[0])
 		return request
 
 	def set_tableid(self, tableid):
@@ -413,11 +482,12 @@ class C1218WriteRequest(C1218Request):
 		return self._data
 
 class C1218Packet(C1218Request):
+	__slots__ = ('identity', 'control', 'sequence', '_length', '_data')
 	start = b'\xee'
-	identity = b'\x00'
-	control = b'\x00'
-	sequence = b'\x00'
 	def __init__(self, data=None, control=None, length=None):
+		self.identity = b'\x00'
+		self.control = b'\x00'
+		self.sequence = b'\x00'
 		self._length = b'\x00\x00'  # can never exceed 8183
 		self._data = b''
 		if data:
@@ -428,15 +498,18 @@ class C1218Packet(C1218Request):
 			self.set_control(control)
 
 	def __repr__(self):
-		if isinstance(self._data, C1218Request):
-			repr_data = repr(self._data)
-		else:
-			repr_data = '0x' + binascii.b2a_hex(self._data).decode('utf-8')
-		crc = binascii.b2a_hex(packet_checksum(self.start + self.identity + self.control + self.sequence + self._length + self._data)).decode('utf-8')
-		return '<C1218Packet data=' + repr_data + ' data_len=' + str(len(self._data)) + ' crc=0x' + crc + ' >'
+		data = self.data
+		repr_data = '0x' + binascii.b2a_hex(data).decode('utf-8')
+		crc = binascii.b2a_hex(packet_checksum(self.start + self.identity + self.control + self.sequence + self._length + data)).decode('utf-8')
+		return '<C1218Packet data=' + repr_data + ' data_len=' + str(len(data)) + ' crc=0x' + crc + ' >'
+
+	def __len__(self):
+		return 8 + len(self._data)
 
 	@property
 	def data(self):
+		if isinstance(self._data, C1218Request):
+			return self._data.build()
 		return self._data
 
 	@data.setter
@@ -472,9 +545,9 @@ class C1218Packet(C1218Request):
 		self.control = control
 
 	def set_data(self, data):
-		if isinstance(data, C1218Request):
-			data = data.build()
-		elif not isinstance(data, bytes):
+		# requests are kept as they are and encoded directly into the frame
+		# when it is built
+		if not isinstance(data, (C1218Request, bytes)):
 			data = data.encode('utf-8')
 		self._data = data
 		self.set_length(len(self._data))
@@ -485,14 +558,21 @@ class C1218Packet(C1218Request):
 		self._length = struct.pack('>H', length)
 
 	def build(self):
-		packet = self.start
-		packet += self.identity
-		packet += self.control
-		packet += self.sequence
-		packet += self._length
-		packet += self._data
-		packet += packet_checksum(packet)
-		return packet
+		buf = bytearray(len(self))
+		self.build_into(buf)
+		return bytes(buf)
+
+	def build_into(self, buf, offset=0):
+		header = self.start + self.identity + self.control + self.sequence + self._length
+		end = offset + 6
+		buf[offset:end] = header
+		if isinstance(self._data, C1218Request):
+			end += self._data.build_into(buf, end)
+		else:
+			buf[end:end + len(self._data)] = self._data
+			end += len(self._data)
+		struct.pack_into('<H', buf, end, crc_hdlc(memoryview(buf)[offset:end]))
+		return end + 2 - offset
 
 C1218_REQUEST_IDS = {
 	0x20: C1218IdentRequest,
@@ -508,3 +588,199 @@ C1218_REQUEST_IDS = {
 	0x61: C1218NegotiateRequest,
 	0x70: C1218WaitRequest,
 }
+
+class C1218Response(object):
+	"""
+	A response received from a C12.18 device. The response keeps a view of
+	the raw data and each field is only decoded when it is accessed, fields
+	which are not present in the data are None.
+	"""
+	__slots__ = ('_data',)
+	def __init__(self, data):
+		"""
+		:param data: The raw response data, this is not copied.
+		:type data: bytes, bytearray, memoryview
+		"""
+		self._data = memoryview(data)
+
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' code=' + repr(self.code) + ' >'
+
+	def __str__(self):
+		return binascii.b2a_hex(self._data).decode('utf-8')
+
+	def __len__(self):
+		return len(self._data)
+
+	def _unpack(self, fmt, offset):
+		if len(self._data) < offset + struct.calcsize(fmt):
+			return None
+		return struct.unpack_from(fmt, self._data, offset)[0]
+
+	def build(self):
+		return self._data.tobytes()
+
+	@classmethod
+	def create(cls, code=0):
+		"""
+		Encode a response which consists of only the response code.
+
+		:param int code: The response code.
+		"""
+		return cls(struct.pack('B', code))
+
+	@classmethod
+	def from_bytes(cls, data):
+		return cls(data)
+
+	@classmethod
+	def from_hex(cls, data):
+		return cls.from_bytes(binascii.a2b_hex(data))
+
+	@property
+	def code(self):
+		return self._unpack('B', 0)
+
+	@property
+	def details(self):
+		return C1218_RESPONSE_CODES.get(self.code) or 'unknown response code'
+
+	@property
+	def is_ok(self):
+		return self.code == C1218_RESPONSE_CODES['ok']
+
+	@property
+	def name(self):
+		name = self.__class__.__name__
+		if not name.startswith('C1218'):
+			raise Exception('class name does not start with \'C1218\'')
+		if not name.endswith('Response'):
+			raise Exception('class name does not end with \'Response\'')
+		return name[5:-8]
+
+	@property
+	def payload(self):
+		return self._data[1:]
+
+class C1218IdentResponse(C1218Response):
+	__slots__ = ()
+	@classmethod
+	def create(cls, std=0, ver=2, rev=0, features=b''):
+		return cls(struct.pack('BBBB', C1218_RESPONSE_CODES['ok'], std, ver, rev) + features + b'\x00')
+
+	@property
+	def std(self):
+		return self._unpack('B', 1)
+
+	@property
+	def ver(self):
+		return self._unpack('B', 2)
+
+	@property
+	def rev(self):
+		return self._unpack('B', 3)
+
+	@property
+	def features(self):
+		if len(self._data) < 4:
+			return None
+		# the feature list is null terminated
+		end = 4
+		while end < len(self._data) and self._data[end] != 0:
+			end += 1
+		return self._data[4:end]
+
+class C1218NegotiateResponse(C1218Response):
+	__slots__ = ()
+	@classmethod
+	def create(cls, pktsize, nbrpkts, baudrate=None):
+		data = struct.pack('>BHB', C1218_RESPONSE_CODES['ok'], pktsize, nbrpkts)
+		if baudrate is not None:
+			data += struct.pack('B', C1218_BAUDRATE_CODES.get(baudrate, 0))
+		return cls(data)
+
+	@property
+	def pktsize(self):
+		return self._unpack('>H', 1)
+
+	@property
+	def nbrpkts(self):
+		return self._unpack('B', 3)
+
+	@property
+	def baudrate_code(self):
+		return self._unpack('B', 4)
+
+	@property
+	def baudrate(self):
+		code = self.baudrate_code
+		if code is None:
+			return None
+		return next((rate for rate, rate_code in C1218_BAUDRATE_CODES.items() if rate_code == code), None)
+
+class C1218ReadResponse(C1218Response):
+	__slots__ = ()
+	@classmethod
+	def create(cls, data):
+		response = bytearray(4 + len(data))
+		struct.pack_into('>BH', response, 0, C1218_RESPONSE_CODES['ok'], len(data))
+		response[3:-1] = data
+		response[-1] = byte_sum(data)
+		return cls(bytes(response))
+
+	@property
+	def count(self):
+		return self._unpack('>H', 1)
+
+	@property
+	def data(self):
+		if len(self._data) < 4:
+			return None
+		return self._data[3:-1]
+
+	@property
+	def checksum(self):
+		if len(self._data) < 4:
+			return None
+		return self._data[-1]
+
+	def check(self):
+		"""
+		Check that the length and check sum of the table data are correct.
+
+		:rtype: bool
+		"""
+		data = self.data
+		if data is None:
+			return False
+		return len(data) == self.count and byte_sum(data) == self.checksum
+
+C1218_RESPONSE_IDS = {
+	0x20: C1218IdentResponse,
+	0x21: C1218Response,
+	0x30: C1218ReadResponse,
+	0x3f: C1218ReadResponse,
+	0x40: C1218Response,
+	0x4f: C1218Response,
+	0x50: C1218Response,
+	0x51: C1218Response,
+	0x52: C1218Response,
+	0x60: C1218NegotiateResponse,
+	0x61: C1218NegotiateResponse,
+	0x70: C1218Response,
+}
+# negotiate requests with more than one baud rate use the following codes
+C1218_RESPONSE_IDS.update((code, C1218NegotiateResponse) for code in range(0x62, 0x6c))
+
+def parse_response(request_code, data):
+	"""
+	Parse the response to a request, the type of the response is selected
+	using the code of the request which it is in response to. Unknown
+	request codes are parsed as a generic :py:class:`.C1218Response`.
+
+	:param int request_code: The code of the request which was sent.
+	:param data: The raw response data.
+	:type data: bytes, bytearray, memoryview
+	:rtype: :py:class:`.C1218Response`
+	"""
+	return C1218_RESPONSE_IDS.get(request_code, C1218Response)(data)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/recording.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import io
+import logging
+import struct
+import time
+
+RECORDING_MAGIC = b'C1218REC\x01'
+"""The bytes which every session recording file starts with."""
+RECORDING_HEADER = struct.Struct('<d')
+"""The structure of the header following the magic, the start time."""
+RECORD = struct.Struct('<cdI')
+"""The structure of each record, the direction, the offset in seconds from the
+start time and the length of the data which follows."""
+
+DIRECTION_READ = b'r'
+DIRECTION_WRITE = b'w'
+
+def iter_records(file_h):
+	"""
+	Iterate over the records in a session recording, yielding a tuple of the
+	direction, the time offset in seconds and the data for each one.
+
+	:param file_h: The open file object to read from.
+	:return: Each of the records in the recording.
+	:rtype: tuple
+	"""
+	if file_h.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+		raise ValueError('the file is not a session recording')
+	file_h.read(RECORDING_HEADER.size)
+	while True:
+		header = file_h.read(RECORD.size)
+		if len(header) < RECORD.size:
+			break
+		direction, offset, length = RECORD.unpack(header)
+		data = file_h.read(length)
+		if len(data) < length:
+			break
+		yield direction, offset, data
+
+def load_records(path):
+	"""
+	Load all of the records in a session recording into a list.
+
+	:param str path: The path to the recording file.
+	:return: The records as returned by :py:func:`.iter_records`.
+	:rtype: list
+	"""
+	with open(path, 'rb') as file_h:
+		return list(iter_records(file_h))
+
+class RecordingSerial(object):
+	"""
+	A wrapper around a PySerial instance which records all of the data that is
+	read and written to a session recording file. The recording can later be
+	served back with the ``replay://`` URL handler. All other attributes are
+	passed through to the wrapped instance.
+	"""
+	def __init__(self, serial_h, path):
+		"""
+		:param serial_h: The PySerial instance to wrap.
+		:param str path: The path to write the recording to.
+		"""
+		self.__dict__['serial_h'] = serial_h
+		self.__dict__['logger'] = logging.getLogger('c1218.recording')
+		self.__dict__['_start_time'] = time.time()
+		file_h = io.open(path, 'wb')
+		file_h.write(RECORDING_MAGIC + RECORDING_HEADER.pack(self._start_time))
+		self.__dict__['_file_h'] = file_h
+		self.logger.info('recording the serial session to: ' + path)
+
+	def __getattr__(self, name):
+		return getattr(self.serial_h, name)
+
+	def __setattr__(self, name, value):
+		setattr(self.serial_h, name, value)
+
+	def _record(self, direction, data):
+		if not data or self._file_h is None:
+			return
+		self._file_h.write(RECORD.pack(direction, time.time() - self._start_time, len(data)))
+		self._file_h.write(data)
+
+	def read(self, size=1):
+		data = self.serial_h.read(size)
+		self._record(DIRECTION_READ, bytes(data))
+		return data
+
+	def write(self, data):
+		self._record(DIRECTION_WRITE, bytes(data))
+		return self.serial_h.write(data)
+
+	def close(self):
+		if self._file_h is not None:
+			self._file_h.close()
+			self.__dict__['_file_h'] = None
+		return self.serial_h.close()
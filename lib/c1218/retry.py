@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/retry.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import collections
+import random
+import time
+
+RETRY_ERRORS = ('nack', 'no_response', 'bad_response', 'framing', 'incomplete', 'crc')
+"""The classes of errors which are retried while sending and receiving frames."""
+
+class RetryStats(object):
+	"""
+	Counters describing how often the operations which use a
+	:py:class:`.RetryPolicy` had to be retried. These are intended to be used
+	to tune the policy for a particular link.
+	"""
+	def __init__(self):
+		self.operations = collections.Counter()
+		self.retries = collections.Counter()
+		self.failures = collections.Counter()
+		self.backoff_time = 0.0
+
+	def __repr__(self):
+		return "<{0} operations: {1} retries: {2} failures: {3} >".format(self.__class__.__name__, sum(self.operations.values()), sum(self.retries.values()), sum(self.failures.values()))
+
+	def merge(self, other):
+		"""
+		Add the counters from another instance.
+
+		:param other: The counters to add.
+		:type other: :py:class:`.RetryStats`
+		"""
+		self.operations.update(other.operations)
+		self.retries.update(other.retries)
+		self.failures.update(other.failures)
+		self.backoff_time += other.backoff_time
+
+	def reset(self):
+		"""
+		Reset all of the counters to zero.
+		"""
+		self.operations.clear()
+		self.retries.clear()
+		self.failures.clear()
+		self.backoff_time = 0.0
+
+	def to_dict(self):
+		"""
+		Return the counters as a dictionary which can be serialized. The
+		retries and failures are keyed by the operation and then the error.
+
+		:rtype: dict
+		"""
+		retries = collections.defaultdict(dict)
+		for (operation, error), count in self.retries.items():
+			retries[operation][error] = count
+		failures = collections.defaultdict(dict)
+		for (operation, error), count in self.failures.items():
+			failures[operation][error] = count
+		return {
+			'operations': dict(self.operations),
+			'retries': dict(retries),
+			'failures': dict(failures),
+			'backoff_time': self.backoff_time
+		}
+
+class RetryState(object):
+	"""
+	The state of a single operation which is being retried, created by
+	:py:meth:`.RetryPolicy.begin`.
+	"""
+	__slots__ = ('policy', 'operation', 'attempts', '_remaining')
+	def __init__(self, policy, operation):
+		self.policy = policy
+		self.operation = operation
+		self.attempts = 0
+		self._remaining = None
+
+	def retry(self, error):
+		"""
+		Record that the operation failed with *error* and determine whether
+		it should be attempted again. The budget of each class of error is
+		tracked separately.
+
+		:param str error: The class of error, one of :py:data:`.RETRY_ERRORS`.
+		:return: Whether or not the operation should be attempted again.
+		:rtype: bool
+		"""
+		if self._remaining is None:
+			self._remaining = dict(self.policy.budgets)
+		self.attempts += 1
+		remaining = self._remaining.get(error, self.policy.default_budget) - 1
+		self._remaining[error] = remaining
+		if remaining <= 0:
+			self.policy.stats.failures[(self.operation, error)] += 1
+			return False
+		self.policy.stats.retries[(self.operation, error)] += 1
+		return True
+
+	def reset(self):
+		"""
+		Restore the budgets after progress has been made, such as when one
+		packet of a multi-packet response has been received.
+		"""
+		self.attempts = 0
+		self._remaining = None
+
+	def delay(self):
+		"""
+		Calculate how long to wait before the next attempt and record it in
+		the statistics. This is useful for callers which can not block.
+
+		:return: The number of seconds to wait.
+		:rtype: float
+		"""
+		delay = self.policy.get_backoff(self.attempts)
+		self.policy.stats.backoff_time += delay
+		return delay
+
+	def pause(self):
+		"""
+		Wait before the next attempt, see :py:meth:`.delay`.
+		"""
+		delay = self.delay()
+		if delay:
+			time.sleep(delay)
+
+class RetryPolicy(object):
+	"""
+	Determines how many times sending and receiving frames is retried, how
+	long to wait between the attempts and how long to wait for data from the
+	serial connection.
+	"""
+	def __init__(self, budgets=None, default_budget=3, backoff=0.1, backoff_max=1.0, multiplier=2.0, jitter=0.5, response_timeout=1.0, timeout_margin=1.5):
+		"""
+		:param dict budgets: The number of attempts to allow for each class
+		  of error in :py:data:`.RETRY_ERRORS`.
+		:param int default_budget: The number of attempts to allow for classes
+		  of errors which are not in *budgets*.
+		:param float backoff: The number of seconds to wait before the first
+		  retry.
+		:param float backoff_max: The maximum number of seconds to wait before
+		  a retry.
+		:param float multiplier: The factor to increase the wait by after
+		  each retry.
+		:param float jitter: The fraction of the wait which is randomized, to
+		  avoid retrying in step with a noise source.
+		:param float response_timeout: The number of seconds to allow the
+		  remote device to start responding. If set to None, the timeout of
+		  the serial connection is not changed.
+		:param float timeout_margin: The factor to multiply the time it takes
+		  to transfer a frame at the current baud rate by.
+		"""
+		self.budgets = dict(budgets or {})
+		self.default_budget = default_budget
+		self.backoff = backoff
+		self.backoff_max = backoff_max
+		self.multiplier = multiplier
+		self.jitter = jitter
+		self.response_timeout = response_timeout
+		self.timeout_margin = timeout_margin
+		self.stats = RetryStats()
+
+	def copy(self):
+		"""
+		Create a new policy with the same settings and its own counters.
+
+		:rtype: :py:class:`.RetryPolicy`
+		"""
+		return self.__class__(
+			budgets=self.budgets,
+			default_budget=self.default_budget,
+			backoff=self.backoff,
+			backoff_max=self.backoff_max,
+			multiplier=self.multiplier,
+			jitter=self.jitter,
+			response_timeout=self.response_timeout,
+			timeout_margin=self.timeout_margin
+		)
+
+	def begin(self, operation):
+		"""
+		Start a new operation.
+
+		:param str operation: The name of the operation, used for the statistics.
+		:rtype: :py:class:`.RetryState`
+		"""
+		self.stats.operations[operation] += 1
+		return RetryState(self, operation)
+
+	def get_backoff(self, attempt):
+		"""
+		Calculate the exponential backoff with jitter for an attempt.
+
+		:param int attempt: The number of attempts which have failed.
+		:return: The number of seconds to wait.
+		:rtype: float
+		"""
+		if not self.backoff or attempt < 1:
+			return 0.0
+		delay = min(self.backoff_max, self.backoff * (self.multiplier ** (attempt - 1)))
+		if self.jitter:
+			delay -= delay * self.jitter * random.random()
+		return delay
+
+	def get_timeout(self, baudrate, size):
+		"""
+		Calculate the read timeout for the serial connection, which is the
+		time for the remote device to start responding plus the time to
+		transfer *size* octets at *baudrate*.
+
+		:param int baudrate: The current baud rate of the serial connection.
+		:param int size: The largest number of octets which will be read at once.
+		:return: The timeout in seconds, or None if it should not be changed.
+		"""
+		if self.response_timeout is None:
+			return None
+		if not baudrate:
+			return self.response_timeout
+		# 1 start bit, 8 data bits and 1 stop bit
+		return round(self.response_timeout + ((size * 10.0) / baudrate) * self.timeout_margin, 3)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/simulator.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import argparse
+import binascii
+import logging
+import os
+import struct
+import sys
+import time
+
+from c1218.connection import ConnectionBase
+from c1218.data import C1218_BAUDRATE_CODES, C1218_RESPONSE_CODES, C1218IdentResponse, C1218NegotiateResponse, C1218Packet, C1218ReadResponse, C1218Response
+from c1218.errors import C1218IOError
+from c1218.utilities import check_data_checksum
+from c1219.constants import PROC_INITIATE_TBL, PROC_RESPONSE_TBL
+
+import serial
+
+def load_tables_csv(csv_file):
+	"""
+	Load table data from a CSV file which was created by the dump_tables
+	module. The format of each line is table id, table name, table data
+	length, table data where the table data is hex encoded.
+
+	:param str csv_file: The path to the file to load.
+	:return: A dictionary of table ids and the table data.
+	:rtype: dict
+	"""
+	tables = {}
+	with open(csv_file, 'r') as file_h:
+		for line in file_h:
+			line = line.strip()
+			if not line:
+				continue
+			line = line.split(',')
+			tables[int(line[0])] = binascii.a2b_hex(line[-1])
+	return tables
+
+class Simulator(ConnectionBase):
+	"""
+	This is a C12.18 responder which emulates a meter for testing and
+	benchmarking without an optical probe. It answers the identification,
+	negotiate, logon, security, logoff, read, write, wait and terminate
+	services from an in-memory set of tables.
+	"""
+	def __init__(self, device, tables=None, baudrate=9600, max_baudrate=9600, password=None, **kwargs):
+		"""
+		:param str device: A connection string to be passed to the PySerial
+		  library, typically a unix socket in server mode.
+		:param dict tables: A dictionary of table ids and the table data.
+		:param int baudrate: The line rate to emulate before a new one has
+		  been negotiated. If set to 0, the line rate is not emulated.
+		:param int max_baudrate: The highest baud rate the simulator will
+		  grant in a negotiate request.
+		:param str password: The password to require in security requests.
+		"""
+		kwargs.setdefault('c1218_settings', {'pktsize': 1024, 'nbrpkts': 8})
+		super(Simulator, self).__init__(device, **kwargs)
+		self.logger = logging.getLogger('c1218.simulator')
+		self.tables = dict(tables or {})
+		self.base_baudrate = baudrate
+		self.baudrate = baudrate
+		self.max_baudrate = max_baudrate
+		if password is not None and not isinstance(password, bytes):
+			password = password.encode('utf-8')
+		if password is not None:
+			password = password + (b'\x00' * (20 - len(password)))
+		self.password = password
+		self.max_pktsize = self.c1218_pktsize
+		self.max_nbrpkts = self.c1218_nbrpkts
+		self.state = 'base'
+		self._handlers = {
+			0x20: self.handle_ident,
+			0x21: self.handle_terminate,
+			0x30: self.handle_read,
+			0x3f: self.handle_read,
+			0x40: self.handle_write,
+			0x4f: self.handle_write,
+			0x50: self.handle_logon,
+			0x51: self.handle_security,
+			0x52: self.handle_logoff,
+			0x70: self.handle_wait,
+		}
+		for code in range(0x60, 0x6c):
+			self._handlers[code] = self.handle_negotiate
+
+	def _line_delay(self, size):
+		if self.baudrate:
+			# 1 start bit, 8 data bits and 1 stop bit
+			time.sleep((size * 10.0) / self.baudrate)
+
+	def write(self, data):
+		self._line_delay(len(data))
+		return super(Simulator, self).write(data)
+
+	def serve_forever(self):
+		"""
+		Answer requests until the client disconnects.
+		"""
+		while True:
+			try:
+				if not len(self._read_buffer.peek(1)):
+					continue
+				self.serve_request()
+			except serial.SerialException:
+				self.logger.info('the client has disconnected')
+				break
+
+	def serve_request(self):
+		"""
+		Receive a single request and send the response to it.
+		"""
+		try:
+			frame = self.recv(full_frame=True)
+		except C1218IOError:
+			return
+		self._line_delay(len(frame))
+		request = frame[6:-2]
+		if not len(request):
+			return
+		handler = self._handlers.get(request[0])
+		if handler is None:
+			self.logger.warning("received an unsupported request code: 0x{0:02x}".format(request[0]))
+			self.respond(self.code('sns'))
+			return
+		handler(request)
+
+	def code(self, name):
+		return C1218Response.create(C1218_RESPONSE_CODES[name]).build()
+
+	def respond(self, payload):
+		"""
+		Send a response to the client, splitting it into multiple packets as
+		necessary.
+
+		:param bytes payload: The response data to send.
+		"""
+		size = self.c1218_pktsize - 8
+		chunks = [payload[offset:offset + size] for offset in range(0, len(payload), size)] or [b'']
+		if len(chunks) > self.c1218_nbrpkts:
+			self.logger.warning('the response is larger than the negotiated number of packets')
+			chunks = [self.code('onp')]
+		for index, chunk in enumerate(chunks):
+			packet = C1218Packet(chunk)
+			packet.sequence = struct.pack('B', len(chunks) - index - 1)
+			if len(chunks) > 1:
+				# 0x80 marks each packet of a multi-packet response and 0x40 marks the first one
+				packet.set_control(0xc0 if index == 0 else 0x80)
+			self.send(packet)
+
+	def handle_ident(self, request):
+		self.state = 'id'
+		# ok, ANSI C12.18, version 2, revision 0 and an empty feature list
+		self.respond(C1218IdentResponse.create(std=0, ver=2, rev=0).build())
+
+	def handle_negotiate(self, request):
+		if self.state != 'id' or len(request) < 4:
+			self.respond(self.code('isss'))
+			return
+		pktsize, nbrpkts = struct.unpack('>HB', request[1:4])
+		self.c1218_pktsize = max(min(pktsize, self.max_pktsize), 64)
+		self.c1218_nbrpkts = max(min(nbrpkts, self.max_nbrpkts), 1)
+		granted = None
+		if request[0] > 0x60:
+			rates = dict((code, rate) for rate, code in C1218_BAUDRATE_CODES.items())
+			requested = [rates[code] for code in bytearray(request[4:4 + request[0] - 0x60]) if code in rates]
+			requested = [rate for rate in requested if rate <= self.max_baudrate]
+			granted = max(requested) if requested else self.base_baudrate
+		self.respond(C1218NegotiateResponse.create(self.c1218_pktsize, self.c1218_nbrpkts, baudrate=granted).build())
+		if granted and self.baudrate:
+			self.baudrate = granted
+			self.logger.info("switched to {0} baud".format(granted))
+
+	def handle_wait(self, request):
+		self.respond(self.code('ok'))
+
+	def handle_logon(self, request):
+		if self.state != 'id':
+			self.respond(self.code('isss'))
+			return
+		self.state = 'session'
+		self.respond(self.code('ok'))
+
+	def handle_security(self, request):
+		if self.state != 'session':
+			self.respond(self.code('isss'))
+			return
+		if self.password is not None and request[1:21] != self.password:
+			self.respond(self.code('isc'))
+			return
+		self.respond(self.code('ok'))
+
+	def handle_logoff(self, request):
+		if self.state == 'session':
+			self.state = 'id'
+		self.respond(self.code('ok'))
+
+	def handle_terminate(self, request):
+		self.respond(self.code('ok'))
+		# the client may have already sent its next request
+		self._reset_session()
+
+	def reset(self):
+		"""
+		Return to the base state with the default settings and discard any
+		data which is buffered, this is done when a new client connects.
+		"""
+		self._reset_session()
+		self._read_buffer.clear()
+
+	def _reset_session(self):
+		# return to the base state, this is done when a terminate request is received
+		self.state = 'base'
+		self._reset_frame_state()
+		self.c1218_pktsize = self.max_pktsize
+		self.c1218_nbrpkts = self.max_nbrpkts
+		if self.baudrate:
+			self.baudrate = self.base_baudrate
+
+	def handle_read(self, request):
+		if self.state != 'session':
+			self.respond(self.code('isss'))
+			return
+		tableid = struct.unpack('>H', request[1:3])[0]
+		data = self.tables.get(tableid)
+		if data is None:
+			self.respond(self.code('onp'))
+			return
+		if request[0] == 0x3f:
+			offset = struct.unpack('>I', b'\x00' + request[3:6])[0]
+			octetcount = struct.unpack('>H', request[6:8])[0]
+			if offset >= len(data) and offset:
+				self.respond(self.code('onp'))
+				return
+			data = data[offset:offset + octetcount]
+		self.respond(C1218ReadResponse.create(data).build())
+
+	def handle_write(self, request):
+		if self.state != 'session':
+			self.respond(self.code('isss'))
+			return
+		tableid = struct.unpack('>H', request[1:3])[0]
+		if request[0] == 0x4f:
+			offset = struct.unpack('>I', b'\x00' + request[3:6])[0]
+			data = request[8:-1]
+		else:
+			offset = 0
+			data = request[5:-1]
+		if not check_data_checksum(data, request[-1]):
+			self.respond(self.code('err'))
+			return
+		if request[0] == 0x4f:
+			table = bytearray(self.tables.get(tableid, b''))
+			if len(table) < offset:
+				table.extend(b'\x00' * (offset - len(table)))
+			table[offset:offset + len(data)] = data
+			data = bytes(table)
+		self.tables[tableid] = data
+		if tableid == PROC_INITIATE_TBL and len(data) >= 3:
+			# report that the procedure completed
+			self.tables[PROC_RESPONSE_TBL] = data[:3] + b'\x00'
+		self.respond(self.code('ok'))
+
+def main():
+	parser = argparse.ArgumentParser(description='C12.18 Meter Simulator', conflict_handler='resolve')
+	parser.add_argument('-b', '--baud-rate', dest='baudrate', type=int, default=9600, help='the line rate to emulate (0 to disable)')
+	parser.add_argument('-m', '--max-baud-rate', dest='max_baudrate', type=int, default=9600, help='the highest baud rate to negotiate')
+	parser.add_argument('-p', '--password', dest='password', help='the password to require')
+	parser.add_argument('-L', '--log', dest='loglvl', action='store', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='WARNING', help='set the logging level')
+	parser.add_argument('--once', dest='once', action='store_true', default=False, help='exit after the first client disconnects')
+	parser.add_argument('url', help='the connection url or path to a unix socket to listen on')
+	parser.add_argument('csv_file', help='the table data written by the dump_tables module')
+	arguments = parser.parse_args()
+
+	logging.basicConfig(level=getattr(logging, arguments.loglvl), format='%(levelname)-8s %(message)s')
+	url = arguments.url
+	if '://' not in url:
+		url = 'unix://' + os.path.abspath(url) + '?mode=server'
+	tables = load_tables_csv(arguments.csv_file)
+	logging.getLogger('c1218.simulator').info("loaded {0:,} tables from {1}".format(len(tables), arguments.csv_file))
+
+	simulator = Simulator(url, tables=tables, baudrate=arguments.baudrate, max_baudrate=arguments.max_baudrate, password=arguments.password)
+	while True:
+		simulator.serve_forever()
+		if arguments.once or not hasattr(simulator.serial_h, 'accept'):
+			break
+		simulator.reset()
+		simulator.serial_h.accept()
+	simulator.serial_h.close()
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/stats.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import bisect
+import collections
+import struct
+import time
+
+from c1219.constants import PROC_INITIATE_TBL, PROC_RESPONSE_TBL
+
+timer = getattr(time, 'perf_counter', time.time)
+
+LATENCY_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+"""The upper bounds in seconds of the buckets used by :py:class:`.LatencyHistogram`."""
+
+SERVICE_NAMES = {
+	0x20: 'ident',
+	0x21: 'terminate',
+	0x30: 'read',
+	0x3f: 'read',
+	0x40: 'write',
+	0x4f: 'write',
+	0x50: 'logon',
+	0x51: 'security',
+	0x52: 'logoff',
+	0x70: 'wait',
+}
+SERVICE_NAMES.update((code, 'negotiate') for code in range(0x60, 0x6c))
+
+_PROCEDURE_TABLES = (struct.pack('>H', PROC_INITIATE_TBL), struct.pack('>H', PROC_RESPONSE_TBL))
+
+def get_service_name(frame):
+	"""
+	Determine the name of the service which a request frame is for. Reads
+	and writes of the procedure tables are reported as the 'procedure'
+	service.
+
+	:param bytes frame: The raw C12.18 frame of the request.
+	:rtype: str
+	"""
+	if len(frame) < 9:
+		return 'other'
+	name = SERVICE_NAMES.get(frame[6], 'other')
+	if (name == 'read' or name == 'write') and frame[7:9] in _PROCEDURE_TABLES:
+		return 'procedure'
+	return name
+
+class LatencyHistogram(object):
+	"""
+	A histogram of latencies with fixed buckets. Adding a value is a binary
+	search and an increment so it's cheap enough to do for every request.
+	Percentiles are estimated as the upper bound of the bucket they fall in.
+	"""
+	__slots__ = ('bounds', 'counts', 'count', 'total', 'minimum', 'maximum')
+	def __init__(self, bounds=LATENCY_BUCKETS):
+		"""
+		:param tuple bounds: The sorted upper bounds of the buckets, values
+		  larger than the last bound are counted in an overflow bucket.
+		"""
+		self.bounds = bounds
+		self.counts = [0] * (len(bounds) + 1)
+		self.count = 0
+		self.total = 0.0
+		self.minimum = None
+		self.maximum = None
+
+	def add(self, value):
+		"""
+		:param float value: The latency in seconds.
+		"""
+		self.counts[bisect.bisect_left(self.bounds, value)] += 1
+		self.count += 1
+		self.total += value
+		if self.minimum is None or value < self.minimum:
+			self.minimum = value
+		if self.maximum is None or value > self.maximum:
+			self.maximum = value
+
+	def merge(self, other):
+		"""
+		Add the values from another histogram with the same buckets.
+
+		:param other: The histogram to add the values from.
+		:type other: :py:class:`.LatencyHistogram`
+		"""
+		if other.bounds != self.bounds:
+			raise ValueError('can not merge histograms with different buckets')
+		self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+		self.count += other.count
+		self.total += other.total
+		if other.minimum is not None and (self.minimum is None or other.minimum < self.minimum):
+			self.minimum = other.minimum
+		if other.maximum is not None and (self.maximum is None or other.maximum > self.maximum):
+			self.maximum = other.maximum
+
+	@property
+	def mean(self):
+		if not self.count:
+			return None
+		return self.total / self.count
+
+	def percentile(self, percent):
+		"""
+		Estimate a percentile of the latencies.
+
+		:param float percent: The percentile to estimate (0 < percent <= 100).
+		:return: The estimated latency in seconds or None if there are no values.
+		"""
+		if not self.count:
+			return None
+		threshold = self.count * (percent / 100.0)
+		cumulative = 0
+		for index, count in enumerate(self.counts):
+			cumulative += count
+			if cumulative >= threshold:
+				break
+		if index == len(self.bounds):
+			return self.maximum
+		return min(self.bounds[index], self.maximum)
+
+	def to_dict(self):
+		return {
+			'count': self.count,
+			'total': self.total,
+			'min': self.minimum,
+			'max': self.maximum,
+			'mean': self.mean,
+			'p50': self.percentile(50),
+			'p90': self.percentile(90),
+			'p99': self.percentile(99),
+			# the overflow bucket has no upper bound
+			'buckets': [[bound, count] for bound, count in zip(self.bounds + (None,), self.counts)]
+		}
+
+class ServiceStats(object):
+	"""
+	The counters for a single C12.18 service.
+	"""
+	__slots__ = ('requests', 'bytes_sent', 'bytes_received', 'retries', 'errors', 'latency')
+	def __init__(self):
+		self.requests = 0
+		self.bytes_sent = 0
+		self.bytes_received = 0
+		self.retries = 0
+		self.errors = collections.Counter()
+		self.latency = LatencyHistogram()
+
+	def merge(self, other):
+		self.requests += other.requests
+		self.bytes_sent += other.bytes_sent
+		self.bytes_received += other.bytes_received
+		self.retries += other.retries
+		self.errors.update(other.errors)
+		self.latency.merge(other.latency)
+
+	def to_dict(self):
+		return {
+			'requests': self.requests,
+			'bytes_sent': self.bytes_sent,
+			'bytes_received': self.bytes_received,
+			'retries': self.retries,
+			'errors': dict(self.errors),
+			'latency': self.latency.to_dict()
+		}
+
+class ConnectionStats(object):
+	"""
+	The counters for each of the services used on one or more connections,
+	see :py:func:`.get_service_name` for the names of the services.
+	"""
+	def __init__(self):
+		self.services = collections.OrderedDict()
+
+	def __iter__(self):
+		return iter(self.services.items())
+
+	def __len__(self):
+		return len(self.services)
+
+	def get(self, name):
+		"""
+		Get the counters for a service, creating them if necessary.
+
+		:param str name: The name of the service.
+		:rtype: :py:class:`.ServiceStats`
+		"""
+		service = self.services.get(name)
+		if service is None:
+			service = self.services[name] = ServiceStats()
+		return service
+
+	def merge(self, other):
+		"""
+		Add the counters from another instance, this is used to combine the
+		counters of connections which were made concurrently.
+
+		:param other: The counters to add.
+		:type other: :py:class:`.ConnectionStats`
+		"""
+		for name, service in other:
+			self.get(name).merge(service)
+
+	def reset(self):
+		self.services.clear()
+
+	def to_dict(self):
+		return collections.OrderedDict((name, service.to_dict()) for name, service in self.services.items())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/trace.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import functools
+import os
+import threading
+import time
+
+timer = getattr(time, 'perf_counter', time.time)
+
+class _NullSpan(object):
+	__slots__ = ()
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		return False
+
+	def set(self, **kwargs):
+		pass
+
+_NULL_SPAN = _NullSpan()
+
+class NullTracer(object):
+	"""
+	A tracer which records nothing. This is the default so instrumented code
+	does not need to check whether or not tracing is enabled.
+	"""
+	enabled = False
+	def span(self, name, category='c1218', **kwargs):
+		return _NULL_SPAN
+
+	def instant(self, name, category='c1218', **kwargs):
+		pass
+
+NULL_TRACER = NullTracer()
+"""A shared instance of :py:class:`.NullTracer`."""
+
+class Span(object):
+	"""
+	A span of time which is being recorded by a :py:class:`.TraceRecorder`,
+	it is used as a context manager.
+	"""
+	__slots__ = ('recorder', 'name', 'category', 'args', 'start')
+	def __init__(self, recorder, name, category, args):
+		self.recorder = recorder
+		self.name = name
+		self.category = category
+		self.args = args
+		self.start = None
+
+	def __enter__(self):
+		self.start = timer()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is not None:
+			self.args['error'] = exc_type.__name__
+		self.recorder._add_complete(self.name, self.category, self.start, timer(), self.args)
+		return False
+
+	def set(self, **kwargs):
+		"""
+		Add arguments to the span, such as results which are not known when
+		the span is started.
+		"""
+		self.args.update(kwargs)
+
+class TraceRecorder(object):
+	"""
+	Records spans and instant events in the Chrome trace event format. The
+	resulting file can be opened with chrome://tracing or Perfetto. Events
+	from each thread are shown on their own track.
+	"""
+	enabled = True
+	def __init__(self):
+		self.events = []
+		self.pid = os.getpid()
+		self._start = timer()
+		self._threads = set()
+
+	def __len__(self):
+		return len(self.events)
+
+	def _timestamp(self, value):
+		# trace event timestamps are in microseconds
+		return round((value - self._start) * 1000000, 3)
+
+	def _get_tid(self):
+		tid = threading.current_thread().ident
+		if tid not in self._threads:
+			self._threads.add(tid)
+			self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': threading.current_thread().name}})
+		return tid
+
+	def _add_complete(self, name, category, start, end, args):
+		self.events.append({
+			'name': name,
+			'cat': category,
+			'ph': 'X',
+			'ts': self._timestamp(start),
+			'dur': round((end - start) * 1000000, 3),
+			'pid': self.pid,
+			'tid': self._get_tid(),
+			'args': args
+		})
+
+	def span(self, name, category='c1218', **kwargs):
+		"""
+		Create a span to record the time taken by the code within it.
+
+		:param str name: The name of the span.
+		:param str category: The category of the span.
+		:param kwargs: Arguments to display with the span.
+		:rtype: :py:class:`.Span`
+		"""
+		return Span(self, name, category, kwargs)
+
+	def instant(self, name, category='c1218', **kwargs):
+		"""
+		Record an event which does not have a duration, such as an error.
+
+		:param str name: The name of the event.
+		:param str category: The category of the event.
+		:param kwargs: Arguments to display with the event.
+		"""
+		self.events.append({
+			'name': name,
+			'cat': category,
+			'ph': 'i',
+			's': 't',
+			'ts': self._timestamp(timer()),
+			'pid': self.pid,
+			'tid': self._get_tid(),
+			'args': kwargs
+		})
+
+	def save(self, path):
+		"""
+		Write the recorded events to a file.
+
+		:param str path: The path of the file to write.
+		"""
+		import json
+		with open(path, 'w') as file_h:
+			json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, file_h, separators=(',', ':'))
+
+def traced(name=None, arg_names=()):
+	"""
+	A decorator for methods of objects with a ``tracer`` attribute which
+	records each call as a span.
+
+	:param str name: The name of the span, the name of the method is used by default.
+	:param tuple arg_names: The names of the leading positional arguments to
+	  add to the span.
+	"""
+	def decorator(method):
+		span_name = (name or method.__name__)
+		@functools.wraps(method)
+		def wrapper(self, *args, **kwargs):
+			tracer = self.tracer
+			if not tracer.enabled:
+				return method(self, *args, **kwargs)
+			with tracer.span(span_name, **dict(zip(arg_names, args))):
+				return method(self, *args, **kwargs)
+		return wrapper
+	return decorator
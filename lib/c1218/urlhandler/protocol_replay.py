@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1218/urlhandler/protocol_replay.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import bisect
+import logging
+import time
+
+try:
+	import urllib.parse as urlparse
+except ImportError:
+	import urlparse
+
+from c1218.recording import DIRECTION_READ, DIRECTION_WRITE, load_records
+from serial.serialutil import *
+
+class ReplaySerial(SerialBase):
+	"""
+	Serial port implementation which serves back the data from a session
+	recording. The data that was read during the recording becomes available
+	once the same number of bytes have been written as had been written before
+	it was originally received. URLs take the form of
+	``replay:///path/to/recording?pacing=original`` where pacing is either
+	``none`` (the default) to serve the data as fast as possible or
+	``original`` to reproduce the delays that were recorded.
+	"""
+	def open(self):
+		self.logger = None
+		if self._port is None:
+			raise SerialException('Port must be configured before it can be used.')
+		if self.isOpen():
+			raise SerialException('Port is already open.')
+		details = self.from_url(self.portstr)
+		try:
+			records = load_records(details['path'])
+		except (IOError, ValueError) as error:
+			raise SerialException("Could not open port {0}: {1}".format(self.portstr, repr(error)))
+		self._pacing = details['pacing']
+		# each chunk of read data is stored with the number of bytes which must
+		# be written before it is available and the delay after that write
+		self._chunks = []
+		self._expected = bytearray()
+		last_write = 0.0
+		for direction, offset, data in records:
+			if direction == DIRECTION_WRITE:
+				self._expected += data
+				last_write = offset
+			elif direction == DIRECTION_READ:
+				self._chunks.append((len(self._expected), offset - last_write, bytearray(data)))
+		self._chunk_index = 0
+		self._written = 0
+		self._write_totals = [0]
+		self._write_times = [time.time()]
+		self._mismatched = False
+		self.logger.info("loaded {0:,} read chunks from: {1}".format(len(self._chunks), details['path']))
+		self._set_open(True)
+
+	def _set_open(self, value):
+		# PySerial 3 uses is_open while older versions use _isOpen
+		self.is_open = value
+		self._isOpen = value
+
+	def isOpen(self):
+		return getattr(self, 'is_open', False) or getattr(self, '_isOpen', False)
+
+	def close(self):
+		self._set_open(False)
+
+	def from_url(self, url):
+		details = {}
+		url = urlparse.urlparse(url)
+		options = urlparse.parse_qs(url.query)
+		options_get = lambda key, default: options.get(key, [default])[0]
+		details['path'] = url.path
+		details['pacing'] = options_get('pacing', 'none')
+		assert(details['pacing'] in ('none', 'original'))
+		log_level = options_get('logging', 'ERROR').upper()
+		assert(log_level in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'))
+		self.logger = logging.getLogger('c1218.connection.replay')
+		self.logger.setLevel(getattr(logging, log_level))
+		return details
+
+	def _available_at(self, chunk):
+		required, delay, _ = chunk
+		if self._written < required:
+			return None
+		if self._pacing == 'none':
+			return 0
+		# find when the write which made this chunk available took place
+		index = bisect.bisect_left(self._write_totals, required)
+		return self._write_times[index] + delay
+
+	def _available(self, now):
+		size = 0
+		for chunk in self._chunks[self._chunk_index:]:
+			available_at = self._available_at(chunk)
+			if available_at is None or available_at > now:
+				break
+			size += len(chunk[2])
+		return size
+
+	@property
+	def in_waiting(self):
+		if not self.isOpen():
+			raise SerialException('Attempting to use a port that is not open')
+		return self._available(time.time())
+
+	def inWaiting(self):
+		return self.in_waiting
+
+	def read(self, size=1):
+		if not self.isOpen():
+			raise SerialException('Attempting to use a port that is not open')
+		data = bytearray()
+		if self._timeout is not None:
+			timeout = time.time() + self._timeout
+		else:
+			timeout = float('inf')
+		while len(data) < size and self._chunk_index < len(self._chunks):
+			chunk = self._chunks[self._chunk_index]
+			available_at = self._available_at(chunk)
+			if available_at is None or available_at > timeout:
+				# nothing more will arrive until more data is written
+				break
+			now = time.time()
+			if available_at > now:
+				time.sleep(available_at - now)
+			chunk_data = chunk[2]
+			needed = size - len(data)
+			data += chunk_data[:needed]
+			if needed < len(chunk_data):
+				del chunk_data[:needed]
+			else:
+				self._chunk_index += 1
+		return bytes(data)
+
+	def write(self, data):
+		if not self.isOpen():
+			raise SerialException('Attempting to use a port that is not open')
+		data = bytes(data)
+		expected = bytes(self._expected[self._written:self._written + len(data)])
+		if data != expected and not self._mismatched:
+			self.logger.warning("written data differs from the recording at offset {0:,}".format(self._written))
+			self._mismatched = True
+		self._written += len(data)
+		self._write_totals.append(self._written)
+		self._write_times.append(time.time())
+		return len(data)
+
+	def reset_input_buffer(self):
+		now = time.time()
+		while self._chunk_index < len(self._chunks):
+			available_at = self._available_at(self._chunks[self._chunk_index])
+			if available_at is None or available_at > now:
+				break
+			self._chunk_index += 1
+
+	def flushInput(self):
+		self.reset_input_buffer()
+
+	def reset_output_buffer(self):
+		pass
+
+	def flushOutput(self):
+		self.reset_output_buffer()
+
+	def _reconfigure_port(self, *args, **kwargs):
+		pass
+
+	def _update_rts_state(self):
+		pass
+
+	def _update_dtr_state(self):
+		pass
+
+	def _update_break_state(self):
+		pass
+
+	def setRTS(self, level=True):
+		self._rts_state = level
+
+	def setDTR(self, level=True):
+		self._dtr_state = level
+
+# assemble Serial class with the platform specific implementation and the base
+# for file-like behavior. for Python 2.6 and newer, that provide the new I/O
+# library, derive from io.RawIOBase
+try:
+	import io
+except ImportError:
+	# classic version with our own file-like emulation
+	class Serial(ReplaySerial, FileLike):
+		pass
+else:
+	# io library present
+	class Serial(ReplaySerial, io.RawIOBase):
+		pass
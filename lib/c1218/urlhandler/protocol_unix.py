@@ -32,14 +32,25 @@
 
 from __future__ import unicode_literals
 
+import fcntl
 import logging
 import os
 import socket
+import struct
+import termios
 import time
-import urlparse
+
+try:
+	import urllib.parse as urlparse
+except ImportError:
+	import urlparse
 
 from serial.serialutil import *
-from serial.urlhandler.protocol_socket import SocketSerial
+try:
+	from serial.urlhandler.protocol_socket import SocketSerial
+except ImportError:
+	# PySerial 3 renamed the class
+	from serial.urlhandler.protocol_socket import Serial as SocketSerial
 
 class UnixSerial(SocketSerial):
 	"""
@@ -49,7 +60,7 @@ class UnixSerial(SocketSerial):
 		self.logger = None
 		if self._port is None:
 			raise SerialException('Port must be configured before it can be used.')
-		if self._isOpen:
+		if self.isOpen():
 			raise SerialException('Port is already open.')
 		try:
 			self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -68,10 +79,35 @@ class UnixSerial(SocketSerial):
 			self._socket = None
 			raise SerialException("Could not open port {0}: {1}".format(self.portstr, repr(error)))
 		self._socket.settimeout(2)
-		self._isOpen = True
+		self._set_open(True)
+
+	def accept(self):
+		"""
+		When in server mode, close the connection to the current client and
+		wait for the next one to connect. The listening socket is kept open
+		so clients connecting in the meantime are not refused.
+		"""
+		if not hasattr(self, '_server_socket'):
+			raise SerialException('Port is not in server mode.')
+		if self._socket:
+			try:
+				self._socket.shutdown(socket.SHUT_RDWR)
+				self._socket.close()
+			except:
+				pass
+		self._socket = self._server_socket.accept()[0]
+		self._socket.settimeout(2)
+
+	def _set_open(self, value):
+		# PySerial 3 uses is_open while older versions use _isOpen
+		self.is_open = value
+		self._isOpen = value
+
+	def isOpen(self):
+		return getattr(self, 'is_open', False) or getattr(self, '_isOpen', False)
 
 	def close(self):
-		if not self._isOpen:
+		if not self.isOpen():
 			return
 		if self._socket:
 			try:
@@ -89,7 +125,7 @@ class UnixSerial(SocketSerial):
 				pass
 			delattr(self, '_server_socket')
 			os.unlink(socket_file)
-		self._isOpen = False
+		self._set_open(False)
 
 	def from_url(self, url):
 		details = {}
@@ -105,9 +141,19 @@ class UnixSerial(SocketSerial):
 		self.logger.setLevel(getattr(logging, log_level))
 		return details
 
+	@property
+	def in_waiting(self):
+		if not self.isOpen():
+			raise SerialException('Attempting to use a port that is not open')
+		count = fcntl.ioctl(self._socket.fileno(), termios.FIONREAD, b'\x00\x00\x00\x00')
+		return struct.unpack('I', count)[0]
+
+	def inWaiting(self):
+		return self.in_waiting
+
 	def read(self, size=1):
-		if not self._isOpen:
-			raise portNotOpenError
+		if not self.isOpen():
+			raise SerialException('Attempting to use a port that is not open')
 		data = bytearray()
 		if self._timeout != None:
 			timeout = time.time() + self._timeout
@@ -115,11 +161,14 @@ class UnixSerial(SocketSerial):
 			timeout = float('inf')
 		while len(data) < size and time.time() < timeout:
 			try:
-				data = self._socket.recv(size - len(data))
+				chunk = self._socket.recv(size - len(data))
 			except socket.timeout:
 				continue
 			except socket.error as error:
 				raise SerialException('connection failed (' + str(error) + ')')
+			if not chunk:
+				raise SerialException('connection closed')
+			data += chunk
 		return bytes(data)
 
 # assemble Serial class with the platform specific implementation and the base
@@ -32,9 +32,13 @@
 
 from __future__ import unicode_literals
 
+import binascii
+import collections
+import logging
 import struct
+import time
 
-import crcelk
+from c1218.checksum import byte_sum, crc_hdlc
 
 def check_data_checksum(data, checksum):
 	if isinstance(checksum, int):
@@ -42,12 +46,51 @@ def check_data_checksum(data, checksum):
 	return data_checksum(data) == checksum
 
 def data_checksum(data):
-	chksum = 0
-	for i in struct.unpack('B' * len(data), data):
-		chksum += i
-	chksum = ((chksum - 1) & 0xff) ^ 0xff
-	return struct.pack('B', chksum)
+	return struct.pack('B', byte_sum(data))
 
 def packet_checksum(data):
-	chksum = crcelk.CRC_HDLC.calc_bytes(data)
-	return struct.pack('<H', chksum)
+	return struct.pack('<H', crc_hdlc(data))
+
+class FrameHistory(object):
+	"""
+	A fixed size record of the most recently sent and received frames. The
+	frames are stored as raw bytes and are only formatted when the history is
+	dumped, which is intended to be done when an error occurs.
+	"""
+	def __init__(self, size=16):
+		"""
+		:param int size: The maximum number of frames to keep.
+		"""
+		self._frames = collections.deque(maxlen=size)
+
+	def __len__(self):
+		return len(self._frames)
+
+	def append(self, direction, data):
+		"""
+		Add a frame to the history, discarding the oldest one if the history
+		is full. Bytes are stored as they are without being copied, any other
+		buffer is copied because it may be reused after this returns.
+
+		:param str direction: Either 'sent' or 'received'.
+		:param bytes data: The raw frame data.
+		"""
+		if not isinstance(data, bytes):
+			data = bytes(data)
+		self._frames.append((time.time(), direction, data))
+
+	def clear(self):
+		self._frames.clear()
+
+	def dump(self, logger, level=logging.ERROR):
+		"""
+		Log each of the frames in the history.
+
+		:param logger: The logger to write the frames to.
+		:param int level: The level to log the frames at.
+		"""
+		if not logger.isEnabledFor(level):
+			return
+		logger.log(level, "dumping the last {0} frames".format(len(self._frames)))
+		for timestamp, direction, data in self._frames:
+			logger.log(level, "{0:.3f} {1:<8} length: {2:<3} data: {3}".format(timestamp, direction, len(data), binascii.b2a_hex(data).decode('utf-8')))
@@ -45,6 +45,39 @@ from c1218.errors import C1218ReadTableError
 from c1219.constants import *
 from c1219.errors import C1219ParseError
 
+def parse_tables_used(general_config_table):
+	"""
+	Parse the bit sets of the tables and procedures which are used by the
+	device from the data of GEN_CONFIG_TBL.
+
+	:param bytes general_config_table: The data read from GEN_CONFIG_TBL.
+	:return: Tuple of (std_tbls_used, mfg_tbls_used, std_proc_used, mfg_proc_used)
+	:rtype: tuple
+	"""
+	if len(general_config_table) < 19:
+		raise C1219ParseError('expected to read more data from GEN_CONFIG_TBL', GEN_CONFIG_TBL)
+	used = []
+	offset = 19
+	for dim in general_config_table[13:17]:
+		bit_set = general_config_table[offset:offset + dim]
+		if len(bit_set) != dim:
+			raise C1219ParseError('expected to read more data from GEN_CONFIG_TBL', GEN_CONFIG_TBL)
+		used.append([(p * 8) + i for p in range(dim) for i in range(8) if bit_set[p] & (1 << i)])
+		offset += dim
+	return tuple(used)
+
+def get_tables_used(conn):
+	"""
+	Read GEN_CONFIG_TBL and return the ids of the standard and manufacturer
+	tables which the device declares that it uses. Manufacturer table ids
+	are offset by :py:data:`.MFG_TBL_OFFSET`.
+
+	@type conn: c1218.connection.Connection
+	@param conn: The driver to be used for reading GEN_CONFIG_TBL.
+	"""
+	std_tbls_used, mfg_tbls_used, _, _ = parse_tables_used(conn.get_table_data(GEN_CONFIG_TBL))
+	return std_tbls_used + [MFG_TBL_OFFSET + table_id for table_id in mfg_tbls_used]
+
 class C1219GeneralAccess(object):  # Corresponds To Decade 0x
 	"""
 	This class provides generic access to the general configuration tables
@@ -92,34 +125,7 @@ class C1219GeneralAccess(object):  # Corresponds To Decade 0x
 		self._dim_mfg_tables_used = general_config_table[14]
 		self._dim_std_proc_used = general_config_table[15]
 		self._dim_mfg_proc_used = general_config_table[16]
-
-		self._std_tables_used = []
-		tmp_data = general_config_table[19:]
-		for p in range(self._dim_std_tables_used):
-			for i in range(7):
-				if tmp_data[p] & (2 ** i):
-					self._std_tables_used.append(i + (p * 8))
-
-		self._mfg_tables_used = []
-		tmp_data = tmp_data[self._dim_std_tables_used:]
-		for p in range(self._dim_mfg_tables_used):
-			for i in range(7):
-				if tmp_data[p] & (2 ** i):
-					self._mfg_tables_used.append(i + (p * 8))
-
-		self._std_proc_used = []
-		tmp_data = tmp_data[self._dim_mfg_tables_used:]
-		for p in range(self._dim_std_proc_used):
-			for i in range(7):
-				if tmp_data[p] & (2 ** i):
-					self._std_proc_used.append(i + (p * 8))
-
-		self._mfg_proc_used = []
-		tmp_data = tmp_data[self._dim_std_proc_used:]
-		for p in range(self._dim_mfg_proc_used):
-			for i in range(7):
-				if tmp_data[p] & (2 ** i):
-					self._mfg_proc_used.append(i + (p * 8))
+		(self._std_tables_used, self._mfg_tables_used, self._std_proc_used, self._mfg_proc_used) = parse_tables_used(general_config_table)
 
 		### Parse GENERAL_MFG_ID_TBL ###
 		self._manufacturer = general_mfg_table[0:4].rstrip().decode(encoding)
@@ -45,6 +45,91 @@ from c1219.constants import *
 from c1219.data import get_table_idcb_field
 from c1219.errors import C1219ParseError
 
+def parse_access_control_table(endianess, access_ctl_table, nbr_perm_used):
+	"""
+	Parse the permission entries from the data of ACCESS_CONTROL_TBL.
+
+	:param str endianess: The endianess to use when unpacking values ('>' or '<')
+	:param bytes access_ctl_table: The data read from ACCESS_CONTROL_TBL.
+	:param int nbr_perm_used: The number of entries from ACT_SECURITY_LIMITING_TBL.
+	:return: Tuple of (table_permissions, procedure_permissions) keyed by their number
+	:rtype: tuple
+	"""
+	if len(access_ctl_table) != (nbr_perm_used * 4):
+		raise C1219ParseError('expected to read more data from ACCESS_CONTROL_TBL', ACCESS_CONTROL_TBL)
+	table_permissions = {}
+	procedure_permissions = {}
+	tmp = 0
+	while tmp < nbr_perm_used:
+		(proc_nbr, std_vs_mfg, proc_flag, flag1, flag2, flag3) = get_table_idcb_field(endianess, access_ctl_table)
+		if proc_flag:
+			procedure_permissions[proc_nbr] = {'idx': proc_nbr, 'mfg': std_vs_mfg, 'anyread': flag1, 'anywrite': flag2, 'read': access_ctl_table[2], 'write': access_ctl_table[3]}
+		else:
+			table_permissions[proc_nbr] = {'idx': proc_nbr, 'mfg': std_vs_mfg, 'anyread': flag1, 'anywrite': flag2, 'read': access_ctl_table[2], 'write': access_ctl_table[3]}
+		access_ctl_table = access_ctl_table[4:]
+		tmp += 1
+	return table_permissions, procedure_permissions
+
+def get_table_permissions(conn):
+	"""
+	Read the table permissions from ACCESS_CONTROL_TBL without the other
+	security tables, which are often not readable. The permissions are keyed
+	by table id with manufacturer table ids offset by
+	:py:data:`.MFG_TBL_OFFSET`.
+
+	@type conn: c1218.connection.Connection
+	@param conn: The driver to be used for reading the tables.
+	"""
+	act_security_table = conn.get_table_data(ACT_SECURITY_LIMITING_TBL)
+	if len(act_security_table) < 6:
+		raise C1219ParseError('expected to read more data from ACT_SECURITY_LIMITING_TBL', ACT_SECURITY_LIMITING_TBL)
+	nbr_perm_used = struct.unpack(conn.c1219_endian + 'H', act_security_table[4:6])[0]
+	table_permissions = {}
+	for permission in parse_access_control_table(conn.c1219_endian, conn.get_table_data(ACCESS_CONTROL_TBL), nbr_perm_used)[0].values():
+		table_permissions[permission['idx'] + (MFG_TBL_OFFSET if permission['mfg'] else 0)] = permission
+	return table_permissions
+
+def get_password_groups(conn, password):
+	"""
+	Find the access groups which are granted to a password from SECURITY_TBL.
+	None is returned if SECURITY_TBL can not be read or the password is not
+	present in it.
+
+	@type conn: c1218.connection.Connection
+	@param conn: The driver to be used for reading the tables.
+	@type password: bytes
+	@param password: The password used to log in to the device.
+	"""
+	try:
+		act_security_table = conn.get_table_data(ACT_SECURITY_LIMITING_TBL)
+		security_table = conn.get_table_data(SECURITY_TBL)
+	except C1218ReadTableError:
+		return None
+	nbr_passwords = act_security_table[0]
+	password_len = act_security_table[1]
+	password = (password + (b'\x00' * password_len))[:password_len]
+	for idx in range(nbr_passwords):
+		entry = security_table[idx * (password_len + 1):(idx + 1) * (password_len + 1)]
+		if len(entry) == password_len + 1 and entry[:password_len] == password:
+			return entry[password_len]
+	return None
+
+def is_table_readable(permission, groups=None):
+	"""
+	Check whether a table can be read based on its entry from
+	ACCESS_CONTROL_TBL. When *groups* is None, only tables which no group can
+	read are reported as unreadable.
+
+	:param dict permission: The table's permission entry.
+	:param int groups: The access groups of the current user.
+	:rtype: bool
+	"""
+	if permission['anyread']:
+		return True
+	if groups is None:
+		return bool(permission['read'])
+	return bool(permission['read'] & groups)
+
 class C1219SecurityAccess(object):  # Corresponds To Decade 4x
 	"""
 	This class provides generic access to the security configuration tables
@@ -89,19 +174,7 @@ class C1219SecurityAccess(object):  # Corresponds To Decade 4x
 			tmp += 1
 
 		### Parse ACCESS_CONTROL_TBL ###
-		if len(access_ctl_table) != (self.nbr_perm_used * 4):
-			raise C1219ParseError('expected to read more data from ACCESS_CONTROL_TBL', ACCESS_CONTROL_TBL)
-		self._table_permissions = {}
-		self._procedure_permissions = {}
-		tmp = 0
-		while tmp < self.nbr_perm_used:
-			(proc_nbr, std_vs_mfg, proc_flag, flag1, flag2, flag3) = get_table_idcb_field(self.conn.c1219_endian, access_ctl_table)
-			if proc_flag:
-				self._procedure_permissions[proc_nbr] = {'idx': proc_nbr, 'mfg': std_vs_mfg, 'anyread': flag1, 'anywrite': flag2, 'read': access_ctl_table[2], 'write': access_ctl_table[3]}
-			else:
-				self._table_permissions[proc_nbr] = {'idx': proc_nbr, 'mfg': std_vs_mfg, 'anyread': flag1, 'anywrite': flag2, 'read': access_ctl_table[2], 'write': access_ctl_table[3]}
-			access_ctl_table = access_ctl_table[4:]
-			tmp += 1
+		self._table_permissions, self._procedure_permissions = parse_access_control_table(self.conn.c1219_endian, access_ctl_table, self.nbr_perm_used)
 
 		### Parse KEY_TBL ###
 		self._keys = {}
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  c1219/cache.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import collections
+import logging
+import threading
+import time
+
+from c1219.constants import *
+
+CACHE_POLICY_NEVER = 'never'
+"""Tables with this policy are never cached."""
+CACHE_POLICY_STATIC = 'static'
+"""Tables with this policy are cached until they are evicted or written to."""
+CACHE_POLICY_TTL = 'ttl'
+"""Tables with this policy are cached for a limited amount of time."""
+
+CACHE_POLICIES = {
+	GEN_CONFIG_TBL: CACHE_POLICY_STATIC,
+	GENERAL_MFG_ID_TBL: CACHE_POLICY_STATIC,
+	2: CACHE_POLICY_STATIC,  # device nameplate table
+	DEVICE_IDENT_TBL: CACHE_POLICY_STATIC,
+	DIM_REGS_TBL: CACHE_POLICY_TTL,
+	ACT_REGS_TBL: CACHE_POLICY_TTL,
+	DATA_SELECTION_TBL: CACHE_POLICY_TTL,
+	PRESENT_REGISTER_SELECT_TBL: CACHE_POLICY_TTL,
+	DIM_DISP_TBL: CACHE_POLICY_TTL,
+	ACT_DISP_TBL: CACHE_POLICY_TTL,
+	DISP_SOURCE_TBL: CACHE_POLICY_TTL,
+	PRI_DISP_LIST_TBL: CACHE_POLICY_TTL,
+	SEC_DISP_LIST_TBL: CACHE_POLICY_TTL,
+	DIM_SECURITY_LIMITING_TBL: CACHE_POLICY_TTL,
+	ACT_SECURITY_LIMITING_TBL: CACHE_POLICY_TTL,
+	DEFAULT_ACCESS_CONTROL_TBL: CACHE_POLICY_TTL,
+	ACCESS_CONTROL_TBL: CACHE_POLICY_TTL,
+	ACT_LOG_TBL: CACHE_POLICY_TTL,
+	ACT_TELEPHONE_TBL: CACHE_POLICY_TTL,
+	GLOBAL_PARAMETERS_TBL: CACHE_POLICY_TTL,
+	ORIGINATE_PARAMETERS_TBL: CACHE_POLICY_TTL,
+	ORIGINATE_SCHEDULE_TBL: CACHE_POLICY_TTL,
+	ANSWER_PARAMETERS_TBL: CACHE_POLICY_TTL,
+	CALL_PURPOSE_TBL: CACHE_POLICY_TTL,
+}
+"""The default cache policies for tables, tables which are not included are
+never cached."""
+
+PERSISTENT_TABLES = (
+	GEN_CONFIG_TBL,
+	2,  # device nameplate table
+	DIM_REGS_TBL,
+	ACT_REGS_TBL,
+	DIM_DISP_TBL,
+	ACT_DISP_TBL,
+	DIM_SECURITY_LIMITING_TBL,
+	ACT_SECURITY_LIMITING_TBL,
+	ACT_LOG_TBL,
+	ACT_TELEPHONE_TBL,
+)
+"""The tables which are stored on disk by default by a
+:py:class:`.PersistentTableCache`. These describe the meter and do not change
+unless it is reprogrammed."""
+
+class TableCache(object):
+	"""
+	A cache of table data which is bounded by the total size of the data it
+	holds. When the cache is full, the least recently used tables are
+	evicted. Entries are keyed by the identity of the meter, which is the
+	contents of GENERAL_MFG_ID_TBL (table #1), so that data read from one
+	meter is never returned for another one. Until the identity is known,
+	new entries are held for the current meter and no previously cached data
+	is returned.
+	"""
+	def __init__(self, max_size=262144, ttl=300, policies=None):
+		"""
+		:param int max_size: The maximum number of bytes of table data to
+		  hold.
+		:param int ttl: The number of seconds that tables with the TTL policy
+		  are valid for.
+		:param dict policies: Cache policies to use in addition to the
+		  defaults from :py:data:`.CACHE_POLICIES`.
+		"""
+		self.logger = logging.getLogger('c1219.cache')
+		self.max_size = max_size
+		self.ttl = ttl
+		self.policies = dict(CACHE_POLICIES)
+		if policies:
+			self.policies.update(policies)
+		self.identity = None
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._entries = collections.OrderedDict()
+
+	def __contains__(self, tableid):
+		return self._lookup(tableid) is not None
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _evict(self, key):
+		data, _ = self._entries.pop(key)
+		self.size -= len(data)
+
+	def _lookup(self, tableid):
+		if self.identity is None:
+			return None
+		key = (self.identity, tableid)
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		if entry[1] is not None and entry[1] < time.time():
+			self._evict(key)
+			return None
+		return key
+
+	def get_policy(self, tableid):
+		"""
+		Get the cache policy for a table.
+
+		:param int tableid: The table to get the policy for.
+		:return: The cache policy.
+		:rtype: str
+		"""
+		return self.policies.get(tableid, CACHE_POLICY_NEVER)
+
+	def set_policy(self, tableid, policy):
+		"""
+		Set the cache policy for a table, any data that is cached for the
+		table is removed.
+
+		:param int tableid: The table to set the policy for.
+		:param str policy: The cache policy to use.
+		"""
+		if policy not in (CACHE_POLICY_NEVER, CACHE_POLICY_STATIC, CACHE_POLICY_TTL):
+			raise ValueError('unknown cache policy: ' + policy)
+		self.policies[tableid] = policy
+		self.invalidate(tableid)
+
+	def needs_identity(self, tableid):
+		"""
+		Check whether the identity of the meter must be determined before
+		cached data for a table can be returned.
+
+		:param int tableid: The table which is about to be read.
+		:rtype: bool
+		"""
+		if self.identity is not None or tableid == GENERAL_MFG_ID_TBL:
+			return False
+		if self.get_policy(GENERAL_MFG_ID_TBL) == CACHE_POLICY_NEVER:
+			return False
+		return self.get_policy(tableid) != CACHE_POLICY_NEVER
+
+	def get(self, tableid):
+		"""
+		Get the cached data for a table.
+
+		:param int tableid: The table to retrieve.
+		:return: The table data if it is cached, otherwise None.
+		:rtype: bytes
+		"""
+		if self.get_policy(tableid) == CACHE_POLICY_NEVER:
+			return None
+		key = self._lookup(tableid)
+		if key is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self._entries.move_to_end(key)
+		return self._entries[key][0]
+
+	def put(self, tableid, data):
+		"""
+		Store data for a table in the cache if its policy allows it. Storing
+		GENERAL_MFG_ID_TBL (table #1) while the identity is unknown sets the
+		identity of the meter.
+
+		:param int tableid: The table which the data is from.
+		:param bytes data: The data of the entire table.
+		"""
+		policy = self.get_policy(tableid)
+		if policy == CACHE_POLICY_NEVER:
+			return
+		data = bytes(data)
+		if tableid == GENERAL_MFG_ID_TBL and self.identity is None:
+			self.set_identity(data)
+		if len(data) > self.max_size:
+			return
+		key = (self.identity, tableid)
+		if key in self._entries:
+			self._evict(key)
+		expires = (time.time() + self.ttl if policy == CACHE_POLICY_TTL else None)
+		self._entries[key] = (data, expires)
+		self.size += len(data)
+		while self.size > self.max_size:
+			self._evict(next(iter(self._entries)))
+			self.evictions += 1
+
+	def invalidate(self, tableid):
+		"""
+		Remove the data for a table of the current meter from the cache.
+
+		:param int tableid: The table to remove.
+		"""
+		key = (self.identity, tableid)
+		if key in self._entries:
+			self._evict(key)
+
+	def clear(self):
+		"""
+		Remove all of the data from the cache.
+		"""
+		self._entries.clear()
+		self.size = 0
+
+	def reset_identity(self):
+		"""
+		Forget the identity of the meter, this should be called when a new
+		session is started because it may be with a different meter. Entries
+		which were added while the identity was unknown are discarded.
+		"""
+		for key in [key for key in self._entries if key[0] is None]:
+			self._evict(key)
+		self.identity = None
+
+	def set_identity(self, identity):
+		"""
+		Set the identity of the meter. Entries which were added while the
+		identity was unknown are assigned to it.
+
+		:param bytes identity: The identity of the meter.
+		"""
+		identity = bytes(identity)
+		for key in [key for key in self._entries if key[0] is None]:
+			entry = self._entries.pop(key)
+			key = (identity, key[1])
+			if key in self._entries:
+				self._evict(key)
+			self._entries[key] = entry
+		self.identity = identity
+		self.logger.debug('set the meter identity for cached tables')
+
+	@property
+	def stats(self):
+		"""
+		A dictionary of statistics for the cache.
+		"""
+		return {
+			'entries': len(self._entries),
+			'evictions': self.evictions,
+			'hits': self.hits,
+			'misses': self.misses,
+			'size': self.size
+		}
+
+class PersistentTableCache(TableCache):
+	"""
+	A table cache which additionally stores tables describing the meter in a
+	SQLite database so they are available the next time the same meter is
+	connected to. Meters are identified by the manufacturer, model and serial
+	number from GENERAL_MFG_ID_TBL (table #1) and the stored tables are
+	discarded when the firmware version or revision changes.
+	"""
+	def __init__(self, path, persistent_tables=None, **kwargs):
+		"""
+		:param str path: The path to the database file to use.
+		:param tuple persistent_tables: The tables to store on disk, the
+		  default is :py:data:`.PERSISTENT_TABLES`.
+		"""
+		import sqlite3
+		super(PersistentTableCache, self).__init__(**kwargs)
+		self.path = path
+		self.persistent_tables = set(PERSISTENT_TABLES if persistent_tables is None else persistent_tables)
+		self._db_lock = threading.Lock()
+		self._db = sqlite3.connect(path, check_same_thread=False)
+		with self._db_lock, self._db:
+			self._db.execute('CREATE TABLE IF NOT EXISTS meters (manufacturer BLOB, model BLOB, serial BLOB, firmware BLOB, PRIMARY KEY (manufacturer, model, serial))')
+			self._db.execute('CREATE TABLE IF NOT EXISTS tables (manufacturer BLOB, model BLOB, serial BLOB, tableid INTEGER, data BLOB, PRIMARY KEY (manufacturer, model, serial, tableid))')
+		self._meter = None
+
+	@staticmethod
+	def _parse_identity(identity):
+		if len(identity) < 17:
+			return None, None
+		# manufacturer, model and serial number
+		meter = (identity[0:4], identity[4:12], identity[16:])
+		# firmware version and revision
+		return meter, identity[14:16]
+
+	def _store(self, tableid, data):
+		with self._db_lock, self._db:
+			self._db.execute('INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?)', self._meter + (tableid, data))
+
+	def put(self, tableid, data):
+		super(PersistentTableCache, self).put(tableid, data)
+		if self._meter is not None and tableid in self.persistent_tables and self.get_policy(tableid) != CACHE_POLICY_NEVER:
+			self._store(tableid, bytes(data))
+
+	def invalidate(self, tableid):
+		super(PersistentTableCache, self).invalidate(tableid)
+		if self._meter is not None:
+			with self._db_lock, self._db:
+				self._db.execute('DELETE FROM tables WHERE manufacturer = ? AND model = ? AND serial = ? AND tableid = ?', self._meter + (tableid,))
+
+	def reset_identity(self):
+		super(PersistentTableCache, self).reset_identity()
+		self._meter = None
+
+	def set_identity(self, identity):
+		super(PersistentTableCache, self).set_identity(identity)
+		meter, firmware = self._parse_identity(self.identity)
+		self._meter = meter
+		if meter is None:
+			return
+		# tables which were read before the meter was identified
+		unsaved = [(key[1], entry[0]) for key, entry in self._entries.items() if key[0] == self.identity and key[1] in self.persistent_tables]
+		with self._db_lock, self._db:
+			row = self._db.execute('SELECT firmware FROM meters WHERE manufacturer = ? AND model = ? AND serial = ?', meter).fetchone()
+			if row is not None and bytes(row[0]) != firmware:
+				self.logger.info('the firmware has changed, discarding the stored tables for the meter')
+				self._db.execute('DELETE FROM tables WHERE manufacturer = ? AND model = ? AND serial = ?', meter)
+			self._db.execute('INSERT OR REPLACE INTO meters VALUES (?, ?, ?, ?)', meter + (firmware,))
+			self._db.executemany('INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?)', (meter + (tableid, data) for tableid, data in unsaved))
+			rows = self._db.execute('SELECT tableid, data FROM tables WHERE manufacturer = ? AND model = ? AND serial = ?', meter).fetchall()
+		loaded = 0
+		for tableid, data in rows:
+			if tableid not in self.persistent_tables or (self.identity, tableid) in self._entries:
+				continue
+			super(PersistentTableCache, self).put(tableid, bytes(data))
+			loaded += 1
+		if loaded:
+			self.logger.info("loaded {0} stored tables for the meter".format(loaded))
+
+	def close(self):
+		"""
+		Close the database.
+		"""
+		with self._db_lock:
+			self._db.close()
@@ -69,6 +69,9 @@ CALL_PURPOSE_TBL = 96
 CALL_STATUS_TBL = 97
 ORIGINATE_STATUS_TBL = 98
 
+# manufacturer tables are numbered from this offset
+MFG_TBL_OFFSET = 2048
+
 C1219_TABLES = {
 	0: 'General Configuration Table',
 	1: 'General Manufacturer Identification Table',
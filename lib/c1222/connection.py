@@ -32,11 +32,15 @@
 
 from __future__ import unicode_literals
 
+import binascii
 import logging
 import random
 import select
 import socket
 
+from c1218.capture import INTERFACE_C1222
+from c1218.utilities import FrameHistory
+from c1219.cache import TableCache
 from c1222.data import *
 from c1222.errors import C1222IOError
 
@@ -48,9 +52,11 @@ def sock_read_ready(socket, timeout):
 	return len(readys[0]) == 1
 
 class Connection(object):
-	def __init__(self, host, called_ap, calling_ap, enable_cache=True, bind_host=('', 1153)):
+	def __init__(self, host, called_ap, calling_ap, enable_cache=True, bind_host=('', 1153), table_cache=None, capture=None):
 		self.logger = logging.getLogger('c1222.connection')
 		self.loggerio = logging.getLogger('c1222.connection.io')
+		self.frame_history = FrameHistory()
+		self.capture = capture
 
 		self.read_timeout = 3.0
 		self.server_sock_h = None
@@ -74,8 +80,9 @@ class Connection(object):
 		self._initialized = False
 		self.c1219_endian = '<'
 		self.caching_enabled = enable_cache
-		self._cacheable_tables = [0, 1]
-		self._table_cache = {}
+		if table_cache is None:
+			table_cache = TableCache()
+		self.table_cache = table_cache
 		if enable_cache:
 			self.logger.info('selective table caching has been enabled')
 
@@ -98,8 +105,10 @@ class Connection(object):
 			readable = select.select([self.sock_h.fileno(), self.server_sock_h.fileno()], [], [], self.read_timeout)
 			readable = readable[0]
 			if len(readable) > 1:
+				self.frame_history.dump(self.loggerio)
 				raise C1222IOError('too many file handles available for reading')
 			if len(readable) < 1:
+				self.frame_history.dump(self.loggerio)
 				raise C1222IOError('not enough file handles available for reading')
 			readable = readable[0]
 			if readable == self.server_sock_h.fileno():
@@ -117,6 +126,11 @@ class Connection(object):
 			data += tmp_data
 			if len(tmp_data) != 8192:
 				break
+		self.frame_history.append('received', data)
+		if self.capture is not None and data:
+			self.capture.write_packet(data, True, interface=INTERFACE_C1222)
+		if self.loggerio.isEnabledFor(logging.DEBUG):
+			self.loggerio.debug("received packet, length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
 		pkt = C1222Packet.from_bytes(data)
 		if not isinstance(pkt.data, C1222UserInformation):
 			return pkt.data
@@ -124,9 +138,20 @@ class Connection(object):
 
 	def send(self, data):
 		pkt = C1222Packet(self.called_ap, self.calling_ap, random.randint(0, 999999), data=C1222UserInformation(C1222EPSEM(data)))
-		self.sock_h.send(pkt.build())
+		data = pkt.build()
+		self.frame_history.append('sent', data)
+		if self.capture is not None:
+			self.capture.write_packet(data, False, interface=INTERFACE_C1222)
+		if self.loggerio.isEnabledFor(logging.DEBUG):
+			self.loggerio.debug("sending packet,  length: {0:<3} data: {1}".format(len(data), binascii.b2a_hex(data).decode('utf-8')))
+		self.sock_h.send(data)
+
+	def flush_table_cache(self):
+		self.logger.info('flushing all cached tables')
+		self.table_cache.clear()
 
 	def start(self):
+		self.table_cache.reset_identity()
 		self.send(C1222IdentRequest())
 		try:
 			self.recv()
@@ -137,6 +162,8 @@ class Connection(object):
 		return False
 
 	def close(self):
+		if self.capture is not None:
+			self.capture.flush()
 		self.sock_h.close()
 		if self.read_sock_h is not None:
 			self.read_sock_h.close()
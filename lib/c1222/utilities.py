@@ -34,15 +34,10 @@ from __future__ import unicode_literals
 
 import struct
 
-import crcelk
+from c1218.checksum import byte_sum, crc_hdlc
 
 def data_checksum(data):
-	chksum = 0
-	for i in struct.unpack('B' * len(data), data):
-		chksum += i
-	chksum = ((chksum - 1) & 0xff) ^ 0xff
-	return struct.pack('B', chksum)
+	return struct.pack('B', byte_sum(data))
 
 def packet_checksum(data):
-	chksum = crcelk.CRC_HDLC.calc_bytes(data)
-	return struct.pack('<H', chksum)
+	return struct.pack('<H', crc_hdlc(data))
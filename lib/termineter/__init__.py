@@ -35,19 +35,30 @@ from __future__ import unicode_literals
 __version__ = '1.0.5'
 
 import os
-import subprocess
+import shutil
 
-import smoke_zephyr.utilities
+# the revision is resolved on first use because it requires running git
+_revision = None
+_revision_resolved = False
 
 def get_revision():
 	"""
 	Retrieve the current git revision identifier. If the git binary can not be
 	found or the repository information is unavailable, None will be returned.
+	The identifier is cached after the first call.
 
 	:return: The git revision tag if it's available.
 	:rtype: str
 	"""
-	git_bin = smoke_zephyr.utilities.which('git')
+	global _revision, _revision_resolved
+	if not _revision_resolved:
+		_revision = _get_revision()
+		_revision_resolved = True
+	return _revision
+
+def _get_revision():
+	import subprocess
+	git_bin = shutil.which('git')
 	if not git_bin:
 		return None
 	proc_h = subprocess.Popen(
@@ -62,5 +73,3 @@ def get_revision():
 	if not len(rev):
 		return None
 	return rev.decode('utf-8')
-
-revision = get_revision()
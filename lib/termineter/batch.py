@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  termineter/batch.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import argparse
+import binascii
+import json
+import logging
+import os
+import sys
+import time
+
+import c1219.cache
+import termineter.core
+import termineter.errors
+import termineter.module
+import termineter.utilities
+
+EXIT_SUCCESS = 0
+EXIT_MODULE_ERROR = 1
+EXIT_USAGE_ERROR = 2
+EXIT_CONFIGURATION_ERROR = 3
+EXIT_CONNECTION_ERROR = 4
+EXIT_PARTIAL_FAILURE = 5
+
+class MessageLog(object):
+	"""
+	A stand in for a stdout stream which keeps everything a module prints
+	as a list of structured messages.
+	"""
+	def __init__(self):
+		self.messages = []
+
+	def add(self, message_type, **kwargs):
+		kwargs['type'] = message_type
+		self.messages.append(kwargs)
+
+	def flush(self):
+		pass
+
+	def getvalue(self):
+		return self.messages
+
+	def write(self, data):
+		self.add('text', message=data)
+
+class BatchFramework(termineter.core.Framework):
+	"""
+	A framework instance for running modules without the interactive
+	interface. The output of each module is recorded as structured messages.
+	"""
+	def __init__(self):
+		super(BatchFramework, self).__init__(stdout=MessageLog())
+
+	def _new_output(self):
+		return MessageLog()
+
+	def print_error(self, message):
+		self.stdout.add('error', message=message)
+
+	def print_good(self, message):
+		self.stdout.add('good', message=message)
+
+	def print_hexdump(self, data, offset=0):
+		self.stdout.add('hexdump', data=binascii.b2a_hex(data).decode('utf-8'))
+
+	def print_hexdump_stream(self, chunks):
+		# the messages are structured so the data is kept as a single hexdump
+		data = bytearray()
+		try:
+			for chunk in chunks:
+				data.extend(chunk)
+		finally:
+			if data:
+				self.print_hexdump(data)
+		return len(data)
+
+	def print_line(self, message):
+		self.stdout.add('line', message=message)
+
+	def print_status(self, message):
+		self.stdout.add('status', message=message)
+
+	def print_table(self, table, headers=(), line_prefix=None, tablefmt=None):
+		self.stdout.add('table', headers=list(headers), rows=[list(row) for row in table])
+
+	def print_warning(self, message):
+		self.stdout.add('warning', message=message)
+
+def _json_default(value):
+	if isinstance(value, (bytes, bytearray, memoryview)):
+		return binascii.b2a_hex(value).decode('utf-8')
+	if isinstance(value, (set, frozenset, tuple)):
+		return list(value)
+	return str(value)
+
+def _render_messages(messages, stream, tablefmt='simple'):
+	import tabulate
+	prefixes = {'error': '[-] ', 'good': '[+] ', 'status': '[*] ', 'warning': '[!] '}
+	for message in messages:
+		if message['type'] in prefixes:
+			prefix = prefixes[message['type']]
+			stream.write(prefix + (os.linesep + prefix).join(message['message'].split(os.linesep)) + os.linesep)
+		elif message['type'] == 'line':
+			stream.write(message['message'] + os.linesep)
+		elif message['type'] == 'table':
+			stream.write(tabulate.tabulate(message['rows'], headers=message['headers'], tablefmt=tablefmt) + os.linesep)
+		elif message['type'] == 'hexdump':
+			stream.write(message['data'] + os.linesep)
+		else:
+			stream.write(message['message'])
+
+def _set_option(frmwk, module, name, value):
+	for options in (module.options, module.advanced_options, frmwk.options, frmwk.advanced_options):
+		if name in options:
+			break
+	else:
+		raise termineter.errors.FrameworkConfigurationError('unknown option: ' + name)
+	try:
+		success = options.set_option_value(name, value)
+	except TypeError:
+		raise termineter.errors.FrameworkConfigurationError('invalid data type for option: ' + name)
+	if not success:
+		raise termineter.errors.FrameworkConfigurationError('invalid value for option: ' + name)
+
+def _make_record(module, target, success, result, messages, error, elapsed):
+	return {
+		'module': module.path,
+		'target': target,
+		'success': success,
+		'result': result,
+		'messages': messages,
+		'error': error,
+		'elapsed': elapsed
+	}
+
+def run_module(frmwk, module):
+	"""
+	Run a single module with the current framework options and return a
+	record of the result along with the exit code to use for it.
+
+	:param frmwk: The framework instance to run the module with.
+	:type frmwk: :py:class:`.BatchFramework`
+	:param module: The module to run.
+	:type module: :py:class:`~termineter.module.TermineterModule`
+	:return: The result record and the exit code.
+	:rtype: tuple
+	"""
+	target = frmwk.options['SERIAL_CONNECTION']
+	start_time = time.time()
+	if isinstance(module, termineter.module.TermineterModuleOptical):
+		try:
+			frmwk.test_serial_connection()
+		except termineter.errors.FrameworkConfigurationError as error:
+			record = _make_record(module, target, False, None, frmwk.stdout.getvalue(), str(error.msg), time.time() - start_time)
+			return record, EXIT_CONFIGURATION_ERROR
+		except Exception as error:
+			frmwk.logger.error('failed to connect to: ' + str(target), exc_info=True)
+			record = _make_record(module, target, False, None, frmwk.stdout.getvalue(), error.__class__.__name__ + ': ' + str(error), time.time() - start_time)
+			return record, EXIT_CONNECTION_ERROR
+	try:
+		result = frmwk.run(module)
+	except Exception as error:
+		frmwk.logger.error('running module: ' + module.path + ' failed', exc_info=True)
+		record = _make_record(module, target, False, None, frmwk.stdout.getvalue(), error.__class__.__name__ + ': ' + str(error), time.time() - start_time)
+		return record, EXIT_MODULE_ERROR
+	finally:
+		frmwk.serial_disconnect()
+		if isinstance(frmwk.table_cache, c1219.cache.PersistentTableCache):
+			frmwk.table_cache.close()
+	return _make_record(module, target, True, result, frmwk.stdout.getvalue(), None, time.time() - start_time), EXIT_SUCCESS
+
+def run_fleet(frmwk, module, targets, workers):
+	"""
+	Run a single optical module against multiple meters and return a record
+	of the result for each along with the exit code to use for them.
+
+	:param frmwk: The framework instance to run the module with.
+	:type frmwk: :py:class:`.BatchFramework`
+	:param module: The module to run.
+	:type module: :py:class:`~termineter.module.TermineterModuleOptical`
+	:param list targets: The connection strings of the meters.
+	:param int workers: The maximum number of meters to run at once.
+	:return: The result records and the exit code.
+	:rtype: tuple
+	"""
+	results = frmwk.run_fleet(module, targets, workers=workers)
+	records = [_make_record(module, result.target, result.success, result.result, result.output, result.error, result.elapsed) for result in results]
+	succeeded = sum(1 for result in results if result.success)
+	if succeeded == len(results):
+		exit_code = EXIT_SUCCESS
+	elif succeeded:
+		exit_code = EXIT_PARTIAL_FAILURE
+	else:
+		exit_code = EXIT_MODULE_ERROR
+	return records, exit_code
+
+def _write_records(records, output_format, stream):
+	if output_format == 'json':
+		stream.write(json.dumps({'results': records}, default=_json_default, indent=2, sort_keys=True) + os.linesep)
+	elif output_format == 'ndjson':
+		for record in records:
+			stream.write(json.dumps(record, default=_json_default, sort_keys=True) + os.linesep)
+	else:
+		for record in records:
+			if len(records) > 1:
+				stream.write(record['target'] + os.linesep + ('=' * len(record['target'])) + os.linesep)
+			_render_messages(record['messages'], stream)
+			if record['error']:
+				stream.write('[-] ' + record['error'] + os.linesep)
+	stream.flush()
+
+def _write_error(message, output_format, stream, exit_code):
+	if output_format in ('json', 'ndjson'):
+		stream.write(json.dumps({'error': message, 'exit_code': exit_code}, sort_keys=True) + os.linesep)
+	else:
+		stream.write('[-] ' + message + os.linesep)
+	stream.flush()
+	return exit_code
+
+def main(args=None, stream=None):
+	"""
+	The entry point for ``termineter run`` which runs a single module
+	without the interactive interface.
+
+	:param list args: The command line arguments, excluding the ``run`` sub command.
+	:param stream: The stream to write the output to, defaults to stdout.
+	:return: The exit code.
+	:rtype: int
+	"""
+	stream = stream or sys.stdout
+	parser = argparse.ArgumentParser(prog='termineter run', description='Termineter: run a module without the interactive interface')
+	parser.add_argument('-L', '--log', dest='loglvl', action='store', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='CRITICAL', help='set the logging level')
+	parser.add_argument('-s', '--set', dest='options', action='append', default=[], metavar='KEY=VAL', help='set an option, may be specified multiple times')
+	parser.add_argument('-t', '--target', dest='targets', action='append', default=[], help='a connection string or a file of them to run the module against')
+	parser.add_argument('-w', '--workers', dest='workers', default=4, type=int, help='the number of meters to run the module against at once')
+	output_parser = parser.add_mutually_exclusive_group()
+	output_parser.add_argument('--json', dest='output_format', action='store_const', const='json', help='write the results as a single json document')
+	output_parser.add_argument('--ndjson', dest='output_format', action='store_const', const='ndjson', help='write the results as newline delimited json')
+	parser.add_argument('module', help='the module to run')
+	try:
+		arguments = parser.parse_args(args)
+	except SystemExit as error:
+		return error.code
+
+	logging.getLogger('').setLevel(logging.DEBUG)
+	console_log_handler = logging.StreamHandler()
+	console_log_handler.setLevel(getattr(logging, arguments.loglvl))
+	console_log_handler.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
+	logging.getLogger('').addHandler(console_log_handler)
+
+	output_format = arguments.output_format
+	try:
+		frmwk = BatchFramework()
+		if arguments.module not in frmwk.modules:
+			return _write_error('invalid module specified: ' + arguments.module, output_format, stream, EXIT_CONFIGURATION_ERROR)
+		module = frmwk.modules[arguments.module]
+		for option in arguments.options:
+			name, sep, value = option.partition('=')
+			if not sep:
+				return _write_error('invalid option, options must be specified as KEY=VAL: ' + option, output_format, stream, EXIT_USAGE_ERROR)
+			_set_option(frmwk, module, name.strip().upper(), value)
+	except termineter.errors.FrameworkError as error:
+		return _write_error(str(error.msg), output_format, stream, EXIT_CONFIGURATION_ERROR)
+
+	targets = termineter.utilities.load_targets(arguments.targets)
+	if len(targets) == 1:
+		frmwk.options.set_option_value('SERIAL_CONNECTION', targets[0])
+	missing_options = module.get_missing_options()
+	if len(targets) > 1:
+		missing_options = [option for option in missing_options if option != 'SERIAL_CONNECTION']
+	if missing_options:
+		return _write_error('the following options must be set: ' + ', '.join(missing_options), output_format, stream, EXIT_CONFIGURATION_ERROR)
+
+	if len(targets) > 1:
+		if not isinstance(module, termineter.module.TermineterModuleOptical):
+			return _write_error('only optical modules can be run against multiple meters', output_format, stream, EXIT_USAGE_ERROR)
+		records, exit_code = run_fleet(frmwk, module, targets, max(arguments.workers, 1))
+	else:
+		record, exit_code = run_module(frmwk, module)
+		records = [record]
+	_write_records(records, output_format, stream)
+	logging.shutdown()
+	return exit_code
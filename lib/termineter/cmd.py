@@ -34,8 +34,6 @@ import argparse
 import cmd
 import logging
 import shlex
-import socket
-import ssl
 import sys
 
 class ArgumentParser(argparse.ArgumentParser):
@@ -194,6 +192,8 @@ class Cmd(cmd.Cmd):
 
 	@classmethod
 	def serve(cls, addr, run_once=False, log_level=None, use_ssl=False, ssl_cert=None, init_kwargs=None):
+		import socket
+		import ssl
 		init_kwargs = init_kwargs or {}
 		__package__ = '.'.join(cls.__module__.split('.')[:-1])
 		logger = logging.getLogger(__package__ + '.interpreter.server')
@@ -33,15 +33,21 @@
 from __future__ import unicode_literals
 
 import binascii
+import collections
+import copy
 import importlib
+import io
 import logging
 import logging.handlers
 import os
 import re
 import sys
+import threading
+import time
 
-import c1218.connection
 import c1218.errors
+import c1218.trace
+import c1219.cache
 import termineter.module
 import termineter.errors
 import termineter.options
@@ -49,8 +55,8 @@ import termineter.utilities
 
 import serial
 import serial.serialutil
-import tabulate
-import termcolor
+
+FleetResult = collections.namedtuple('FleetResult', ('target', 'success', 'result', 'output', 'error', 'elapsed'))
 
 class Framework(object):
 	"""
@@ -77,6 +83,10 @@ class Framework(object):
 
 		self.serial_connection = None
 		self._serial_connected = False
+		self._serial_authenticated = False
+		self._persistent_session = False
+		self._keepalive_event = None
+		self._keepalive_thread = None
 
 		# setup logging stuff
 		main_file_handler = logging.handlers.RotatingFileHandler(os.path.join(self.directories.user_data, self.__package__ + '.log'), maxBytes=262144, backupCount=5)
@@ -99,34 +109,155 @@ class Framework(object):
 		self.advanced_options.add_boolean('AUTO_CONNECT', 'automatically handle connections for modules', default=True)
 		self.advanced_options.add_boolean('CACHE_TABLES', 'cache certain read-only tables', default=True)
 		self.advanced_options.set_callback('CACHE_TABLES', self._opt_callback_set_cache_tables)
+		self.advanced_options.add_integer('CACHE_MAX_SIZE', 'the maximum number of bytes of tables to cache', default=262144)
+		self.advanced_options.set_callback('CACHE_MAX_SIZE', self._opt_callback_set_cache_max_size)
+		self.advanced_options.add_integer('CACHE_TTL', 'seconds to cache configuration tables for', default=300)
+		self.advanced_options.set_callback('CACHE_TTL', self._opt_callback_set_cache_ttl)
+		self.advanced_options.add_boolean('CACHE_PERSISTENT', 'store tables describing each meter on disk', default=False)
+		self.advanced_options.set_callback('CACHE_PERSISTENT', self._opt_callback_set_cache_persistent)
+		self.advanced_options.add_string('CACHE_FILE', 'the file to store persistent cached tables in', default=os.path.join(self.directories.user_data, 'table_cache.db'))
+		self.advanced_options.set_callback('CACHE_FILE', self._opt_callback_set_cache_file)
 		self.advanced_options.add_integer('C1218_MAX_PACKETS', 'c12.18 maximum packets for reassembly', default=2)
 		self.advanced_options.add_integer('C1218_PACKET_SIZE', 'c12.18 maximum packet size', default=512)
+		self.advanced_options.add_integer('C1218_MAX_BAUD_RATE', 'c12.18 highest baud rate to negotiate (0 to disable)', default=0)
+		self.advanced_options.set_callback('C1218_MAX_BAUD_RATE', self._opt_callback_set_max_baud_rate)
+		self.advanced_options.add_string('RECORD_FILE', 'record the serial session to this file for replay', default='')
+		self.advanced_options.add_string('CAPTURE_FILE', 'capture every frame to this pcapng file', default='')
+		self.advanced_options.set_callback('CAPTURE_FILE', self._opt_callback_set_capture_file)
+		self.advanced_options.add_boolean('PERSISTENT_SESSION', 'keep the connection open between module runs', default=False)
+		self.advanced_options.set_callback('PERSISTENT_SESSION', self._opt_callback_set_persistent_session)
+		self.advanced_options.add_integer('KEEPALIVE_INTERVAL', 'seconds between keepalives for a persistent session', default=20)
+		self.advanced_options.add_boolean('SESSION_RECOVERY', 'recover the session and replay requests rejected with isss', default=True)
+		self.advanced_options.set_callback('SESSION_RECOVERY', self._opt_callback_set_session_recovery)
+		self.advanced_options.add_float('SESSION_RECOVERY_DELAY', 'seconds to wait before recovering the session', default=0.1)
+		self.advanced_options.set_callback('SESSION_RECOVERY_DELAY', self._opt_callback_set_session_recovery_delay)
+		self.advanced_options.add_integer('RETRY_LIMIT', 'attempts to send or receive a frame for each kind of error', default=3)
+		self.advanced_options.set_callback('RETRY_LIMIT', self._opt_callback_set_retry_limit)
+		self.advanced_options.add_float('RETRY_BACKOFF', 'seconds to wait before the first retry, doubled for each retry', default=0.1)
+		self.advanced_options.add_float('RESPONSE_TIMEOUT', 'seconds to wait for the meter to respond (0 for a fixed timeout)', default=1.0)
+		self.advanced_options.add_string('TRACE_FILE', 'write a chrome trace of each module run to this json file', default='')
+		self.advanced_options.add_string('STATS_FILE', 'write the connection statistics to this json file after each module run', default='')
 		self.advanced_options.add_integer('SERIAL_BAUD_RATE', 'serial connection baud rate', default=9600)
 		self.advanced_options.add_integer('SERIAL_BYTE_SIZE', 'serial connection byte size', default=serial.EIGHTBITS)
 		self.advanced_options.add_integer('SERIAL_STOP_BITS', 'serial connection stop bits', default=serial.STOPBITS_ONE)
+		self.advanced_options.add_boolean('TRACE_FRAMES', 'log every frame that is sent and received', default=False)
+		self.advanced_options.set_callback('TRACE_FRAMES', self._opt_callback_set_trace_frames)
 		self.advanced_options.add_string('TABLE_FORMAT', 'the format to print tables in', default='simple')
 		self.advanced_options.set_callback('TABLE_FORMAT', self._opt_callback_set_table_format)
 		if sys.platform.startswith('linux'):
 			self.options.set_option_value('USE_COLOR', 'True')
+		self.table_cache = None
+		self.retry_policy = None
+		self.connection_stats = None
+		self.tracer = c1218.trace.NULL_TRACER
+		self.capture = None
+		self._set_table_cache()
+		self._set_trace_frames(self.advanced_options['TRACE_FRAMES'])
 
 		# start loading modules
 		self.current_module = None
 		self.modules = termineter.module.ManagerManager(self, [
 			os.path.abspath(os.path.join(__file__, '..', 'modules')),
 			os.path.abspath(os.path.join(self.directories.user_data, 'modules'))
-		])
-		self.logger.info("successfully loaded {0:,} modules into the framework".format(len(self.modules)))
+		], index_file=os.path.join(self.directories.user_data, 'module_index.json'))
+		self.logger.info("successfully indexed {0:,} modules into the framework".format(len(self.modules)))
 		return
 
 	def __repr__(self):
 		return '<' + self.__class__.__name__ + ' Loaded Modules: ' + str(len(self.modules)) + ', Serial Connected: ' + str(self.is_serial_connected()) + ' >'
 
 	def _opt_callback_set_cache_tables(self, policy, _):
+		policy = policy.lower() in ('true', '1', 'on')
 		if self.is_serial_connected():
 			self.serial_connection.set_table_cache_policy(policy)
+		if not policy:
+			self.table_cache.clear()
+		return True
+
+	def _opt_callback_set_cache_max_size(self, max_size, _):
+		self.table_cache.max_size = int(max_size)
 		return True
 
+	def _opt_callback_set_cache_ttl(self, ttl, _):
+		self.table_cache.ttl = int(ttl)
+		return True
+
+	def _opt_callback_set_cache_persistent(self, persistent, _):
+		import sqlite3
+		try:
+			self._set_table_cache()
+		except sqlite3.Error as error:
+			self.print_error('Could not open the cache file: ' + str(error))
+			return False
+		return True
+
+	def _opt_callback_set_cache_file(self, path, _):
+		if not self.advanced_options['CACHE_PERSISTENT']:
+			return True
+		return self._opt_callback_set_cache_persistent(True, None)
+
+	def _set_table_cache(self):
+		kwargs = {'max_size': self.advanced_options['CACHE_MAX_SIZE'], 'ttl': self.advanced_options['CACHE_TTL']}
+		if self.advanced_options['CACHE_PERSISTENT']:
+			table_cache = c1219.cache.PersistentTableCache(self.advanced_options['CACHE_FILE'], **kwargs)
+		else:
+			table_cache = c1219.cache.TableCache(**kwargs)
+		if isinstance(self.table_cache, c1219.cache.PersistentTableCache):
+			self.table_cache.close()
+		self.table_cache = table_cache
+		if self.serial_connection is not None:
+			self.serial_connection.table_cache = table_cache
+
+	def _opt_callback_set_max_baud_rate(self, baud_rate, _):
+		import c1218.data
+		baud_rate = int(baud_rate)
+		if baud_rate and baud_rate not in c1218.data.C1218_BAUDRATE_CODES:
+			self.print_error('C1218_MAX_BAUD_RATE must be 0 or one of: ' + ', '.join(str(rate) for rate in sorted(c1218.data.C1218_BAUDRATE_CODES)))
+			return False
+		return True
+
+	def _opt_callback_set_capture_file(self, capture_file, _):
+		if self.capture is not None and self.capture.path != capture_file:
+			self.capture.close()
+			self.capture = None
+			if self.serial_connection is not None:
+				self.serial_connection.capture = None
+		return True
+
+	def _opt_callback_set_persistent_session(self, persistent_session, _):
+		if persistent_session.lower() in ('false', '0', 'off'):
+			self._end_persistent_session()
+		return True
+
+	def _opt_callback_set_session_recovery(self, _, __):
+		if self.serial_connection is not None:
+			self.serial_connection.auto_recover = self.advanced_options['SESSION_RECOVERY']
+		return True
+
+	def _opt_callback_set_session_recovery_delay(self, delay, _):
+		if self.serial_connection is not None:
+			self.serial_connection.recovery_delay = float(delay)
+		return True
+
+	def _opt_callback_set_retry_limit(self, retry_limit, _):
+		if int(retry_limit) < 1:
+			self.print_error('RETRY_LIMIT must be at least 1')
+			return False
+		return True
+
+	def _opt_callback_set_trace_frames(self, trace_frames, _):
+		self._set_trace_frames(trace_frames.lower() in ('true', '1', 'on'))
+		return True
+
+	def _set_trace_frames(self, trace_frames):
+		# the root logger and file handler are at DEBUG, so the frame loggers
+		# need their own level to skip formatting every frame
+		level = (logging.DEBUG if trace_frames else logging.INFO)
+		logging.getLogger('c1218.connection.io').setLevel(level)
+		logging.getLogger('c1222.connection.io').setLevel(level)
+
 	def _opt_callback_set_table_format(self, table_format, _):
+		import tabulate
 		if table_format not in tabulate.tabulate_formats:
 			self.print_error('TABLE_FORMAT must be one of: ' + ', '.join(tabulate.tabulate_formats))
 			return False
@@ -137,16 +268,29 @@ class Framework(object):
 			self.print_error('The serial interface has not been connected')
 			return False
 
-		try:
-			self.serial_get()
-		except Exception as error:
-			self.print_exception(error)
-			return False
-
 		ConnectionState = termineter.module.ConnectionState
-		if not self.advanced_options['AUTO_CONNECT']:
-			return True
-		if module.connection_state == ConnectionState.none:
+		if self._persistent_session:
+			self._stop_keepalive()
+			if self.serial_connection.keep_alive(self._keepalive_wait()):
+				self.logger.info('reusing the persistent session')
+				if module.connection_state != ConnectionState.authenticated or self._serial_authenticated:
+					return True
+				# the security service is only accepted right after logon
+				if self._restart_persistent_session():
+					if not self.serial_login():
+						self.logger.warning('meter login failed, some tables may not be accessible')
+					return True
+				self.logger.warning('the persistent session could not be restarted, reconnecting')
+			else:
+				self.logger.warning('the persistent session is no longer responding, reconnecting')
+			self._persistent_session = False
+
+		if not self.advanced_options['AUTO_CONNECT'] or module.connection_state == ConnectionState.none:
+			try:
+				self.serial_get()
+			except Exception as error:
+				self.print_exception(error)
+				return False
 			return True
 
 		try:
@@ -208,16 +352,243 @@ class Framework(object):
 			raise termineter.errors.FrameworkRuntimeError('either the module or the current_module must be sent')
 		if module is None:
 			module = self.current_module
-		if isinstance(module, termineter.module.TermineterModuleOptical) and not self._run_optical(module):
-			return
+		trace_file = self.advanced_options['TRACE_FILE']
+		if not trace_file:
+			with self.tracer.span('run', category='termineter', module=module.path):
+				return self._run(module)
+		self._set_tracer(c1218.trace.TraceRecorder())
+		try:
+			with self.tracer.span('run', category='termineter', module=module.path):
+				return self._run(module)
+		finally:
+			self._save_trace(trace_file)
+
+	def _run(self, module):
+		if isinstance(module, termineter.module.TermineterModuleOptical):
+			with self.tracer.span('connect', category='termineter'):
+				if not self._run_optical(module):
+					return
 		self.logger.info('running module: ' + module.path)
+		succeeded = False
 		try:
-			result = module.run()
+			with self.tracer.span('module', category='termineter'):
+				result = module.run()
+			succeeded = True
 		finally:
 			if isinstance(module, termineter.module.TermineterModuleOptical) and self.serial_connection and self.advanced_options['AUTO_CONNECT']:
-				self.serial_connection.stop()
+				if succeeded and self.advanced_options['PERSISTENT_SESSION'] and self.serial_connection._initialized:
+					self._persistent_session = True
+					self._start_keepalive()
+				else:
+					self._persistent_session = False
+					self.serial_connection.stop()
+			if self.capture is not None:
+				self.capture.flush()
+			if isinstance(module, termineter.module.TermineterModuleOptical) and self.advanced_options['STATS_FILE']:
+				try:
+					self.save_stats(self.advanced_options['STATS_FILE'])
+				except (IOError, OSError):
+					self.logger.error('failed to write the connection statistics', exc_info=True)
+					self.print_error('Failed to write the connection statistics to: ' + self.advanced_options['STATS_FILE'])
 		return result
 
+	def run_fleet(self, module, targets, workers=4):
+		"""
+		Run an optical module against multiple meters concurrently. Each
+		target is run with its own connection and a snapshot of the current
+		framework and module options.
+
+		:param module: The module to run.
+		:type module: :py:class:`~termineter.module.TermineterModuleOptical`
+		:param list targets: The connection strings of the meters.
+		:param int workers: The maximum number of meters to run at once.
+		:return: The results for each of the targets in the order they were specified.
+		:rtype: list
+		"""
+		if not isinstance(module, termineter.module.TermineterModuleOptical):
+			raise termineter.errors.FrameworkRuntimeError('only optical modules can be run against multiple meters')
+		self.logger.info("running module: {0} against {1:,} meters with {2} workers".format(module.path, len(targets), workers))
+		import concurrent.futures
+		# each target counts on its own copies of the counters which are merged
+		# once it finishes, the capture and tracer are shared
+		self._init_stats()
+		stats_lock = threading.Lock()
+		self._get_capture()
+		trace_file = self.advanced_options['TRACE_FILE']
+		if trace_file:
+			self._set_tracer(c1218.trace.TraceRecorder())
+		try:
+			with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+				results = list(executor.map(lambda target: self._run_fleet_target(module, target, stats_lock), targets))
+		finally:
+			if trace_file:
+				self._save_trace(trace_file)
+		if self.advanced_options['STATS_FILE']:
+			self.save_stats(self.advanced_options['STATS_FILE'])
+		return results
+
+	def _copy_for_target(self, target, stdout):
+		import c1218.stats
+		frmwk = copy.copy(self)
+		frmwk.stdout = stdout
+		frmwk.options = self.options.copy()
+		frmwk.advanced_options = self.advanced_options.copy()
+		# set the values directly, the option callbacks are bound to this instance
+		frmwk.options.get_option('SERIAL_CONNECTION').value = target
+		frmwk.options.get_option('USE_COLOR').value = False
+		frmwk.advanced_options.get_option('PERSISTENT_SESSION').value = False
+		frmwk.advanced_options.get_option('STATS_FILE').value = ''
+		frmwk.advanced_options.get_option('TRACE_FILE').value = ''
+		frmwk.serial_connection = None
+		frmwk._serial_connected = False
+		frmwk._serial_authenticated = False
+		frmwk._persistent_session = False
+		frmwk._keepalive_event = None
+		frmwk._keepalive_thread = None
+		frmwk.table_cache = None
+		frmwk._set_table_cache()
+		frmwk.connection_stats = c1218.stats.ConnectionStats()
+		frmwk.retry_policy = self.retry_policy.copy()
+		return frmwk
+
+	def _init_stats(self):
+		# the retry policy and the counters are kept between connections so
+		# the statistics accumulate until they are reset
+		if self.retry_policy is None:
+			import c1218.retry
+			self.retry_policy = c1218.retry.RetryPolicy()
+		if self.connection_stats is None:
+			import c1218.stats
+			self.connection_stats = c1218.stats.ConnectionStats()
+
+	def get_stats(self):
+		"""
+		Get the statistics of the serial connections which have been made.
+		The latency, traffic and errors of each service are under the
+		'services' key and the counters of the retry policy are under the
+		'retries' key.
+
+		:rtype: dict
+		"""
+		return {
+			'services': (self.connection_stats.to_dict() if self.connection_stats is not None else {}),
+			'retries': (self.retry_policy.stats.to_dict() if self.retry_policy is not None else {})
+		}
+
+	def reset_stats(self):
+		"""
+		Reset the statistics of the serial connections.
+		"""
+		if self.connection_stats is not None:
+			self.connection_stats.reset()
+		if self.retry_policy is not None:
+			self.retry_policy.stats.reset()
+
+	def save_stats(self, path):
+		"""
+		Write the statistics of the serial connections to a JSON file, see
+		:py:meth:`.get_stats`.
+
+		:param str path: The path of the file to write.
+		"""
+		import json
+		stats = self.get_stats()
+		stats['time'] = time.time()
+		with open(path, 'w') as file_h:
+			json.dump(stats, file_h, indent=2, separators=(',', ': '))
+		self.logger.info('wrote the connection statistics to: ' + path)
+
+	def _get_capture(self):
+		# the capture is kept open between connections until the option changes
+		capture_file = self.advanced_options['CAPTURE_FILE']
+		if capture_file and self.capture is None:
+			import c1218.capture
+			self.capture = c1218.capture.PcapngWriter(capture_file)
+		return self.capture
+
+	def _set_tracer(self, tracer):
+		self.tracer = tracer
+		if self.serial_connection is not None:
+			self.serial_connection.tracer = tracer
+
+	def _save_trace(self, trace_file):
+		tracer = self.tracer
+		self._set_tracer(c1218.trace.NULL_TRACER)
+		try:
+			tracer.save(trace_file)
+		except (IOError, OSError):
+			self.logger.error('failed to write the trace', exc_info=True)
+			self.print_error('Failed to write the trace to: ' + trace_file)
+			return
+		self.logger.info("wrote {0:,} trace events to: {1}".format(len(tracer), trace_file))
+
+	def _new_output(self):
+		return io.StringIO()
+
+	def _run_fleet_target(self, module, target, stats_lock):
+		stdout = self._new_output()
+		frmwk = self._copy_for_target(target, stdout)
+		module = copy.copy(module)
+		module.frmwk = frmwk
+		module.options = module.options.copy()
+		module.advanced_options = module.advanced_options.copy()
+		start_time = time.time()
+		try:
+			frmwk.test_serial_connection()
+			result = frmwk.run(module)
+		except Exception as error:
+			self.logger.error('running module: ' + module.path + ' against: ' + target + ' failed', exc_info=True)
+			return FleetResult(target, False, None, stdout.getvalue(), error.__class__.__name__ + ': ' + str(error), time.time() - start_time)
+		finally:
+			frmwk.serial_disconnect()
+			if isinstance(frmwk.table_cache, c1219.cache.PersistentTableCache):
+				frmwk.table_cache.close()
+			with stats_lock:
+				self.connection_stats.merge(frmwk.connection_stats)
+				self.retry_policy.stats.merge(frmwk.retry_policy.stats)
+		return FleetResult(target, True, result, stdout.getvalue(), None, time.time() - start_time)
+
+	def _keepalive_wait(self):
+		return min(self.advanced_options['KEEPALIVE_INTERVAL'] * 2, 255)
+
+	def _keepalive_loop(self, connection, event):
+		while not event.wait(self.advanced_options['KEEPALIVE_INTERVAL']):
+			if not connection.keep_alive(self._keepalive_wait()):
+				self.logger.warning('the persistent session stopped responding to keepalives')
+				break
+
+	def _start_keepalive(self):
+		self._stop_keepalive()
+		self._keepalive_event = threading.Event()
+		self._keepalive_thread = threading.Thread(target=self._keepalive_loop, args=(self.serial_connection, self._keepalive_event), name='termineter-keepalive')
+		self._keepalive_thread.daemon = True
+		self._keepalive_thread.start()
+
+	def _stop_keepalive(self):
+		if self._keepalive_thread is None:
+			return
+		self._keepalive_event.set()
+		self._keepalive_thread.join()
+		self._keepalive_event = None
+		self._keepalive_thread = None
+
+	def _restart_persistent_session(self):
+		try:
+			return self.serial_connection.stop() and self.serial_connection.start()
+		except (c1218.errors.C1218IOError, c1218.errors.C1218NegotiateError) as error:
+			self.logger.error('caught ' + error.__class__.__name__ + ': ' + str(error))
+		return False
+
+	def _end_persistent_session(self):
+		self._stop_keepalive()
+		if not self._persistent_session:
+			return
+		self._persistent_session = False
+		try:
+			self.serial_connection.stop(force=True)
+		except c1218.errors.C1218IOError as error:
+			self.logger.error('caught C1218IOError: ' + str(error))
+
 	@property
 	def use_colors(self):
 		return self.options['USE_COLOR']
@@ -256,6 +627,7 @@ class Framework(object):
 	def print_error(self, message):
 		prefix = '[-] '
 		if self.options['USE_COLOR']:
+			import termcolor
 			prefix = termcolor.colored(prefix, 'red', attrs=('bold',))
 		self.stdout.write(prefix + (os.linesep + prefix).join(message.split(os.linesep)) + os.linesep)
 		self.stdout.flush()
@@ -263,15 +635,16 @@ class Framework(object):
 	def print_good(self, message):
 		prefix = '[+] '
 		if self.options['USE_COLOR']:
+			import termcolor
 			prefix = termcolor.colored(prefix, 'green', attrs=('bold',))
 		self.stdout.write(prefix + (os.linesep + prefix).join(message.split(os.linesep)) + os.linesep)
 		self.stdout.flush()
 
-	def print_hexdump(self, data):
+	def print_hexdump(self, data, offset=0):
 		data_len = len(data)
 		i = 0
 		while i < data_len:
-			self.stdout.write("{0:04x}    ".format(i))
+			self.stdout.write("{0:04x}    ".format(offset + i))
 			for j in range(16):
 				if i + j < data_len:
 					self.stdout.write("{0:02x} ".format(data[i + j]))
@@ -290,6 +663,31 @@ class Framework(object):
 			i += 16
 		self.stdout.flush()
 
+	def print_hexdump_stream(self, chunks):
+		"""
+		Print a hexdump of data which is received in chunks of any size. Each
+		line is printed as soon as all of the data for it is available.
+
+		:param chunks: The chunks of data to print.
+		:return: The number of bytes which were printed.
+		:rtype: int
+		"""
+		pending = bytearray()
+		offset = 0
+		try:
+			for chunk in chunks:
+				pending.extend(chunk)
+				size = len(pending) - (len(pending) % 16)
+				if size:
+					self.print_hexdump(pending[:size], offset=offset)
+					del pending[:size]
+					offset += size
+		finally:
+			if pending:
+				self.print_hexdump(pending, offset=offset)
+				offset += len(pending)
+		return offset
+
 	def print_line(self, message):
 		self.stdout.write(message + os.linesep)
 		self.stdout.flush()
@@ -297,11 +695,13 @@ class Framework(object):
 	def print_status(self, message):
 		prefix = '[*] '
 		if self.options['USE_COLOR']:
+			import termcolor
 			prefix = termcolor.colored(prefix, 'blue', attrs=('bold',))
 		self.stdout.write(prefix + (os.linesep + prefix).join(message.split(os.linesep)) + os.linesep)
 		self.stdout.flush()
 
 	def print_table(self, table, headers=(), line_prefix=None, tablefmt=None):
+		import tabulate
 		tablefmt = tablefmt or self.advanced_options['TABLE_FORMAT']
 		text = tabulate.tabulate(table, headers=headers, tablefmt=tablefmt)
 		if line_prefix:
@@ -311,6 +711,7 @@ class Framework(object):
 	def print_warning(self, message):
 		prefix = '[!] '
 		if self.options['USE_COLOR']:
+			import termcolor
 			prefix = termcolor.colored(prefix, '', attrs=('bold',))
 		self.stdout.write(prefix + (os.linesep + prefix).join(message.split(os.linesep)) + os.linesep)
 		self.stdout.flush()
@@ -321,11 +722,18 @@ class Framework(object):
 		"""
 		return self._serial_connected
 
+	def is_serial_authenticated(self):
+		"""
+		Returns True if the serial interface has been logged into.
+		"""
+		return self._serial_authenticated
+
 	def serial_disconnect(self):
 		"""
 		Closes the serial connection to the meter and disconnects from the
 		device.
 		"""
+		self._end_persistent_session()
 		if self._serial_connected:
 			try:
 				self.serial_connection.close()
@@ -342,6 +750,7 @@ class Framework(object):
 		Create the serial connection from the framework settings and return
 		it, setting the framework instance in the process.
 		"""
+		import c1218.connection
 		frmwk_c1218_settings = {
 			'nbrpkts': self.advanced_options['C1218_MAX_PACKETS'],
 			'pktsize': self.advanced_options['C1218_PACKET_SIZE']
@@ -352,9 +761,23 @@ class Framework(object):
 		frmwk_serial_settings['bytesize'] = self.advanced_options['SERIAL_BYTE_SIZE']
 		frmwk_serial_settings['stopbits'] = self.advanced_options['SERIAL_STOP_BITS']
 
+		self._init_stats()
+		self.retry_policy.default_budget = self.advanced_options['RETRY_LIMIT']
+		self.retry_policy.backoff = self.advanced_options['RETRY_BACKOFF']
+		self.retry_policy.response_timeout = (self.advanced_options['RESPONSE_TIMEOUT'] or None)
+
+		if self.serial_connection is not None:
+			# stop the keepalive thread before the connection it uses is closed
+			self._end_persistent_session()
+			# release the device from the previous connection before reopening it
+			try:
+				self.serial_connection.serial_h.close()
+			except serial.serialutil.SerialException as error:
+				self.logger.error('caught SerialException: ' + str(error))
+		capture = self._get_capture()
 		self.logger.info('opening serial device: ' + self.options['SERIAL_CONNECTION'])
 		try:
-			self.serial_connection = c1218.connection.Connection(self.options['SERIAL_CONNECTION'], c1218_settings=frmwk_c1218_settings, serial_settings=frmwk_serial_settings, enable_cache=self.advanced_options['CACHE_TABLES'])
+			self.serial_connection = c1218.connection.Connection(self.options['SERIAL_CONNECTION'], c1218_settings=frmwk_c1218_settings, serial_settings=frmwk_serial_settings, enable_cache=self.advanced_options['CACHE_TABLES'], table_cache=self.table_cache, max_baudrate=(self.advanced_options['C1218_MAX_BAUD_RATE'] or None), record_file=(self.advanced_options['RECORD_FILE'] or None), auto_recover=self.advanced_options['SESSION_RECOVERY'], recovery_delay=self.advanced_options['SESSION_RECOVERY_DELAY'], retry_policy=self.retry_policy, stats=self.connection_stats, tracer=self.tracer, capture=capture)
 		except Exception as error:
 			self.logger.error('could not open the serial device')
 			raise error
@@ -371,6 +794,7 @@ class Framework(object):
 			self.logger.error('serial connection has been opened but the meter is unresponsive')
 			raise error
 		self._serial_connected = True
+		self._serial_authenticated = False
 		return True
 
 	def serial_login(self):
@@ -381,6 +805,21 @@ class Framework(object):
 		if not self._serial_connected:
 			raise termineter.errors.FrameworkRuntimeError('the serial interface is disconnected')
 
+		username, user_id, password = self.get_login_credentials()
+		if not self.serial_connection.login(username, user_id, password):
+			return False
+		self._serial_authenticated = True
+		return True
+
+	def get_login_credentials(self):
+		"""
+		Get the username, user id and password to log into the meter with
+		from the framework's options. The password is decoded from hex if
+		the PASSWORD_HEX option is set.
+
+		:return: The username, user id and password.
+		:rtype: tuple
+		"""
 		username = self.options['USERNAME']
 		user_id = self.options['USER_ID']
 		password = self.options['PASSWORD']
@@ -390,6 +829,8 @@ class Framework(object):
 				self.print_error('Invalid characters in password')
 				raise termineter.errors.FrameworkConfigurationError('invalid characters in password')
 			password = binascii.a2b_hex(password)
+		else:
+			password = password.encode('utf-8')
 		if len(username) > 10:
 			self.print_error('Username cannot be longer than 10 characters')
 			raise termineter.errors.FrameworkConfigurationError('username cannot be longer than 10 characters')
@@ -399,10 +840,7 @@ class Framework(object):
 		if len(password) > 20:
 			self.print_error('Password cannot be longer than 20 characters')
 			raise termineter.errors.FrameworkConfigurationError('password cannot be longer than 20 characters')
-
-		if not self.serial_connection.login(username, user_id, password):
-			return False
-		return True
+		return username, user_id, password
 
 	def test_serial_connection(self):
 		"""
@@ -443,6 +881,12 @@ class Framework(object):
 			self.logger.info('setting the connection to use little-endian for C12.19 data')
 			self.serial_connection.c1219_endian = '<'
 
+		if self.advanced_options['PERSISTENT_SESSION']:
+			self._persistent_session = True
+			self._start_keepalive()
+			self.logger.warning('the serial interface has been connected')
+			return True
+
 		try:
 			self.serial_connection.stop()
 		except c1218.errors.C1218IOError as error:
@@ -33,12 +33,9 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-import code
 import logging
 import os
-import platform
 import random
-import subprocess
 import sys
 import textwrap
 
@@ -47,8 +44,8 @@ import termineter.cmd
 import termineter.core
 import termineter.errors
 import termineter.its
-
-import termcolor
+import termineter.module
+import termineter.utilities
 
 codename = 'T-1000'
 
@@ -140,11 +137,19 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 		if self.frmwk.current_module:
 			module_name = self.frmwk.current_module.name
 			if self.frmwk.use_colors:
+				import termcolor
 				module_name = termcolor.colored(module_name, 'yellow', attrs=('bold',))
 			return self.__name__ + ' (' + module_name + ') > '
 		else:
 			return self.__name__ + ' > '
 
+	def load_module(self, module_path):
+		try:
+			return self.frmwk.modules[module_path]
+		except termineter.errors.FrameworkRuntimeError:
+			self.print_error('Failed to load module: ' + module_path)
+		return None
+
 	def reload_module(self, module):
 		is_current = self.frmwk.current_module and module.path == self.frmwk.current_module.path
 		try:
@@ -209,6 +214,14 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 			return
 		self.print_good('Successfully connected and the device is responding')
 
+	@termineter.cmd.command('Disconnect the serial interface.')
+	def do_disconnect(self, args):
+		if not self.frmwk.is_serial_connected():
+			self.print_status('Not connected')
+			return
+		self.frmwk.serial_disconnect()
+		self.print_good('Successfully disconnected')
+
 	@termineter.cmd.command('Exit the interpreter.')
 	def do_exit(self, args):
 		quotes = (
@@ -230,6 +243,44 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 		"""Alias of the 'run' command"""
 		self.do_run(args)
 
+	@termineter.cmd.command('Run the current module against multiple meters')
+	@termineter.cmd.argument('-w', '--workers', type=int, default=4, help='the number of meters to run concurrently')
+	@termineter.cmd.argument('targets', nargs='+', help='connection strings or files containing one per line')
+	def do_fleet(self, args):
+		module = self.frmwk.current_module
+		if module is None:
+			self.print_error('Must \'use\' module first')
+			return
+		if not isinstance(module, termineter.module.TermineterModuleOptical):
+			self.print_error('Only optical modules can be run against multiple meters')
+			return
+		missing_options = [option for option in module.get_missing_options() if option != 'SERIAL_CONNECTION']
+		if missing_options:
+			self.print_error('The following options must be set: ' + ', '.join(missing_options))
+			return
+		targets = termineter.utilities.load_targets(args.targets)
+		if not targets:
+			self.print_error('No targets were specified')
+			return
+
+		self.print_status("Running {0} against {1:,} meters".format(module.path, len(targets)))
+		try:
+			results = self.frmwk.run_fleet(module, targets, workers=max(args.workers, 1))
+		except KeyboardInterrupt:
+			self.print_line('')
+			return
+		for result in results:
+			self.print_line('')
+			self.print_line(result.target + os.linesep + ('=' * len(result.target)))
+			if result.output:
+				self.print_line(result.output.rstrip())
+			if result.error:
+				self.print_error(result.error)
+		self.print_line('')
+		rows = [(result.target, ('success' if result.success else 'failed'), "{0:.2f}s".format(result.elapsed)) for result in results]
+		self.frmwk.print_table(rows, headers=('Target', 'Status', 'Time'))
+		self.print_status("{0:,} of {1:,} meters succeeded".format(sum(1 for result in results if result.success), len(results)))
+
 	def do_help(self, args):
 		super(InteractiveInterpreter, self).do_help(args)
 		self.print_line('')
@@ -264,7 +315,9 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 				return
 			module = self.frmwk.current_module
 		elif args.module in self.frmwk.modules:
-			module = self.frmwk.modules[args.module]
+			module = self.load_module(args.module)
+			if module is None:
+				return
 		else:
 			self.print_error('Invalid module name')
 			return
@@ -337,6 +390,7 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 		try:
 			import IPython.terminal.embed
 		except ImportError:
+			import code
 			pyconsole = code.InteractiveConsole(vars)
 			savestdin = os.dup(sys.stdin.fileno())
 			savestdout = os.dup(sys.stdout.fileno())
@@ -358,6 +412,8 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 	@termineter.cmd.argument('vendor_id', help='the 4 hex digits of the vendor id')
 	@termineter.cmd.argument('product_id', help='the 4 hex digits of the product id')
 	def do_prep_driver(self, args):
+		import platform
+		import subprocess
 		if os.getuid():
 			self.print_error('Must be running as root to prep the driver')
 			return
@@ -431,7 +487,9 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 			if args.module not in self.frmwk.modules:
 				self.print_error('Invalid Module Selected.')
 				return
-			module = self.frmwk.modules[args.module]
+			module = self.load_module(args.module)
+			if module is None:
+				return
 		elif self.frmwk.current_module:
 			module = self.frmwk.current_module
 		else:
@@ -471,8 +529,11 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 			if args.module not in self.frmwk.modules:
 				self.print_error('Invalid module specified: ' + args.module)
 				return
+			module = self.load_module(args.module)
+			if module is None:
+				return
 			old_module = self.frmwk.current_module
-			self.frmwk.current_module = self.frmwk.modules[args.module]
+			self.frmwk.current_module = module
 		module = self.frmwk.current_module
 		if args.reload:
 			module = self.reload_module(module)
@@ -538,7 +599,7 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 		if args.thing == 'modules':
 			self.print_line('Modules' + os.linesep + '=======')
 			headers = ('Name', 'Description')
-			rows = [(module.path, module.description) for module in self.frmwk.modules.values()]
+			rows = [(metadata.path, metadata.description) for metadata in self.frmwk.modules.index.values()]
 		else:
 			if self.frmwk.current_module and args.thing == 'options':
 				options = self.frmwk.current_module.options
@@ -564,6 +625,39 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 	def complete_show(self, text, line, begidx, endidx):
 		return [i for i in ['advanced', 'modules', 'options'] if i.startswith(text.lower())]
 
+	@termineter.cmd.command('Show the latency, traffic and errors of each service')
+	@termineter.cmd.argument('-o', '--output', help='write the statistics to a json file')
+	@termineter.cmd.argument('-r', '--reset', action='store_true', default=False, help='reset the statistics')
+	def do_stats(self, args):
+		if args.output:
+			try:
+				self.frmwk.save_stats(args.output)
+			except (IOError, OSError) as error:
+				self.print_exception(error)
+				return
+			self.print_status('Wrote the statistics to: ' + args.output)
+		if args.reset:
+			self.frmwk.reset_stats()
+			self.print_status('Reset the statistics')
+			return
+		if args.output:
+			return
+		connection_stats = self.frmwk.connection_stats
+		if not connection_stats:
+			self.print_status('No requests have been made')
+			return
+		milliseconds = lambda value: ('' if value is None else "{0:.1f}".format(value * 1000))
+		rows = []
+		for name, service in connection_stats:
+			latency = service.latency
+			errors = ', '.join("{0}: {1}".format(error, count) for error, count in sorted(service.errors.items()))
+			rows.append((name, service.requests, service.bytes_sent, service.bytes_received, service.retries, errors, milliseconds(latency.mean), milliseconds(latency.percentile(50)), milliseconds(latency.percentile(90)), milliseconds(latency.maximum)))
+		self.print_line('')
+		self.frmwk.print_table(rows, headers=('Service', 'Requests', 'Sent', 'Received', 'Retries', 'Errors', 'Mean (ms)', 'P50 (ms)', 'P90 (ms)', 'Max (ms)'), line_prefix='  ')
+		self.print_line('')
+		retry_stats = self.frmwk.retry_policy.stats
+		self.print_status("Retried {0:,} times, spent {1:.2f} seconds backing off".format(sum(retry_stats.retries.values()), retry_stats.backoff_time))
+
 	@termineter.cmd.command('Select a module to use')
 	@termineter.cmd.argument('module', help='the module to use')
 	def do_use(self, args):
@@ -571,8 +665,11 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 			self.logger.error('failed to change context to module: ' + args.module)
 			self.print_error('Failed to change context to module: ' + args.module)
 			return
+		module = self.load_module(args.module)
+		if module is None:
+			return
 		self.last_module = self.frmwk.current_module
-		self.frmwk.current_module = self.frmwk.modules[args.module]
+		self.frmwk.current_module = module
 
 	def complete_use(self, text, line, begidx, endidx):
 		return [i for i in self.frmwk.modules.keys() if i.startswith(text)]
@@ -581,7 +678,8 @@ class InteractiveInterpreter(termineter.cmd.Cmd):
 	def do_version(self, args):
 		fmt_string = "{0:<18} {1:>24}"
 		self.print_line(fmt_string.format(self.__name__ + ':', 'v' + termineter.__version__))
-		revision = ('unknown' if termineter.revision is None else termineter.revision[:12])
+		revision = termineter.get_revision()
+		revision = ('unknown' if revision is None else revision[:12])
 		self.print_line(fmt_string.format('revision:', revision))
 		self.print_line(fmt_string.format('model:', codename))
 		self.print_line(fmt_string.format('loaded modules:', len(self.frmwk.modules)))
@@ -36,13 +36,20 @@ import collections
 import collections.abc
 import enum
 import importlib
+import json
 import logging
+import os
 
+import c1218.errors
+import c1219.access.general
+import c1219.access.security
+import c1219.constants
+import c1219.errors
 import termineter.errors
 import termineter.options
 
-import pluginbase
-
+INDEX_VERSION = 1
+ModuleMetadata = collections.namedtuple('ModuleMetadata', ('name', 'path', 'file', 'mtime', 'size', 'author', 'description', 'connection_state', 'options', 'advanced_options'))
 _ModuleReference = collections.namedtuple('_ModuleReference', ('instance', 'pymodule'))
 
 class ConnectionState(enum.Enum):
@@ -51,24 +58,119 @@ class ConnectionState(enum.Enum):
 	authenticated = 'authenticated'
 
 class ManagerManager(collections.abc.Mapping):
-	def __init__(self, frmwk, searchpath):
+	"""
+	A mapping of module names to their instances. Modules are only imported
+	when they are accessed, their metadata is kept in an index file which is
+	refreshed for any module whose source file has changed.
+	"""
+	def __init__(self, frmwk, searchpath, index_file=None):
 		self.logger = logging.getLogger('termineter.module_manager')
 		self.frmwk = frmwk
-		self.source = pluginbase.PluginBase(package='termineter.modules').make_plugin_source(
-			searchpath=searchpath
-		)
+		self.searchpath = searchpath
+		self._source = None
+		self.index_file = index_file
+		self.index = {}
 		self._modules = {}
-		for module_id in self.source.list_plugins():
-			self._init_pymodule(self.source.load_plugin(module_id))
+		self._load_index()
+
+	def __contains__(self, item):
+		return item in self.index
 
 	def __getitem__(self, item):
+		if item not in self._modules:
+			if item not in self.index:
+				raise KeyError(item)
+			self._load_module(item)
 		return self._modules[item].instance
 
 	def __iter__(self):
-		return iter(self._modules)
+		return iter(self.index)
 
 	def __len__(self):
-		return len(self._modules)
+		return len(self.index)
+
+	@property
+	def source(self):
+		if self._source is None:
+			import pluginbase
+			self._source = pluginbase.PluginBase(package='termineter.modules').make_plugin_source(
+				searchpath=self.searchpath
+			)
+		return self._source
+
+	def _find_file(self, module_id):
+		for directory in self.searchpath:
+			for path in (os.path.join(directory, module_id + '.py'), os.path.join(directory, module_id, '__init__.py')):
+				if os.path.isfile(path):
+					return path
+		return None
+
+	def _list_modules(self):
+		# equivalent to the plugin source's list_plugins without setting it up
+		module_ids = set()
+		for directory in self.searchpath:
+			if not os.path.isdir(directory):
+				continue
+			for name in os.listdir(directory):
+				if name.endswith('.py') and name != '__init__.py':
+					module_ids.add(name[:-3])
+				elif os.path.isfile(os.path.join(directory, name, '__init__.py')):
+					module_ids.add(name)
+		return sorted(module_id for module_id in module_ids if module_id.isidentifier())
+
+	def _load_index(self):
+		cached = {}
+		if self.index_file and os.path.isfile(self.index_file):
+			try:
+				with open(self.index_file, 'r') as file_h:
+					index = json.load(file_h)
+				if index.get('version') == INDEX_VERSION:
+					cached = index['modules']
+			except (IOError, ValueError, KeyError):
+				self.logger.warning('the module index file is corrupt and will be rebuilt')
+		modified = False
+		for module_id in self._list_modules():
+			path = self._find_file(module_id)
+			if path is None:
+				continue
+			stat = os.stat(path)
+			entry = cached.get(module_id)
+			if entry and entry['file'] == path and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+				self.index[module_id] = ModuleMetadata(**entry)
+				continue
+			self.logger.debug('refreshing the index entry for module: ' + module_id)
+			try:
+				self._load_module(module_id)
+			except termineter.errors.FrameworkRuntimeError:
+				continue
+			modified = True
+		if modified or set(cached) != set(self.index):
+			self._save_index()
+
+	def _load_module(self, module_id):
+		try:
+			pymodule = self.source.load_plugin(module_id)
+		except Exception:
+			self.logger.error('failed to import module: ' + module_id, exc_info=True)
+			self.index.pop(module_id, None)
+			raise termineter.errors.FrameworkRuntimeError('failed to import module: ' + module_id)
+		if self._init_pymodule(pymodule) is None:
+			self.index.pop(module_id, None)
+			raise termineter.errors.FrameworkRuntimeError('failed to initialize module: ' + module_id)
+
+	def _save_index(self):
+		if not self.index_file:
+			return
+		index = {
+			'version': INDEX_VERSION,
+			'modules': dict((module_id, metadata._asdict()) for module_id, metadata in self.index.items())
+		}
+		try:
+			with open(self.index_file + '.tmp', 'w') as file_h:
+				json.dump(index, file_h, indent=2, sort_keys=True)
+			os.replace(self.index_file + '.tmp', self.index_file)
+		except (IOError, OSError):
+			self.logger.warning('failed to write the module index file', exc_info=True)
 
 	def _init_pymodule(self, pymodule):
 		module_id = pymodule.__name__.split('.', 3)[-1]
@@ -88,12 +190,46 @@ class ManagerManager(collections.abc.Mapping):
 			raise termineter.errors.FrameworkRuntimeError('advanced_options must be a termineter.options.Options instance')
 
 		self._modules[module_instance.name] = _ModuleReference(instance=module_instance, pymodule=pymodule)
+		self.index[module_instance.name] = self._get_metadata(module_instance, pymodule)
 		return module_instance
 
+	def _get_metadata(self, module_instance, pymodule):
+		path = self._find_file(module_instance.name) or pymodule.__file__
+		stat = os.stat(path)
+		connection_state = None
+		if isinstance(module_instance, TermineterModuleOptical):
+			connection_state = module_instance.connection_state.name
+		return ModuleMetadata(
+			name=module_instance.name,
+			path=module_instance.path,
+			file=path,
+			mtime=stat.st_mtime,
+			size=stat.st_size,
+			author=list(module_instance.author),
+			description=module_instance.description,
+			connection_state=connection_state,
+			options=sorted(module_instance.options.keys()),
+			advanced_options=sorted(module_instance.advanced_options.keys())
+		)
+
+	def is_loaded(self, module_path):
+		"""
+		Check whether a module has been imported and instantiated yet.
+
+		:param str module_path: The path of the module to check.
+		:rtype: bool
+		"""
+		return module_path in self._modules
+
 	def reload(self, module_path):
+		if module_path not in self._modules:
+			self._load_module(module_path)
+			return self._modules[module_path].instance
 		modref = self._modules[module_path]
 		importlib.reload(modref.pymodule)
-		return self._init_pymodule(modref.pymodule)
+		module_instance = self._init_pymodule(modref.pymodule)
+		self._save_index()
+		return module_instance
 
 class TermineterModule(object):
 	frmwk_required_options = ()
@@ -157,3 +293,49 @@ class TermineterModuleOptical(TermineterModule):
 	@property
 	def connection(self):
 		return self.frmwk.serial_connection
+
+	def get_table_ids(self, lower, upper, declared_only=False, check_permissions=False):
+		"""
+		Get the ids of the tables to read within a range. The tables can be
+		limited to those which the meter declares in GEN_CONFIG_TBL that it
+		uses and those which ACCESS_CONTROL_TBL reports can be read by the
+		current user. When *declared_only* is set, the declared manufacturer
+		tables are always included regardless of *lower* and *upper* because
+		their ids are offset by :py:data:`c1219.constants.MFG_TBL_OFFSET`.
+
+		:param int lower: The lowest table id to include.
+		:param int upper: The highest table id to include.
+		:param bool declared_only: Whether to exclude the undeclared tables.
+		:param bool check_permissions: Whether to exclude the unreadable tables.
+		:return: The sorted table ids.
+		:rtype: list
+		"""
+		if declared_only:
+			table_ids = c1219.access.general.get_tables_used(self.connection)
+			table_ids = sorted(table_id for table_id in table_ids if table_id >= c1219.constants.MFG_TBL_OFFSET or lower <= table_id <= upper)
+		else:
+			table_ids = list(range(lower, upper + 1))
+		if not check_permissions:
+			return table_ids
+		try:
+			permissions = c1219.access.security.get_table_permissions(self.connection)
+		except (c1218.errors.C1218ReadTableError, c1219.errors.C1219ParseError) as error:
+			self.logger.warning('could not read the table permissions, no tables will be skipped (' + str(error) + ')')
+			return table_ids
+		if self.frmwk.is_serial_authenticated():
+			password = self.frmwk.get_login_credentials()[2]
+			groups = c1219.access.security.get_password_groups(self.connection, password)
+			if groups is None:
+				self.logger.info('could not determine the access groups of the current user')
+		else:
+			# without logging in, the user belongs to none of the access groups
+			groups = 0
+			self.frmwk.print_warning('The session is not authenticated, only the tables which any user can read will be included')
+		readable_ids = []
+		for table_id in table_ids:
+			permission = permissions.get(table_id)
+			if permission is not None and not c1219.access.security.is_table_readable(permission, groups):
+				self.logger.info("skipping table: {0} which is not readable by the current user".format(table_id))
+				continue
+			readable_ids.append(table_id)
+		return readable_ids
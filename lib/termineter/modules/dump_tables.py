@@ -34,7 +34,8 @@ from __future__ import unicode_literals
 
 import binascii
 import os
-import time
+import shutil
+import tempfile
 
 from c1218.errors import C1218ReadTableError
 from c1219.data import C1219_TABLES
@@ -45,45 +46,57 @@ class Module(TermineterModuleOptical):
 		TermineterModuleOptical.__init__(self, *args, **kwargs)
 		self.author = ['Spencer McIntyre']
 		self.description = 'Write Readable C12.19 Tables To A CSV File'
-		self.detailed_description = 'This module will enumerate the readable tables on the smart meter and write them out to a CSV formated file for analysis. The format is table id, table name, table data length, table data.  The table data is represented in hex.'
+		self.detailed_description = 'This module will enumerate the readable tables on the smart meter and write them out to a CSV formated file for analysis. The format is table id, table name, table data length, table data.  The table data is represented in hex. When DECLARED_ONLY is set, only the tables which the meter declares in GEN_CONFIG_TBL are read (declared manufacturer tables are read regardless of LOWER and UPPER) and when CHECK_PERMISSIONS is set, tables which ACCESS_CONTROL_TBL reports the current user can not read are skipped.'
 		self.options.add_integer('LOWER', 'table id to start reading from', default=0)
 		self.options.add_integer('UPPER', 'table id to stop reading from', default=256)
 		self.options.add_string('FILE', 'file to write the csv data into', default='smart_meter_tables.csv')
+		self.options.add_boolean('DECLARED_ONLY', 'only read the tables declared in GEN_CONFIG_TBL', default=False)
+		self.options.add_boolean('CHECK_PERMISSIONS', 'skip the tables ACCESS_CONTROL_TBL reports are unreadable', default=False)
+		self.advanced_options.add_boolean('CHUNKED', 'read tables with a series of partial reads', default=False)
 
 	def run(self):
 		conn = self.frmwk.serial_connection
-		logger = self.logger
 		lower_boundary = self.options['LOWER']
 		upper_boundary = self.options['UPPER']
+		table_ids = self.get_table_ids(lower_boundary, upper_boundary, declared_only=self.options['DECLARED_ONLY'], check_permissions=self.options['CHECK_PERMISSIONS'])
 		out_file = open(self.options['FILE'], 'w', 1)
+		if self.advanced_options['CHUNKED']:
+			iter_table_data = self._iter_table_data_chunked
+		else:
+			iter_table_data = conn.iter_table_data
 
 		number_of_tables = 0
 		self.frmwk.print_status('Starting dump, writing table data to: ' + self.options['FILE'])
-		for tableid in range(lower_boundary, (upper_boundary + 1)):
+		for tableid in table_ids:
+			# the table data is written out as it is received, the length is
+			# needed before the data so it is spooled until the read finishes
+			spool_file = tempfile.SpooledTemporaryFile(max_size=0x10000, mode='w+')
+			length = 0
 			try:
-				data = conn.get_table_data(tableid)
+				for chunk in iter_table_data(tableid):
+					spool_file.write(binascii.b2a_hex(chunk).decode('utf-8'))
+					length += len(chunk)
 			except C1218ReadTableError as error:
-				data = None
+				# the connection has already tried to recover the session when the meter reports ISSS
 				if error.code == 10:  # ISSS
-					conn.stop()
-					logger.warning('received ISSS error, connection stopped, will sleep before retrying')
-					time.sleep(0.5)
-					if not self.frmwk.serial_login():
-						logger.warning('meter login failed, some tables may not be accessible')
-					try:
-						data = conn.get_table_data(tableid)
-					except C1218ReadTableError as error:
-						data = None
-						if error.code == 10:
-							raise error  # tried to re-sync communications but failed, you should reconnect and rerun the module
-			if not data:
+					raise error
+				length = 0
+			if not length:
+				spool_file.close()
 				continue
 			tablename = C1219_TABLES.get(tableid, 'UNKNOWN')
 			tableid = str(tableid)
 			self.frmwk.print_status('Found readable table, ID: ' + tableid + ' Name: ' + tablename)
 			# format is: table id, table name, table data length, table data
-			out_file.write(','.join([tableid, tablename, str(len(data)), binascii.b2a_hex(data).decode('utf-8')]) + os.linesep)
+			out_file.write(','.join([tableid, tablename, str(length), '']))
+			spool_file.seek(0)
+			shutil.copyfileobj(spool_file, out_file)
+			spool_file.close()
+			out_file.write(os.linesep)
 			number_of_tables += 1
 
 		out_file.close()
 		self.frmwk.print_status('Successfully copied ' + str(number_of_tables) + ' tables to disk.')
+
+	def _iter_table_data_chunked(self, tableid):
+		yield self.frmwk.serial_connection.get_table_data_chunked(tableid)
@@ -32,7 +32,7 @@
 
 from __future__ import unicode_literals
 
-from time import sleep
+import collections
 
 from c1218.errors import C1218ReadTableError
 from c1219.data import C1219_TABLES
@@ -51,31 +51,48 @@ class Module(TermineterModuleOptical):
 		self.description = 'Enumerate Readable C12.19 Tables From The Device'
 		self.detailed_description = """\
 		This module will enumerate the readable tables on the smart meter by attempting to transfer each one. Tables are
-		grouped into decades.
+		grouped into decades. When DECLARED_ONLY is set, only the tables which the meter declares in GEN_CONFIG_TBL are
+		tried, including the declared manufacturer tables regardless of LOWER and UPPER, and when CHECK_PERMISSIONS is
+		set, tables which ACCESS_CONTROL_TBL reports the current user can not read are skipped. When PROBE_TABLES is set,
+		tables are probed with a one octet read, so a table which is found may still be too large to read in a single
+		response and require the CHUNKED option of the dump_tables module.
 		"""
 		self.options.add_integer('LOWER', 'table id to start reading from', default=0)
 		self.options.add_integer('UPPER', 'table id to stop reading from', default=256)
+		self.options.add_boolean('DECLARED_ONLY', 'only read the tables declared in GEN_CONFIG_TBL', default=False)
+		self.options.add_boolean('CHECK_PERMISSIONS', 'skip the tables ACCESS_CONTROL_TBL reports are unreadable', default=False)
+		self.advanced_options.add_boolean('PROBE_TABLES', 'probe tables with one octet partial reads', default=True)
+
+	def _read_tables(self, conn, table_ids):
+		results = collections.OrderedDict()
+		for table_id in table_ids:
+			try:
+				conn.get_table_data(table_id)
+			except C1218ReadTableError as error:
+				results[table_id] = error.code
+				if error.code == 10:  # ISSS
+					break
+			else:
+				results[table_id] = 0
+		return results
 
 	def run(self):
 		conn = self.frmwk.serial_connection
-		logger = self.logger
 		lower_boundary = self.options['LOWER']
 		upper_boundary = self.options['UPPER']
 
+		table_ids = self.get_table_ids(lower_boundary, upper_boundary, declared_only=self.options['DECLARED_ONLY'], check_permissions=self.options['CHECK_PERMISSIONS'])
 		number_of_tables = 0
-		self.frmwk.print_status('Enumerating tables, please wait...')
-		for table_id in range(lower_boundary, (upper_boundary + 1)):
-			try:
-				conn.get_table_data(table_id)
-			except C1218ReadTableError:
-				self.frmwk.serial_disconnect()
-				logger.warning('received ISSS error, connection stopped, will sleep before retrying')
-				sleep(0.5)
-				self.frmwk.serial_connect()
-				if not self.frmwk.serial_login():
-					logger.warning('meter login failed, some tables may not be accessible')
-				conn = self.frmwk.serial_connection
-			else:
+		self.frmwk.print_status("Enumerating {0:,} tables, please wait...".format(len(table_ids)))
+		if self.advanced_options['PROBE_TABLES']:
+			results = conn.probe_tables(table_ids)
+		else:
+			results = self._read_tables(conn, table_ids)
+		for table_id, code in results.items():
+			if code == 0:
 				self.frmwk.print_status('Found readable table, ID: ' + str(table_id) + ' Name: ' + (C1219_TABLES.get(table_id) or 'UNKNOWN'))
 				number_of_tables += 1
+			elif code == 10:  # ISSS
+				# the connection has already tried to recover the session and failed
+				self.frmwk.print_error("Lost the session with the meter at table ID: {0}, stopping the enumeration".format(table_id))
 		self.frmwk.print_status("Found {0:,} tables in range {1}-{2}.".format(number_of_tables, lower_boundary, upper_boundary))
@@ -46,20 +46,17 @@ class Module(TermineterModuleOptical):
 	def run(self):
 		conn = self.frmwk.serial_connection
 		conn.send(c1218.data.C1218IdentRequest())
-		resp = c1218.data.C1218Packet(conn.recv())
+		resp = c1218.data.C1218IdentResponse(conn.recv())
 
 		self.frmwk.print_status('Received Identity Response:')
-		self.frmwk.print_hexdump(resp.data)
+		self.frmwk.print_hexdump(resp.build())
 
-		if resp.data[0] != c1218.data.C1218_RESPONSE_CODES['ok']:
-			self.frmwk.print_error("Non-ok response status 0x{0} ({1}) received".format(
-				resp.data[0],
-				c1218.data.C1218_RESPONSE_CODES.get(resp.data[0], 'unknown response code')
-			))
-		if len(resp.data) < 5:
+		if not resp.is_ok:
+			self.frmwk.print_error("Non-ok response status 0x{0:02x} ({1}) received".format(resp.code, resp.details))
+		if len(resp) < 5:
 			self.frmwk.print_error('Received less that the expected amount of data')
 			return
-		standard, ver, rev = resp.data[1:4]
+		standard, ver, rev = resp.std, resp.ver, resp.rev
 		standard = {
 			0: 'ANSI C12.18',
 			1: 'Reserved',
@@ -70,8 +67,7 @@ class Module(TermineterModuleOptical):
 			('Reference Standard', standard),
 			('Standard Version', "{0}.{1}".format(ver, rev))
 		]
-		cursor = 4
-		if resp.data[cursor] == 0:
+		if not len(resp.features):
 			rows.append(('Feature', 'N/A'))
 		# the feature list is null terminated as defined in the c12.18 standard
 		self.frmwk.print_table(rows, headers=('Name', 'Value'))
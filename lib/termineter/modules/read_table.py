@@ -42,15 +42,19 @@ class Module(TermineterModuleOptical):
 		self.description = 'Read Data From A C12.19 Table'
 		self.detailed_description = 'This module allows individual tables to be read from the smart meter.'
 		self.options.add_integer('TABLE_ID', 'table to read from', True)
+		self.advanced_options.add_boolean('CHUNKED', 'read the table with a series of partial reads', default=False)
 
 	def run(self):
 		conn = self.frmwk.serial_connection
 		tableid = self.options['TABLE_ID']
 
 		try:
-			data = conn.get_table_data(tableid)
+			if self.advanced_options['CHUNKED']:
+				length = self.frmwk.print_hexdump_stream((conn.get_table_data_chunked(tableid),))
+			else:
+				# print the table data as it is received
+				length = self.frmwk.print_hexdump_stream(conn.iter_table_data(tableid))
 		except C1218ReadTableError as error:
 			self.frmwk.print_error('Caught C1218ReadTableError: ' + str(error))
-
-		self.frmwk.print_status('Read ' + str(len(data)) + ' bytes')
-		self.frmwk.print_hexdump(data)
+			return
+		self.frmwk.print_status('Read ' + str(length) + ' bytes')
@@ -33,6 +33,7 @@
 from __future__ import unicode_literals
 
 import collections.abc
+import copy
 import os
 
 def string_is_hex(string):
@@ -77,6 +78,18 @@ class Options(collections.abc.Mapping):
 	def __len__(self):
 		return len(self._options)
 
+	def copy(self):
+		"""
+		Create a copy of the options whose values can be changed without
+		affecting this instance.
+
+		:return: The new options instance.
+		:rtype: :py:class:`.Options`
+		"""
+		options = copy.copy(self)
+		options._options = dict((name, copy.copy(option)) for name, option in self._options.items())
+		return options
+
 	def add_string(self, name, help, required=True, default=None):
 		"""
 		Add a new option with a type of String.
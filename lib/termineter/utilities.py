@@ -34,6 +34,7 @@ from __future__ import unicode_literals
 
 import copy
 import itertools
+import os
 
 import serial
 
@@ -53,6 +54,28 @@ DEFAULT_SERIAL_SETTINGS = {
 def get_default_serial_settings():
 	return copy.copy(DEFAULT_SERIAL_SETTINGS)
 
+def load_targets(targets):
+	"""
+	Load the connection strings of the meters to run against. Each target
+	which is the path to a file is replaced by the lines of the file, with
+	blank lines and lines starting with # being skipped.
+
+	:param list targets: The connection strings and paths to files of them.
+	:return: The connection strings.
+	:rtype: list
+	"""
+	loaded = []
+	for target in targets:
+		if not os.path.isfile(target):
+			loaded.append(target)
+			continue
+		with open(target, 'r') as file_h:
+			for line in file_h:
+				line = line.strip()
+				if line and not line.startswith('#'):
+					loaded.append(line)
+	return loaded
+
 class Namespace:
 	"""
 	This class is used to hold attributes of the framework.  It doesn't
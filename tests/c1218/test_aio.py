@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/c1218/test_aio.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import asyncio
+import collections
+import unittest
+
+from c1218.aio import AsyncConnection, open_streams
+from c1218.data import ACK, NACK, C1218IdentRequest
+from c1218.errors import C1218IOError
+from c1218.retry import RetryPolicy
+from tests.c1218.test_connection import build_frame, build_frames, build_read_response
+from tests.utilities import SimulatorThread
+
+class ScriptedWriter(object):
+	"""
+	A stand in for an asyncio stream writer. Each write is answered by
+	feeding the next queued reply to the stream reader if there is one.
+	"""
+	def __init__(self, reader):
+		self.reader = reader
+		self.replies = collections.deque()
+		self.written = []
+
+	def reply(self, *replies):
+		self.replies.extend(replies)
+
+	def write(self, data):
+		self.written.append(bytes(data))
+		if self.replies:
+			self.reader.feed_data(self.replies.popleft())
+
+	async def drain(self):
+		pass
+
+	def close(self):
+		pass
+
+class AsyncConnectionTests(unittest.TestCase):
+	def setUp(self):
+		self.loop = asyncio.new_event_loop()
+		self.reader = asyncio.StreamReader(loop=self.loop)
+		self.writer = ScriptedWriter(self.reader)
+		self.retry_policy = RetryPolicy(backoff=0, response_timeout=None)
+		self.connection = AsyncConnection(self.reader, self.writer, enable_cache=False, timeout=0.05, retry_policy=self.retry_policy, recovery_delay=0)
+
+	def tearDown(self):
+		self.loop.close()
+
+	def run_until_complete(self, coroutine):
+		return self.loop.run_until_complete(coroutine)
+
+	def test_send_retries_after_nack(self):
+		self.writer.reply(NACK, ACK)
+		self.run_until_complete(self.connection.send(C1218IdentRequest()))
+		self.assertEqual(len(self.writer.written), 2)
+		self.assertEqual(self.writer.written[0], self.writer.written[1])
+		self.assertEqual(self.retry_policy.stats.retries[('send', 'nack')], 1)
+
+	def test_send_raises_after_retries_are_exhausted(self):
+		self.writer.reply(NACK, NACK, NACK, NACK)
+		with self.assertRaises(C1218IOError):
+			self.run_until_complete(self.connection.send(C1218IdentRequest()))
+		self.assertEqual(len(self.writer.written), self.retry_policy.default_budget)
+
+	def test_send_acknowledges_retransmitted_frame(self):
+		# the meter retransmits its last response before acknowledging the request
+		self.writer.reply(build_frame(b'\x00') + ACK)
+		self.run_until_complete(self.connection.send(C1218IdentRequest()))
+		self.assertEqual(self.writer.written[1:], [ACK])
+
+	def test_recv_nacks_crc_failure(self):
+		frame = build_frame(b'\x00abc')
+		corrupt = bytearray(frame)
+		corrupt[-1] ^= 0xff
+		self.reader.feed_data(bytes(corrupt))
+		self.writer.reply(frame)
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b'\x00abc')
+		self.assertEqual(self.writer.written, [NACK, ACK])
+		self.assertEqual(self.connection._crc_errors, 1)
+
+	def test_recv_nacks_incomplete_frame(self):
+		frame = build_frame(b'\x00abcdef')
+		self.reader.feed_data(frame[:-3])
+		self.writer.reply(frame)
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b'\x00abcdef')
+		self.assertEqual(self.writer.written, [NACK, ACK])
+		# the partial frame is discarded instead of being read as garbage
+		self.assertEqual(dict(self.retry_policy.stats.retries), {('recv', 'incomplete'): 1})
+
+	def test_recv_discards_duplicate_frame(self):
+		first = build_frame(b'\x00a')
+		second = build_frame(b'\x00b', control=0x20)
+		third = build_frame(b'\x00c')
+		self.reader.feed_data(first + second + second + third)
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b'\x00a')
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b'\x00b')
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b'\x00c')
+		self.assertEqual(self.writer.written, [ACK] * 4)
+
+	def test_recv_reassembles_multiple_packets(self):
+		payloads = [b'\x00\x00\x0c' + b'a' * 4, b'b' * 4, b'c' * 4 + b'\x00']
+		self.reader.feed_data(b''.join(build_frames(payloads)))
+		self.assertEqual(self.run_until_complete(self.connection.recv()), b''.join(payloads))
+		self.assertEqual(self.writer.written, [ACK] * len(payloads))
+
+	def test_get_table_data_recovers_after_isss(self):
+		self.connection._initialized = True
+		self.connection._credentials = ('0000', 0, None)
+		data = b'table data'
+		self.writer.reply(
+			ACK + build_frame(b'\x0a'),  # isss in response to the read request
+			b'',
+			ACK + build_frame(b'\x00'),  # ok in response to the logon request
+			b'',
+			ACK + build_frame(build_read_response(data))
+		)
+		self.assertEqual(self.run_until_complete(self.connection.get_table_data(3)), data)
+		# the read request is replayed once the session has been recovered
+		self.assertEqual(self.writer.written[4][6:-2], self.writer.written[0][6:-2])
+
+class AsyncSimulatorTests(unittest.TestCase):
+	def setUp(self):
+		self.tables = {
+			1: b'TEST' + b'\x00' * 20,
+			3: bytes(bytearray(range(256))) * 3,
+		}
+		self.thread = SimulatorThread(self.tables, password='secret')
+		self.thread.start()
+		self.loop = asyncio.new_event_loop()
+
+	def tearDown(self):
+		self.loop.close()
+		self.thread.stop()
+
+	def run_session(self, session):
+		async def run():
+			connection = await AsyncConnection.open(self.thread.url, enable_cache=False, recovery_delay=0)
+			try:
+				await session(connection)
+			finally:
+				connection.writer.close()
+		self.loop.run_until_complete(run())
+
+	def test_open_streams(self):
+		async def run():
+			reader, writer = await open_streams(self.thread.url)
+			writer.close()
+			return reader
+		self.assertIsInstance(self.loop.run_until_complete(run()), asyncio.StreamReader)
+
+	def test_session(self):
+		async def session(connection):
+			self.assertTrue(await connection.start())
+			self.assertTrue(await connection.login(password='secret'))
+			self.assertEqual(await connection.get_table_data(1), self.tables[1])
+			# this response is split across multiple packets
+			self.assertEqual(await connection.get_table_data(3), self.tables[3])
+			self.assertEqual(await connection.get_table_data(3, 4, 2), self.tables[3][2:6])
+			await connection.set_table_data(10, b'hello')
+			self.assertEqual(await connection.get_table_data(10), b'hello')
+			self.assertEqual(await connection.run_procedure(5, False, b'\x01'), (0, b''))
+			self.assertTrue(await connection.keep_alive())
+			self.assertTrue(await connection.stop())
+			self.assertFalse(connection._initialized)
+		self.run_session(session)
+
+	def test_login_with_wrong_password(self):
+		async def session(connection):
+			self.assertTrue(await connection.start())
+			self.assertFalse(await connection.login(password='wrong'))
+			self.assertTrue(await connection.stop())
+		self.run_session(session)
+
+	def test_recover_lost_session(self):
+		async def session(connection):
+			self.assertTrue(await connection.start())
+			self.assertTrue(await connection.login(password='secret'))
+			# the meter returns to the base state as if the session timed out
+			self.thread.simulator.state = 'base'
+			self.assertEqual(await connection.get_table_data(1), self.tables[1])
+			self.assertTrue(await connection.stop())
+		self.run_session(session)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/c1218/test_connection.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import collections
+import struct
+import unittest
+
+try:
+	from unittest import mock
+except ImportError:
+	import mock
+
+import serial
+
+from c1218.connection import Connection, ReadBuffer
+from c1218.data import ACK, NACK, C1218_RESPONSE_CODES, C1218IdentRequest, C1218Packet
+from c1218.errors import C1218IOError, C1218ReadTableError
+from c1218.retry import RetryPolicy
+
+def build_frame(payload, sequence=0, control=0):
+	packet = C1218Packet(payload)
+	if control:
+		packet.set_control(control)
+	packet.sequence = struct.pack('B', sequence)
+	return packet.build()
+
+def build_frames(payloads):
+	frames = []
+	for index, payload in enumerate(payloads):
+		control = 0
+		if len(payloads) > 1:
+			control = (0xc0 if index == 0 else 0x80)
+		frames.append(build_frame(payload, sequence=len(payloads) - index - 1, control=control))
+	return frames
+
+def build_read_response(data):
+	checksum = struct.pack('B', ((sum(bytearray(data)) - 1) & 0xff) ^ 0xff)
+	return b'\x00' + struct.pack('>H', len(data)) + data + checksum
+
+class ScriptedSerial(object):
+	"""
+	A stand in for a PySerial instance. Data which is fed to it is returned
+	by reads, and each write is answered with the next queued reply if there
+	is one. An empty read is treated as a timeout by the connection.
+	"""
+	def __init__(self, chunk_size=None):
+		"""
+		:param int chunk_size: The maximum number of bytes returned by a
+		  single read, used to force the read buffer to refill.
+		"""
+		self.baudrate = 9600
+		self.timeout = 1
+		self.chunk_size = chunk_size
+		self.replies = collections.deque()
+		self.rx = bytearray()
+		self.written = []
+
+	@property
+	def in_waiting(self):
+		if self.chunk_size is None:
+			return len(self.rx)
+		return min(len(self.rx), self.chunk_size)
+
+	def feed(self, data):
+		self.rx += data
+
+	def reply(self, *replies):
+		self.replies.extend(replies)
+
+	def read(self, size=1):
+		if self.chunk_size is not None:
+			size = min(size, self.chunk_size)
+		data = bytes(self.rx[:size])
+		del self.rx[:size]
+		return data
+
+	def write(self, data):
+		data = bytes(data)
+		self.written.append(data)
+		if self.replies:
+			self.rx += self.replies.popleft()
+		return len(data)
+
+	def close(self):
+		pass
+
+	def flush(self):
+		pass
+
+	def flushInput(self):
+		del self.rx[:]
+
+	def flushOutput(self):
+		pass
+
+	def setDTR(self, value):
+		pass
+
+	def setRTS(self, value):
+		pass
+
+class ReadBufferTests(unittest.TestCase):
+	def test_peek_does_not_consume(self):
+		read_buffer = ReadBuffer(ScriptedSerial())
+		read_buffer.serial_h.feed(b'\xee\x00\x01')
+		self.assertEqual(bytes(read_buffer.peek(2)), b'\xee\x00')
+		self.assertEqual(bytes(read_buffer.read(3)), b'\xee\x00\x01')
+		self.assertEqual(len(read_buffer), 0)
+
+	def test_read_refills_and_grows(self):
+		data = bytes(bytearray(range(256))) * 4
+		read_buffer = ReadBuffer(ScriptedSerial(chunk_size=7), size=16)
+		read_buffer.serial_h.feed(data)
+		self.assertEqual(bytes(read_buffer.read(10)), data[:10])
+		self.assertEqual(bytes(read_buffer.read(len(data))), data[10:])
+
+	def test_short_read_on_timeout(self):
+		read_buffer = ReadBuffer(ScriptedSerial())
+		read_buffer.serial_h.feed(b'\xee\x00')
+		self.assertEqual(bytes(read_buffer.peek(8)), b'\xee\x00')
+		read_buffer.clear()
+		self.assertEqual(bytes(read_buffer.read(1)), b'')
+
+class ConnectionTests(unittest.TestCase):
+	chunk_size = None
+	def setUp(self):
+		self.port = ScriptedSerial(chunk_size=self.chunk_size)
+		self.retry_policy = RetryPolicy(backoff=0, response_timeout=None)
+		with mock.patch('serial.serial_for_url', return_value=self.port):
+			self.connection = Connection('/dev/null', enable_cache=False, retry_policy=self.retry_policy)
+
+	def test_send_retries_after_nack(self):
+		self.port.reply(NACK, ACK)
+		self.connection.send(C1218IdentRequest())
+		self.assertEqual(len(self.port.written), 2)
+		self.assertEqual(self.port.written[0], self.port.written[1])
+		self.assertEqual(self.retry_policy.stats.retries[('send', 'nack')], 1)
+
+	def test_send_raises_after_retries_are_exhausted(self):
+		self.port.reply(NACK, NACK, NACK, NACK)
+		with self.assertRaises(C1218IOError):
+			self.connection.send(C1218IdentRequest())
+		self.assertEqual(len(self.port.written), self.retry_policy.default_budget)
+
+	def test_send_raises_without_response(self):
+		with self.assertRaises(C1218IOError):
+			self.connection.send(C1218IdentRequest())
+
+	def test_recv_acknowledges_frame(self):
+		self.port.feed(build_frame(b'\x00\x00\x02\x00\x00'))
+		self.assertEqual(self.connection.recv(), b'\x00\x00\x02\x00\x00')
+		self.assertEqual(self.port.written, [ACK])
+
+	def test_recv_nacks_crc_failure(self):
+		frame = build_frame(b'\x00abc')
+		corrupt = bytearray(frame)
+		corrupt[-1] ^= 0xff
+		self.port.feed(corrupt)
+		# the frame is retransmitted in response to the NACK
+		self.port.reply(frame)
+		self.assertEqual(self.connection.recv(), b'\x00abc')
+		self.assertEqual(self.port.written, [NACK, ACK])
+		self.assertEqual(self.connection._crc_errors, 1)
+
+	def test_recv_raises_after_crc_failures(self):
+		corrupt = bytearray(build_frame(b'\x00abc'))
+		corrupt[-1] ^= 0xff
+		self.port.feed(corrupt)
+		self.port.reply(bytes(corrupt), bytes(corrupt), bytes(corrupt))
+		with self.assertRaises(C1218IOError):
+			self.connection.recv()
+		self.assertEqual(self.port.written, [NACK] * self.retry_policy.default_budget)
+
+	def test_recv_nacks_incomplete_frame(self):
+		frame = build_frame(b'\x00abcdef')
+		self.port.feed(frame[:-3])
+		self.port.reply(frame)
+		self.assertEqual(self.connection.recv(), b'\x00abcdef')
+		self.assertEqual(self.port.written, [NACK, ACK])
+
+	def test_recv_nacks_short_frame(self):
+		frame = build_frame(b'\x00')
+		self.port.feed(frame[:4])
+		self.port.reply(frame)
+		self.assertEqual(self.connection.recv(), b'\x00')
+		self.assertEqual(self.port.written, [NACK, ACK])
+
+	def test_recv_skips_data_before_frame(self):
+		self.port.feed(b'\x06\x15' + build_frame(b'\x00'))
+		self.assertEqual(self.connection.recv(), b'\x00')
+		self.assertEqual(self.port.written, [ACK])
+
+	def test_recv_reassembles_multiple_packets(self):
+		payloads = [b'\x00\x00\x0c' + b'a' * 4, b'b' * 4, b'c' * 4 + b'\x00']
+		for frame in build_frames(payloads):
+			self.port.feed(frame)
+		self.assertEqual(self.connection.recv(), b''.join(payloads))
+		self.assertEqual(self.port.written, [ACK] * len(payloads))
+
+	def test_recv_reassembles_after_crc_failure(self):
+		payloads = [b'\x00\x00\x08' + b'a' * 4, b'b' * 4 + b'\x00']
+		frames = build_frames(payloads)
+		corrupt = bytearray(frames[1])
+		corrupt[-2] ^= 0xff
+		self.port.feed(frames[0])
+		self.port.feed(corrupt)
+		self.port.reply(b'', frames[1])
+		self.assertEqual(self.connection.recv(), b''.join(payloads))
+		self.assertEqual(self.port.written, [ACK, NACK, ACK])
+
+	def test_keep_alive(self):
+		self.port.reply(ACK + build_frame(b'\x00'))
+		self.assertTrue(self.connection.keep_alive())
+
+	def test_keep_alive_catches_port_errors(self):
+		for error in (serial.SerialException('the port was closed'), OSError('the device was removed'), ValueError('the frame could not be decoded')):
+			with mock.patch.object(self.port, 'write', side_effect=error):
+				with mock.patch.object(self.connection.logger, 'error') as log_error:
+					self.assertFalse(self.connection.keep_alive())
+			self.assertTrue(log_error.called)
+
+	def test_get_table_data_multiple_packets(self):
+		data = bytes(bytearray(range(200)))
+		response = build_read_response(data)
+		payloads = [response[offset:offset + 64] for offset in range(0, len(response), 64)]
+		self.port.reply(ACK + b''.join(build_frames(payloads)))
+		self.assertEqual(self.connection.get_table_data(1), data)
+		self.assertEqual(self.port.written[1:], [ACK] * len(payloads))
+
+class ChunkedConnectionTests(ConnectionTests):
+	# the same tests with data arriving a few bytes at a time
+	chunk_size = 3
+
+class GetTableDataChunkedTests(unittest.TestCase):
+	def setUp(self):
+		self.port = ScriptedSerial()
+		self.retry_policy = RetryPolicy(backoff=0, response_timeout=None)
+		with mock.patch('serial.serial_for_url', return_value=self.port):
+			self.connection = Connection('/dev/null', enable_cache=False, retry_policy=self.retry_policy)
+		self.data = bytes(bytearray(range(10)))
+
+	def reply_chunks(self, *chunks):
+		# each read request is acknowledged and answered, the ACK written for
+		# the response does not receive a reply
+		for chunk in chunks:
+			if isinstance(chunk, int):
+				payload = struct.pack('B', chunk)
+			else:
+				payload = build_read_response(chunk)
+			self.port.reply(ACK + build_frame(payload), b'')
+
+	def requested_offsets(self):
+		return [struct.unpack('>I', b'\x00' + frame[9:12])[0] for frame in self.port.written if frame != ACK]
+
+	def test_short_chunk_ends_table(self):
+		self.reply_chunks(self.data[0:4], self.data[4:8], self.data[8:])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4), self.data)
+		self.assertEqual(self.requested_offsets(), [0, 4, 8])
+
+	def test_onp_ends_table_of_unknown_size(self):
+		self.reply_chunks(self.data[0:4], self.data[4:8], C1218_RESPONSE_CODES['onp'])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4), self.data[:8])
+
+	def test_iar_ends_table_of_unknown_size(self):
+		self.reply_chunks(self.data[0:4], self.data[4:8], C1218_RESPONSE_CODES['iar'])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4), self.data[:8])
+
+	def test_iar_at_first_chunk_raises(self):
+		self.reply_chunks(C1218_RESPONSE_CODES['iar'])
+		with self.assertRaises(C1218ReadTableError):
+			self.connection.get_table_data_chunked(3, chunk_size=4)
+
+	def test_exact_multiple_of_known_size(self):
+		self.reply_chunks(self.data[0:4], self.data[4:8])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4, octetcount=8), self.data[:8])
+		self.assertEqual(self.requested_offsets(), [0, 4])
+
+	def test_retry_after_busy_chunk(self):
+		self.reply_chunks(self.data[0:4], C1218_RESPONSE_CODES['bsy'], C1218_RESPONSE_CODES['dnr'], self.data[4:8], self.data[8:])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4), self.data)
+		self.assertEqual(self.requested_offsets(), [0, 4, 4, 4, 8])
+
+	def test_retry_after_io_error(self):
+		# the request is not acknowledged, then a late response to it arrives
+		# just before the retry and must not be taken as the response
+		stale = build_frame(build_read_response(b'stale'))
+		self.port.reply(NACK, NACK, NACK + ACK + stale)
+		self.reply_chunks(self.data[0:4], self.data[4:8], self.data[8:])
+		self.assertEqual(self.connection.get_table_data_chunked(3, chunk_size=4), self.data)
+		self.assertEqual(self.requested_offsets(), [0, 0, 0, 0, 4, 8])
+
+	def test_more_data_than_requested(self):
+		self.reply_chunks(self.data[0:4], self.data[4:8])
+		with self.assertRaises(C1218ReadTableError):
+			self.connection.get_table_data_chunked(3, chunk_size=4, octetcount=6)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/c1218/test_data.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import unittest
+
+from c1218.data import C1218_REQUEST_IDS, C1218ReadRequest, C1218ReadResponse, C1218Response, C1218WriteRequest
+
+class RequestTests(unittest.TestCase):
+	def test_read_request_round_trip(self):
+		for request in (C1218ReadRequest(1), C1218ReadRequest(2049, 16, 32)):
+			data = request.build()
+			parsed = C1218_REQUEST_IDS[data[0]].from_bytes(data)
+			self.assertEqual(parsed.build(), data)
+
+	def test_write_request_round_trip(self):
+		for request in (C1218WriteRequest(7, b'hello world'), C1218WriteRequest(7, b'hello world', offset=5)):
+			data = request.build()
+			parsed = C1218_REQUEST_IDS[data[0]].from_bytes(data)
+			self.assertEqual(parsed.build(), data)
+			self.assertEqual(parsed.tableid, 7)
+
+	def test_write_request_invalid_check_sum(self):
+		data = bytearray(C1218WriteRequest(7, b'hello world', offset=5).build())
+		data[-1] ^= 0xff
+		with self.assertRaises(Exception):
+			C1218WriteRequest.from_bytes(bytes(data))
+
+class ResponseTests(unittest.TestCase):
+	def test_response_str(self):
+		self.assertEqual(str(C1218Response.create(2)), '02')
+		response = C1218ReadResponse.from_hex('000002abcd')
+		self.assertEqual(str(response), '000002abcd')
+		self.assertEqual(response.build(), b'\x00\x00\x02\xab\xcd')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/c1218/test_utilities.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import unittest
+
+from c1218.utilities import FrameHistory
+
+class FrameHistoryTests(unittest.TestCase):
+	def test_append_stores_bytes_without_copying(self):
+		history = FrameHistory()
+		data = b'\xee\x00\x00\x00\x00\x01\x00'
+		history.append('sent', data)
+		self.assertIs(history._frames[0][2], data)
+
+	def test_append_copies_reused_buffers(self):
+		history = FrameHistory()
+		data = bytearray(b'\xee\x00')
+		history.append('received', memoryview(data))
+		data[0] = 0
+		self.assertEqual(history._frames[0][2], b'\xee\x00')
+
+	def test_oldest_frames_are_discarded(self):
+		history = FrameHistory(size=2)
+		for data in (b'a', b'b', b'c'):
+			history.append('sent', data)
+		self.assertEqual([frame[2] for frame in history._frames], [b'b', b'c'])
+
+if __name__ == '__main__':
+	unittest.main()
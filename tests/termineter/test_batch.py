@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/termineter/test_batch.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+	from unittest import mock
+except ImportError:
+	import mock
+
+import termineter.batch
+import termineter.core
+import termineter.errors
+from tests.utilities import SimulatorThread
+
+TABLES = {
+	0: b'\x00' * 24,
+	1: b'TEST' + b'\x00' * 20,
+	3: bytes(bytearray(range(64))),
+}
+
+class BatchTests(unittest.TestCase):
+	def setUp(self):
+		root_logger = logging.getLogger('')
+		self.addCleanup(setattr, root_logger, 'handlers', list(root_logger.handlers))
+		self.addCleanup(root_logger.setLevel, root_logger.level)
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+	def start_simulator(self):
+		thread = SimulatorThread(TABLES)
+		thread.start()
+		self.addCleanup(thread.stop)
+		return thread
+
+	def run_batch(self, *args):
+		stream = io.StringIO()
+		exit_code = termineter.batch.main(['--json'] + list(args), stream=stream)
+		return exit_code, json.loads(stream.getvalue())
+
+	def assert_record(self, record, target, success):
+		self.assertEqual(sorted(record.keys()), ['elapsed', 'error', 'messages', 'module', 'result', 'success', 'target'])
+		self.assertEqual(record['module'], 'read_table')
+		self.assertEqual(record['target'], target)
+		self.assertEqual(record['success'], success)
+		self.assertIsInstance(record['elapsed'], float)
+		self.assertIsInstance(record['messages'], list)
+		for message in record['messages']:
+			self.assertIn('type', message)
+		if success:
+			self.assertIsNone(record['error'])
+		else:
+			self.assertIsInstance(record['error'], str)
+
+	def test_success(self):
+		thread = self.start_simulator()
+		exit_code, output = self.run_batch('-t', thread.url, '-s', 'TABLE_ID=3', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_SUCCESS)
+		self.assertEqual(len(output['results']), 1)
+		record = output['results'][0]
+		self.assert_record(record, thread.url, True)
+		hexdumps = [message['data'] for message in record['messages'] if message['type'] == 'hexdump']
+		self.assertEqual(hexdumps, ['000102030405060708090a0b0c0d0e0f' + ''.join('{0:02x}'.format(value) for value in range(16, 64))])
+		self.assertIn({'type': 'status', 'message': 'Read 64 bytes'}, record['messages'])
+
+	def test_set_advanced_option(self):
+		thread = self.start_simulator()
+		exit_code, output = self.run_batch('-t', thread.url, '-s', 'TABLE_ID=3', '-s', 'chunked=true', '-s', 'RETRY_LIMIT=2', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_SUCCESS)
+		self.assertIn({'type': 'status', 'message': 'Read 64 bytes'}, output['results'][0]['messages'])
+
+	def test_module_error(self):
+		thread = self.start_simulator()
+		with mock.patch.object(termineter.core.Framework, 'run', side_effect=RuntimeError('the module failed')):
+			exit_code, output = self.run_batch('-t', thread.url, '-s', 'TABLE_ID=3', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_MODULE_ERROR)
+		record = output['results'][0]
+		self.assert_record(record, thread.url, False)
+		self.assertEqual(record['error'], 'RuntimeError: the module failed')
+
+	def test_usage_error(self):
+		exit_code, output = self.run_batch('-s', 'TABLE_ID', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_USAGE_ERROR)
+		self.assertEqual(output['exit_code'], termineter.batch.EXIT_USAGE_ERROR)
+		self.assertIn('KEY=VAL', output['error'])
+
+	def test_configuration_errors(self):
+		arguments = (
+			('read_tables',),
+			('-s', 'NOT_AN_OPTION=1', 'read_table'),
+			('-s', 'TABLE_ID=three', 'read_table'),
+			('read_table',),
+		)
+		for args in arguments:
+			exit_code, output = self.run_batch('-t', 'unix:///nonexistent', *args)
+			self.assertEqual(exit_code, termineter.batch.EXIT_CONFIGURATION_ERROR, args)
+			self.assertEqual(output['exit_code'], termineter.batch.EXIT_CONFIGURATION_ERROR)
+
+	def test_connection_error(self):
+		target = 'unix://' + os.path.join(self.directory, 'missing.sock')
+		exit_code, output = self.run_batch('-t', target, '-s', 'TABLE_ID=3', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_CONNECTION_ERROR)
+		self.assert_record(output['results'][0], target, False)
+
+	def test_partial_failure(self):
+		thread = self.start_simulator()
+		missing = 'unix://' + os.path.join(self.directory, 'missing.sock')
+		targets_file = os.path.join(self.directory, 'targets.txt')
+		with open(targets_file, 'w') as file_h:
+			file_h.write(thread.url + '\n  # the second meter is offline\n' + missing + '\n')
+		exit_code, output = self.run_batch('-t', targets_file, '-s', 'TABLE_ID=3', 'read_table')
+		self.assertEqual(exit_code, termineter.batch.EXIT_PARTIAL_FAILURE)
+		records = output['results']
+		self.assertEqual([record['target'] for record in records], [thread.url, missing])
+		self.assert_record(records[0], thread.url, True)
+		self.assert_record(records[1], missing, False)
+
+class SetOptionTests(unittest.TestCase):
+	def setUp(self):
+		self.frmwk = termineter.batch.BatchFramework()
+		self.module = self.frmwk.modules['read_table']
+
+	def test_set_option(self):
+		termineter.batch._set_option(self.frmwk, self.module, 'TABLE_ID', '7')
+		self.assertEqual(self.module.options['TABLE_ID'], 7)
+		termineter.batch._set_option(self.frmwk, self.module, 'CHUNKED', 'true')
+		self.assertTrue(self.module.advanced_options['CHUNKED'])
+		termineter.batch._set_option(self.frmwk, self.module, 'USERNAME', 'admin')
+		self.assertEqual(self.frmwk.options['USERNAME'], 'admin')
+		termineter.batch._set_option(self.frmwk, self.module, 'RETRY_LIMIT', '5')
+		self.assertEqual(self.frmwk.advanced_options['RETRY_LIMIT'], 5)
+
+	def test_set_invalid_option(self):
+		with self.assertRaises(termineter.errors.FrameworkConfigurationError):
+			termineter.batch._set_option(self.frmwk, self.module, 'NOT_AN_OPTION', '1')
+		with self.assertRaises(termineter.errors.FrameworkConfigurationError):
+			termineter.batch._set_option(self.frmwk, self.module, 'TABLE_ID', 'seven')
+
+if __name__ == '__main__':
+	unittest.main()
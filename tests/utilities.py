@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tests/utilities.py
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the project nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from c1218.simulator import Simulator
+
+class SimulatorThread(threading.Thread):
+	"""
+	Run a :py:class:`~c1218.simulator.Simulator` on a unix socket in a
+	background thread. Clients are served one after another the same way as
+	the simulator's command line interface until the thread is stopped. The
+	simulator is created in the thread because it waits for the first client
+	to connect.
+	"""
+	def __init__(self, tables=None, **kwargs):
+		"""
+		:param dict tables: The table data for the simulator to serve.
+		:param kwargs: Additional keyword arguments for the simulator.
+		"""
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'meter.sock')
+		self.url = 'unix://' + self.path
+		self.tables = tables
+		# the line rate is not emulated so the tests run quickly
+		kwargs.setdefault('baudrate', 0)
+		self.kwargs = kwargs
+		self.simulator = None
+		self._stopped = threading.Event()
+
+	def run(self):
+		self.simulator = Simulator(self.url + '?mode=server', tables=self.tables, **self.kwargs)
+		try:
+			while True:
+				self.simulator.serve_forever()
+				if self._stopped.is_set():
+					break
+				self.simulator.reset()
+				self.simulator.serial_h.accept()
+		finally:
+			self.simulator.serial_h.close()
+
+	def start(self, timeout=5.0):
+		"""
+		Start the thread and wait for the simulator to listen on the socket.
+
+		:param float timeout: The number of seconds to wait.
+		"""
+		threading.Thread.start(self)
+		expiration = time.time() + timeout
+		while not os.path.exists(self.path):
+			if time.time() > expiration:
+				raise RuntimeError('the simulator did not start')
+			time.sleep(0.01)
+		# the socket is bound before it starts to listen
+		time.sleep(0.05)
+
+	def stop(self, timeout=5.0):
+		"""
+		Stop serving clients once the current one has disconnected and clean
+		up the socket.
+
+		:param float timeout: The number of seconds to wait.
+		"""
+		self._stopped.set()
+		if self.is_alive():
+			# connect and disconnect in case the simulator is waiting for a client
+			sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			try:
+				sock.connect(self.path)
+			except socket.error:
+				pass
+			finally:
+				sock.close()
+		self.join(timeout)
+		shutil.rmtree(self.directory, ignore_errors=True)